@@ -53,6 +53,7 @@ def response_wrapper(func: Callable) -> Callable:
 class WSMessageType(str, Enum):
     RESPONSE = "response"  # 普通响应
     FILE = "file"         # 文件传输
+    STREAM = "stream"     # 流式分段响应, 以同 request_id 的 response/error 结束
     CHECK = "check"       # 连接检查
     ERROR = "error"       # 错误响应
 
@@ -67,6 +68,10 @@ class WS_RESPONSE(BaseModel):
     data: Optional[Any] = None
     request_id: Optional[str] = None
 
+class LimitRequest(BaseModel):
+    bytes_per_sec: Optional[float] = None  # 读取字节速率上限, 为空或不大于0表示不限速
+    ops_per_sec: Optional[float] = None  # 操作速率上限, 为空或不大于0表示不限速
+
 class ScanRequest(BaseModel):
     id: str
     path: str
@@ -1,12 +1,19 @@
 import json
+import asyncio
 from app.core.logger import log
+from app.core.config import config
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from app.api.deps import response_wrapper, WS_RESPONSE, WSMessageType
-from app.core.gateway import start, stop, status, restart, handle_websocket_message, ws_manage
+from app.api.deps import response_wrapper, WS_RESPONSE, WSMessageType, LimitRequest
+from app.core.gateway import start, stop, status, restart, set_limits, handle_websocket_message, ws_manage
 
 # API router
 api_router = APIRouter(tags=["Gateway API"])
 
+# 单个WebSocket连接允许同时处理的请求数
+MAX_INFLIGHT = config.get("gateway.max_inflight", 8)
+# 单个WebSocket连接允许排队等待名额的请求数, 超出时直接返回繁忙
+MAX_PENDING = config.get("gateway.max_pending", 64)
+
 # Control endpoints
 @api_router.get("/control/start", summary="启动网关服务")
 @response_wrapper
@@ -28,10 +35,50 @@ async def status_service():
 async def restart_service():
     return await restart()
 
+@api_router.post("/control/limits/{nds_id}", summary="修改NDS速率限制")
+@response_wrapper
+async def limits_service(nds_id: str, request: LimitRequest):
+    return await set_limits(nds_id, request.bytes_per_sec, request.ops_per_sec)
+
+async def _dispatch(client_id: str, message: dict, semaphore: asyncio.Semaphore) -> None:
+    """获取并发名额后处理单个请求并回传响应，完成后释放名额
+
+    名额在任务内获取，接收循环不会因达到并发上限而停止读取，额度等控制消息始终能被及时处理
+    """
+    await semaphore.acquire()
+    try:
+        response = await handle_websocket_message(client_id, message)
+        if not isinstance(response, WS_RESPONSE):
+            log.error(f"Invalid response object[{client_id}]: {response}")
+            response = WS_RESPONSE(
+                type=WSMessageType.ERROR,
+                code=500,
+                message="Internal server error: Invalid response object"
+            )
+        await ws_manage.send_response(client_id, response)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        log.error(f"Failed to handle message[{client_id}]: {str(e)}")
+        await ws_manage.send_response(client_id, WS_RESPONSE(
+            type=WSMessageType.ERROR,
+            code=500,
+            message=f"Failed to handle message: {str(e)}",
+            request_id=message.get("request_id") if isinstance(message, dict) else None
+        ))
+    finally:
+        semaphore.release()
+
+
 # WebSocket endpoint
 @api_router.websocket("/nds/ws/{client_id}")
 async def nds_control(websocket: WebSocket, client_id: str):
-    """WebSocket connection handler"""
+    """WebSocket connection handler
+
+    每条请求作为独立任务并发处理，响应按完成顺序返回，客户端通过 request_id 对应请求
+    """
+    semaphore = asyncio.Semaphore(MAX_INFLIGHT)
+    tasks: set[asyncio.Task] = set()
     try:
         await ws_manage.connect(websocket, client_id)
 
@@ -41,28 +88,39 @@ async def nds_control(websocket: WebSocket, client_id: str):
                 message = await websocket.receive_json()
                 log.debug(f"Received message[{client_id}]: {message}")
 
-                # Handle message
-                try:
-                    # 检查是否为check，如果是则跳过，无需返回任何信息
-                    if message.get("api", "") == "check_connection":
-                        continue
-
-                    response = await handle_websocket_message(client_id, message)
-                    if not isinstance(response, WS_RESPONSE):
-                        log.error(f"Invalid response object[{client_id}]: {response}")
-                        response = WS_RESPONSE(
-                            type=WSMessageType.ERROR,
-                            code=500,
-                            message="Internal server error: Invalid response object"
-                        )
-                    await ws_manage.send_response(client_id, response)
-                except Exception as e:
-                    log.error(f"Failed to handle message[{client_id}]: {str(e)}")
+                if not isinstance(message, dict):
+                    await ws_manage.send_response(client_id, WS_RESPONSE(
+                        type=WSMessageType.ERROR,
+                        code=400,
+                        message="Invalid message format"
+                    ))
+                    continue
+
+                # 检查是否为check，如果是则跳过，无需返回任何信息
+                if message.get("api", "") == "check_connection":
+                    continue
+
+                # 文件传输的额度消息直接处理，不占用并发名额，避免与被其阻塞的读取互相等待
+                if message.get("api", "") == "credit":
+                    nbytes = (message.get("params") or {}).get("bytes")
+                    if isinstance(nbytes, int) and nbytes > 0:
+                        await ws_manage.grant(client_id, str(message.get("request_id")), nbytes)
+                    continue
+
+                # 排队的请求过多时直接返回繁忙，避免任务与消息体无限堆积
+                if len(tasks) >= MAX_INFLIGHT + MAX_PENDING:
                     await ws_manage.send_response(client_id, WS_RESPONSE(
                         type=WSMessageType.ERROR,
-                        code=500,
-                        message=f"Failed to handle message: {str(e)}"
+                        code=429,
+                        message="Too many pending requests",
+                        request_id=message.get("request_id")
                     ))
+                    continue
+
+                # 达到并发上限时请求在任务内排队等待名额，接收循环继续读取后续消息
+                task = asyncio.create_task(_dispatch(client_id, message, semaphore))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
 
             except json.JSONDecodeError:
                 await ws_manage.send_response(client_id, WS_RESPONSE(
@@ -76,4 +134,8 @@ async def nds_control(websocket: WebSocket, client_id: str):
     except Exception as e:
         log.error(f"WebSocket error[{client_id}]: {str(e)}")
     finally:
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
         await ws_manage.disconnect(client_id)
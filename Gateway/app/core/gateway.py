@@ -1,20 +1,104 @@
+import asyncio
+import contextlib
 from app.core.logger import log
-from typing import Dict, Optional, Any
+from app.core.config import config
+from typing import Dict, Optional, Any, List, AsyncIterator, Tuple, Hashable, Callable, Union
 from app.utils.server import GatewayServer
 from app.api.deps import WS_RESPONSE, WSMessageType
 from app.services.ws_manager import ConnectionManager
-from app.services.nds_pool import NDSPool, PoolConfig
+from app.services.nds_pool import NDSPool, PoolConfig, NDSUnavailableError
+from app.services.zip_cache import ZipInfoCache
+from app.services.scan_snapshot import ScanSnapshotStore
+from app.services.nds_reader import NDSReader
+from app.services.read_ahead import ReadAhead
+from app.services.read_coalescer import ReadCoalescer
+from app.services.block_cache import BlockCache
+from app.services.single_flight import SingleFlight
+from datetime import datetime, timedelta
+from app.core.nds_client import NDSFileNotFoundError, ScanFilter, Buffer
+from app.core.ws_frame import FrameBuffer, frame_headroom
 
 
 # 全局实例
-nds_pool = NDSPool()
+nds_pool = NDSPool(
+    health_interval=config.get("gateway.pool.health_interval", 30),
+    adapt_interval=config.get("gateway.pool.adapt_interval", 10)
+)
 server = GatewayServer()
-ws_manage = ConnectionManager()
+ws_manage = ConnectionManager(
+    queue_size=config.get("gateway.send_queue.size", 16),
+    send_timeout=config.get("gateway.send_queue.timeout", 30),
+    max_window=config.get("gateway.flow_control.max_window", 64 * 1024 * 1024)
+)
+zip_cache = ZipInfoCache(
+    max_bytes=config.get("gateway.zip_cache.max_bytes", 64 * 1024 * 1024),
+    db_path=config.get("gateway.zip_cache.path") or None
+)
+scan_snapshots = ScanSnapshotStore()
+read_ahead = ReadAhead(
+    nds_pool,
+    budget=config.get("gateway.read_ahead.budget", 8 * 1024 * 1024),
+    max_sessions=config.get("gateway.read_ahead.max_sessions", 4),
+    idle_timeout=config.get("gateway.read_ahead.idle_timeout", 3),
+    max_gap=config.get("gateway.read_ahead.max_gap", 1024 * 1024),
+    window=config.get("gateway.read_ahead.window", 1024 * 1024)
+)
+block_cache = BlockCache(
+    config.get("gateway.block_cache.path", "cache/blocks.dat"),
+    max_bytes=config.get("gateway.block_cache.max_bytes", 1024 * 1024 * 1024),
+    block_size=config.get("gateway.block_cache.block_size", 1024 * 1024),
+    meta_ttl=config.get("gateway.block_cache.meta_ttl", 60)
+) if config.get("gateway.block_cache.enabled", False) else None
+nds_reader = NDSReader(
+    nds_pool,
+    block_size=config.get("gateway.read.block_size", 512 * 1024),
+    queue_size=config.get("gateway.read.queue_size", 4),
+    segment_threshold=config.get("gateway.read.segment_threshold", 32 * 1024 * 1024),
+    max_segments=config.get("gateway.read.max_segments", 4),
+    read_ahead=read_ahead if config.get("gateway.read_ahead.enabled", True) else None,
+    block_cache=block_cache
+)
+read_coalescer = ReadCoalescer(
+    nds_reader,
+    window=config.get("gateway.read_coalesce.window", 0.005),
+    max_gap=config.get("gateway.read_coalesce.max_gap", 64 * 1024),
+    max_span=config.get("gateway.read_coalesce.max_span", 16 * 1024 * 1024),
+    max_size=config.get("gateway.read_coalesce.max_size", 4 * 1024 * 1024)
+)
+
+single_flight = SingleFlight(max_items=config.get("gateway.single_flight.max_items", 4))
+
+# 参数相同的并发 scan/zip_info/read 请求共用一次NDS操作; 共享读取最多缓冲 max_items 个数据块, 读取速度跟随最慢的请求, 只对不超过该大小的读取去重
+SINGLE_FLIGHT_ENABLED = config.get("gateway.single_flight.enabled", True)
+SINGLE_FLIGHT_MAX_READ = config.get("gateway.single_flight.max_read_bytes", 8 * 1024 * 1024)
+
+# read_many 单次请求的最大总字节数
+READ_MANY_MAX_BYTES = config.get("gateway.read_coalesce.max_many_bytes", 64 * 1024 * 1024)
+
+# zip_info_batch 单次请求的最大文件数
+ZIP_INFO_BATCH_MAX = config.get("gateway.zip_info_batch_max", 1000)
+
+# 流式扫描默认每段文件数
+SCAN_CHUNK_SIZE = config.get("gateway.scan_chunk_size", 1000)
+
+
+def error_code(e: Exception) -> int:
+    """异常对应的响应码, NDS熔断时返回 NDSUnavailableError.code 以便调用方区分"""
+    return NDSUnavailableError.code if isinstance(e, NDSUnavailableError) else 500
+
+
+def pool_option(nds_id: str, name: str, default: Any) -> Any:
+    """获取连接池参数, gateway.pool.nds.{nds_id} 中的配置优先于 gateway.pool 中的默认值"""
+    value = config.get(f"gateway.pool.nds.{nds_id}.{name}")
+    return value if value is not None else config.get(f"gateway.pool.{name}", default)
 
 
 async def start():
     """启动NDS服务"""
     try:
+        zip_cache.open()
+        if block_cache is not None:
+            block_cache.open()
         nds_arr = await server.nds_list()
         log.info(f"获取到{len(nds_arr)}个NDS")
         if not nds_arr:
@@ -22,16 +106,36 @@ async def start():
 
         for info in nds_arr:
             if nds := info.get("nds"):
-                config = PoolConfig(
+                nds_id = str(nds.get("id"))
+                pool_config = PoolConfig(
                     protocol=nds.get("Protocol"),
                     host=nds.get("Address"),
                     port=nds.get("Port"),
                     user=nds.get("Account"),
                     passwd=nds.get("Password"),
                     pool_size=nds.get("PoolSize"),
+                    scan_concurrency=pool_option(nds_id, "scan_concurrency", 4),
+                    scan_max_inflight=pool_option(nds_id, "scan_max_inflight", 16),
+                    read_block_size=pool_option(nds_id, "read_block_size", None),
+                    read_pipeline=pool_option(nds_id, "read_pipeline", None),
+                    max_bytes_per_sec=pool_option(nds_id, "max_bytes_per_sec", None),
+                    max_ops_per_sec=pool_option(nds_id, "max_ops_per_sec", None),
+                    min_idle=pool_option(nds_id, "min_idle", 1),
+                    check_idle=pool_option(nds_id, "check_idle", 60),
+                    adaptive=pool_option(nds_id, "adaptive", False),
+                    min_size=pool_option(nds_id, "min_size", 1),
+                    max_size=pool_option(nds_id, "max_size", None),
+                    wait_threshold=pool_option(nds_id, "wait_threshold", 0.05),
+                    latency_limit=pool_option(nds_id, "latency_limit", 2.0),
+                    lane_reserve=pool_option(nds_id, "lane_reserve", {"scan": 0, "meta": 1, "read": 1}),
+                    lane_share=pool_option(nds_id, "lane_share", {"scan": 0.5, "meta": 1.0, "read": 1.0}),
+                    sftp_channels=pool_option(nds_id, "sftp_channels", 8),
+                    ssh_connections=pool_option(nds_id, "ssh_connections", 1),
+                    breaker_threshold=pool_option(nds_id, "breaker_threshold", 5),
+                    breaker_timeout=pool_option(nds_id, "breaker_timeout", 30),
                 )
-                nds_id = str(nds.get("id"))
-                nds_pool.add_server(nds_id, config)
+                nds_pool.add_server(nds_id, pool_config)
+        await nds_pool.start()
         return "启动完成"
     except Exception as e:
         log.error(f"启动失败: {str(e)}")
@@ -40,13 +144,32 @@ async def start():
 
 async def stop():
     """停止NDS服务"""
+    await read_ahead.close()
     await nds_pool.close()
+    zip_cache.close()
+    if block_cache is not None:
+        block_cache.close()
     return "关闭完成"
 
 
 async def status():
     """获取NDS状态"""
-    return await nds_pool.get_all_pool_status()
+    return {
+        "pools": await nds_pool.get_all_pool_status(),
+        "zip_cache": zip_cache.status(),
+        "scan_snapshots": scan_snapshots.status(),
+        "reader": nds_reader.status(),
+        "read_ahead": read_ahead.status(),
+        "read_coalesce": read_coalescer.status(),
+        "block_cache": block_cache.status() if block_cache is not None else {"enabled": False},
+        "single_flight": single_flight.status(),
+        "connections": ws_manage.status()
+    }
+
+
+async def set_limits(nds_id: str, bytes_per_sec: Optional[float] = None, ops_per_sec: Optional[float] = None):
+    """修改NDS速率限制"""
+    return nds_pool.set_limits(str(nds_id), bytes_per_sec, ops_per_sec)
 
 
 async def restart():
@@ -55,52 +178,342 @@ async def restart():
     return await start()
 
 
-async def handle_scan(nds_id: str, path: str, filter_pattern: Optional[str], response: WS_RESPONSE) -> None:
-    """处理扫描请求"""
+def parse_scan_filter(params: Dict[str, Any]) -> ScanFilter:
+    """解析扫描剪枝条件
+
+    支持参数: filter(路径正则), since/until(时间, 格式 %Y-%m-%d %H:%M:%S), days(最近N天),
+    include/exclude(路径前缀列表), max_depth(最大目录深度)
+    """
+    def _time(key: str) -> Optional[datetime]:
+        if not (value := params.get(key)):
+            return None
+        try:
+            return datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+        except (TypeError, ValueError):
+            raise ValueError(f"参数格式错误: {key}")
+
+    def _prefixes(key: str) -> list:
+        value = params.get(key) or []
+        if isinstance(value, str):
+            value = [value]
+        if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+            raise ValueError(f"参数类型错误: {key}")
+        return value
+
+    since = _time("since")
+    if (days := params.get("days")) is not None:
+        if not isinstance(days, (int, float)) or days <= 0:
+            raise ValueError("参数类型错误: days")
+        since = max(since, datetime.now() - timedelta(days=days)) if since else datetime.now() - timedelta(days=days)
+    max_depth = params.get("max_depth")
+    if max_depth is not None and (not isinstance(max_depth, int) or max_depth < 0):
+        raise ValueError("参数类型错误: max_depth")
+
+    return ScanFilter(
+        pattern=params.get("filter"),
+        since=since,
+        until=_time("until"),
+        include=_prefixes("include"),
+        exclude=_prefixes("exclude"),
+        max_depth=max_depth
+    )
+
+
+def scan_filter_key(params: Dict[str, Any]) -> Tuple:
+    """扫描条件的去重键
+
+    使用原始参数而非解析后的 ScanFilter: days 换算出的 since 取决于请求时间, 每次请求都不同
+    """
+    def _value(key: str) -> Any:
+        value = params.get(key)
+        return tuple(value) if isinstance(value, list) else value
+
+    return tuple(_value(key) for key in ("filter", "since", "until", "days", "include", "exclude", "max_depth"))
+
+
+def parse_stream_params(params: Dict[str, Any]) -> Optional[int]:
+    """解析流式返回参数, 返回每段的文件数, 非流式请求返回None"""
+    if not params.get("stream"):
+        return None
+    chunk_size = params.get("chunk_size", SCAN_CHUNK_SIZE)
+    if not isinstance(chunk_size, int) or chunk_size <= 0:
+        raise ValueError("参数类型错误: chunk_size")
+    return chunk_size
+
+
+def parse_window(params: Dict[str, Any]) -> Optional[int]:
+    """解析文件传输的初始额度(字节), 未指定时不启用流控"""
+    window = params.get("window")
+    if window is None:
+        return None
+    if not isinstance(window, int) or window <= 0:
+        raise ValueError("参数类型错误: window")
+    return window
+
+
+async def send_scan_chunks(client_id: str, response: WS_RESPONSE, batches: AsyncIterator[List[str]],
+                           chunk_size: int, extra: Optional[Dict[str, Any]] = None) -> int:
+    """将遍历结果按 chunk_size 分段以 stream 消息发送, 返回文件总数
+
+    stream 消息的 data 为 {"files": [...], **extra}
+    """
+    total = 0
+    buffer: List[str] = []
+
+    async def _send(files: List[str]) -> None:
+        chunk = WS_RESPONSE(type=WSMessageType.STREAM, from_api=response.from_api, nds_id=response.nds_id,
+                            request_id=response.request_id, data={"files": files, **(extra or {})})
+        if not await ws_manage.send_response(client_id, chunk):
+            raise ConnectionError("扫描结果发送失败")
+
+    async for batch in batches:
+        total += len(batch)
+        buffer.extend(batch)
+        while len(buffer) >= chunk_size:
+            await _send(buffer[:chunk_size])
+            buffer = buffer[chunk_size:]
+    if buffer:
+        await _send(buffer)
+    return total
+
+
+def shared_stream(key: Hashable, factory: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+    """与进行中的相同操作共享数据, 未启用去重时直接执行"""
+    return single_flight.stream(key, factory) if SINGLE_FLIGHT_ENABLED else factory()
+
+
+async def scan_batches(nds_id: str, path: str, scan_filter: ScanFilter) -> AsyncIterator[List[str]]:
+    """遍历目录, 逐批返回文件
+
+    不使用 scan_delta 的目录快照: 快照按 scan_delta 的过滤条件清理, 条件不同的普通扫描会使其丢失目录与文件记录
+    """
+    async with nds_pool.get_client(nds_id, "scan") as client:
+        async for batch in client.iter_scan(path, scan_filter=scan_filter):
+            yield batch
+
+
+async def handle_scan(nds_id: str, path: str, scan_filter: ScanFilter, filter_key: Hashable,
+                      chunk_size: Optional[int], client_id: str, response: WS_RESPONSE) -> None:
+    """处理扫描请求
+
+    指定 chunk_size 时边遍历边以 stream 消息分段返回文件, 最终响应只返回文件总数;
+    filter_key 相同的并发扫描共享同一次遍历
+    """
     if not nds_id or not path:
         raise ValueError("缺少必要参数: nds_id 或 path")
 
     try:
         nds_id = str(nds_id)  # 确保 nds_id 是字符串类型
-        async with nds_pool.get_client(nds_id) as client:
-            response.data = await client.scan(path, filter_pattern)
-            response.message = "扫描成功"
+        batches = shared_stream(("scan", nds_id, path, filter_key),
+                                lambda: scan_batches(nds_id, path, scan_filter))
+        async with contextlib.aclosing(batches):
+            if chunk_size:
+                response.data = {"total": await send_scan_chunks(client_id, response, batches, chunk_size)}
+            else:
+                files = []
+                async for batch in batches:
+                    files.extend(batch)
+                response.data = files
+        response.message = "扫描成功"
+    except Exception as e:
+        response.code = error_code(e)
+        response.message = str(e)
+        response.type = WSMessageType.ERROR
+
+
+async def handle_scan_delta(nds_id: str, path: str, scan_filter: ScanFilter, watermark: Optional[str],
+                            chunk_size: Optional[int], client_id: str, response: WS_RESPONSE) -> None:
+    """处理增量扫描请求
+
+    基于目录快照遍历, 修改时间未变化的目录不再重新列出; 只返回调用方水位之后新增的文件,
+    水位无效(首次调用或Gateway重启)时返回全部文件。指定 chunk_size 时新增文件以 stream 消息分段返回
+    """
+    if not nds_id or not path:
+        raise ValueError("缺少必要参数: nds_id 或 path")
+
+    try:
+        nds_id = str(nds_id)  # 确保 nds_id 是字符串类型
+        snapshot = scan_snapshots.get(nds_id, path)
+        full = snapshot.parse_watermark(watermark) is None
+
+        async def _new_files(batches: AsyncIterator[List[str]]) -> AsyncIterator[List[str]]:
+            async for batch in batches:
+                scan_pass.mark(batch)
+                yield scan_pass.delta(batch, watermark)[0]
+            scan_pass.finish()
+
+        async with nds_pool.get_client(nds_id, "scan") as client:
+            scan_pass = snapshot.begin()
+            batches = _new_files(client.iter_scan(path, scan_filter=scan_filter, snapshot=scan_pass))
+            if chunk_size:
+                total = await send_scan_chunks(client_id, response, batches, chunk_size)
+                response.data = {"total": total, "watermark": scan_pass.watermark, "full": full}
+            else:
+                files = []
+                async for batch in batches:
+                    files.extend(batch)
+                response.data = {"files": files, "watermark": scan_pass.watermark, "full": full}
+        response.message = "扫描成功"
     except Exception as e:
-        response.code = 500
+        response.code = error_code(e)
         response.message = str(e)
         response.type = WSMessageType.ERROR
 
 
-async def handle_read(nds_id: str, path: str, header_offset: int, size: int, client_id: str, response: WS_RESPONSE) -> None:
-    """处理读取请求"""
+async def read_blocks(nds_id: str, path: str, header_offset: int, size: int,
+                      headroom: int = 0) -> AsyncIterator[Tuple[Union[Buffer, FrameBuffer], bool]]:
+    """读取文件区间, 返回 (数据块, 是否为最后一块)
+
+    小读取先在合并窗口内等待同一文件的相邻读取, 合并读取的数据按帧大小切分; 未合并时流式读取,
+    headroom 为帧头字节数, 从NDS直接读取的数据块预留帧头空间, 发送时不再复制。
+    偏移量超出文件末尾等读不到任何数据时, 在发送任何帧之前抛出"读取文件失败"
+    """
+    received = 0
+    async with contextlib.aclosing(_read_range(nds_id, path, header_offset, size, headroom)) as blocks:
+        async for block, last in blocks:
+            if last and not received and not len(block):
+                raise ValueError("读取文件失败")
+            received += len(block)
+            yield block, last
+
+
+async def _read_range(nds_id: str, path: str, header_offset: int, size: int,
+                      headroom: int) -> AsyncIterator[Tuple[Union[Buffer, FrameBuffer], bool]]:
+    """优先合并读取, 未合并时流式读取"""
+    if (data := await read_coalescer.read(nds_id, path, header_offset, size)) is not None:
+        step = ws_manage.chunk_size
+        for begin in range(0, len(data), step):
+            yield data[begin:begin + step], begin + step >= len(data)
+        if not len(data):
+            yield b"", True
+        return
+    async with contextlib.aclosing(nds_reader.blocks(nds_id, path, header_offset, size, headroom)) as blocks:
+        async for item in blocks:
+            yield item
+
+
+async def handle_read(nds_id: str, path: str, header_offset: int, size: int, window: Optional[int],
+                      client_id: str, response: WS_RESPONSE) -> None:
+    """处理读取请求, 指定 window 时按客户端授予的额度发送"""
     if not all([nds_id, path, isinstance(header_offset, int), isinstance(size, int), size > 0]):
         raise ValueError("缺少必要参数或参数类型错误")
 
     try:
         nds_id = str(nds_id)  # 确保 nds_id 是字符串类型
         log.info(f"read file{path} header_offset: {header_offset}, size:{size}")
-        async with nds_pool.get_client(nds_id) as client:
-            if data := await client.read_file_bytes(path, header_offset, size):
-                if await ws_manage.send_file(client_id, data, response.request_id):
-                    response.message = "success"
-                    response.data = {
-                        "nds_id": nds_id,
-                        "path": path,
-                        "header_offset": header_offset,
-                        "size": size
-                    }
-                    response.code = 200
-                else:
-                    response.message = "failed"
-                    response.code = 500
-            else:
-                raise ValueError("读取文件失败")
+        # 共享读取时数据块按发起读取的请求预留帧头, 其他请求发送时复制数据
+        headroom = frame_headroom(response.request_id or "")
+        if size <= SINGLE_FLIGHT_MAX_READ:
+            blocks = shared_stream(("read", nds_id, path, header_offset, size),
+                                   lambda: read_blocks(nds_id, path, header_offset, size, headroom))
+        else:
+            blocks = read_blocks(nds_id, path, header_offset, size, headroom)
+        async with contextlib.aclosing(blocks):
+            sent = await ws_manage.send_stream(client_id, blocks, response.request_id, window)
+        if sent:
+            response.message = "success"
+            response.data = {
+                "nds_id": nds_id,
+                "path": path,
+                "header_offset": header_offset,
+                "size": size
+            }
+            response.code = 200
+        else:
+            response.message = "failed"
+            response.code = 500
     except Exception as e:
-        response.code = 500
+        response.code = error_code(e)
         response.message = str(e)
         response.type = WSMessageType.ERROR
 
 
+async def handle_read_many(nds_id: str, path: Optional[str], ranges: list, window: Optional[int],
+                           client_id: str, response: WS_RESPONSE) -> None:
+    """处理批量读取请求
+
+    同一文件的相邻区间合并为一次NDS读取; 各区间数据按请求顺序拼接后以文件帧返回,
+    最终响应的 data.ranges 给出每个区间的实际长度, 用于切分
+    """
+    if not nds_id or not isinstance(ranges, list) or not ranges:
+        raise ValueError("缺少必要参数: nds_id 或 ranges")
+    items = []
+    for item in ranges:
+        if not isinstance(item, dict):
+            raise ValueError("参数类型错误: ranges")
+        item_path = item.get("path") or path
+        header_offset, size = item.get("header_offset", 0), item.get("size", 0)
+        if not item_path or not isinstance(header_offset, int) or not isinstance(size, int) or size <= 0:
+            raise ValueError("缺少必要参数或参数类型错误: ranges")
+        items.append((item_path, header_offset, size))
+    if sum(size for _, _, size in items) > READ_MANY_MAX_BYTES:
+        raise ValueError(f"读取总大小超出限制: {READ_MANY_MAX_BYTES}")
+
+    try:
+        nds_id = str(nds_id)  # 确保 nds_id 是字符串类型
+        groups: Dict[str, List[int]] = {}
+        for index, (item_path, _, _) in enumerate(items):
+            groups.setdefault(item_path, []).append(index)
+        results = await asyncio.gather(*(
+            read_coalescer.fetch(nds_id, item_path, [items[index][1:] for index in indexes])
+            for item_path, indexes in groups.items()
+        ))
+        views: List[memoryview] = [memoryview(b"")] * len(items)
+        for indexes, datas in zip(groups.values(), results):
+            for index, data in zip(indexes, datas):
+                views[index] = data
+
+        async def _blocks() -> AsyncIterator:
+            chunk_size = ws_manage.chunk_size
+            pending = [view[offset:offset + chunk_size] for view in views for offset in range(0, len(view), chunk_size)]
+            for index, block in enumerate(pending):
+                yield block, index == len(pending) - 1
+            if not pending:
+                yield b"", True
+
+        if await ws_manage.send_stream(client_id, _blocks(), response.request_id, window):
+            response.message = "success"
+            response.data = {
+                "nds_id": nds_id,
+                "ranges": [
+                    {"path": item_path, "header_offset": header_offset, "size": size, "length": len(view)}
+                    for (item_path, header_offset, size), view in zip(items, views)
+                ]
+            }
+        else:
+            response.message = "failed"
+            response.code = 500
+    except Exception as e:
+        response.code = error_code(e)
+        response.message = str(e)
+        response.type = WSMessageType.ERROR
+
+
+async def zip_info(nds_id: str, path: str) -> list:
+    """获取ZIP中央目录信息, 同一文件的并发请求共用一次解析"""
+    if SINGLE_FLIGHT_ENABLED:
+        return await single_flight.run(("zip_info", nds_id, path), lambda: load_zip_info(nds_id, path))
+    return await load_zip_info(nds_id, path)
+
+
+async def load_zip_info(nds_id: str, path: str) -> list:
+    """获取ZIP中央目录信息, 文件大小与修改时间未变化时直接使用缓存"""
+    async with nds_pool.get_client(nds_id, "meta") as client:
+        if not (file_stat := await client.stat(path)):
+            raise NDSFileNotFoundError(f"File not found: {path}", nds_id=nds_id)
+        if block_cache is not None:
+            block_cache.remember(nds_id, path, file_stat["modify"], file_stat["size"])
+        serializable_data = await zip_cache.get(nds_id, path, file_stat["size"], file_stat["modify"])
+        if serializable_data is None:
+            # 复用刚获取的文件状态, 打开文件时不再重复 stat
+            await client.open(path, file_stat)
+            data = await client.get_zip_info()
+            # KeyType 继承自 dict，直接使用 dict() 转换
+            serializable_data = [dict(item) for item in data]
+            await zip_cache.put(nds_id, path, client.stream_info["size"], client.stream_info["modify"], serializable_data)
+        return serializable_data
+
+
 async def handle_zip_info(nds_id: str, path: str, response: WS_RESPONSE) -> None:
     """处理ZIP信息请求"""
     if not nds_id or not path:
@@ -108,18 +521,52 @@ async def handle_zip_info(nds_id: str, path: str, response: WS_RESPONSE) -> None
 
     try:
         nds_id = str(nds_id)  # 确保 nds_id 是字符串类型
-        async with nds_pool.get_client(nds_id) as client:
-            data = await client.get_zip_info(path)
-            # KeyType 继承自 dict，直接使用 dict() 转换
-            serializable_data = [dict(item) for item in data]
-            response.data = serializable_data
-            response.message = "success"
+        response.data = await zip_info(nds_id, path)
+        response.message = "success"
     except Exception as e:
-        response.code = 500
+        response.code = error_code(e)
         response.message = str(e)
         response.type = WSMessageType.ERROR
 
 
+async def handle_zip_info_batch(nds_id: str, paths: list, concurrency: Optional[int], client_id: str, response: WS_RESPONSE) -> None:
+    """处理批量ZIP信息请求
+
+    固定数量的工作任务依次取出路径, 分散到连接池的多个连接上并发解析, 每个文件解析完成后立即以 stream 消息返回,
+    全部完成后由最终响应返回统计信息
+    """
+    if not nds_id or not isinstance(paths, list) or not paths:
+        raise ValueError("缺少必要参数: nds_id 或 paths")
+    if len(paths) > ZIP_INFO_BATCH_MAX:
+        raise ValueError(f"文件数超出限制: {ZIP_INFO_BATCH_MAX}")
+    if concurrency is not None and (not isinstance(concurrency, int) or concurrency <= 0):
+        raise ValueError("参数类型错误: concurrency")
+
+    nds_id = str(nds_id)  # 确保 nds_id 是字符串类型
+    pool_size = nds_pool.get_pool_size(nds_id)
+    workers = max(1, min(concurrency or pool_size, pool_size, len(paths)))
+    pending = iter(paths)
+    failed = 0
+
+    async def _run() -> None:
+        nonlocal failed
+        for path in pending:
+            item = WS_RESPONSE(type=WSMessageType.STREAM, from_api=response.from_api, nds_id=nds_id, request_id=response.request_id)
+            try:
+                item.data = {"path": path, "entries": await zip_info(nds_id, path)}
+                item.message = "success"
+            except Exception as e:
+                failed += 1
+                item.code = error_code(e)
+                item.message = str(e)
+                item.data = {"path": path, "entries": None}
+            await ws_manage.send_response(client_id, item)
+
+    await asyncio.gather(*(_run() for _ in range(workers)))
+    response.data = {"total": len(paths), "success": len(paths) - failed, "failed": failed}
+    response.message = "success"
+
+
 async def handle_websocket_message(client_id: str, message: Dict[str, Any]) -> WS_RESPONSE:
     """处理WebSocket消息"""
     # 验证请求
@@ -139,7 +586,19 @@ async def handle_websocket_message(client_id: str, message: Dict[str, Any]) -> W
         "scan": lambda: handle_scan(
             nds_id=params.get("nds_id"),
             path=params.get("path"),
-            filter_pattern=params.get("filter"),
+            scan_filter=parse_scan_filter(params),
+            filter_key=scan_filter_key(params),
+            chunk_size=parse_stream_params(params),
+            client_id=client_id,
+            response=response
+        ),
+        "scan_delta": lambda: handle_scan_delta(
+            nds_id=params.get("nds_id"),
+            path=params.get("path"),
+            scan_filter=parse_scan_filter(params),
+            watermark=params.get("watermark"),
+            chunk_size=parse_stream_params(params),
+            client_id=client_id,
             response=response
         ),
         "read": lambda: handle_read(
@@ -147,6 +606,15 @@ async def handle_websocket_message(client_id: str, message: Dict[str, Any]) -> W
             path=params.get("path"),
             header_offset=params.get("header_offset", 0),
             size=params.get("size", 0),
+            window=parse_window(params),
+            client_id=client_id,
+            response=response
+        ),
+        "read_many": lambda: handle_read_many(
+            nds_id=params.get("nds_id"),
+            path=params.get("path"),
+            ranges=params.get("ranges"),
+            window=parse_window(params),
             client_id=client_id,
             response=response
         ),
@@ -155,6 +623,13 @@ async def handle_websocket_message(client_id: str, message: Dict[str, Any]) -> W
             path=params.get("path"),
             response=response
         ),
+        "zip_info_batch": lambda: handle_zip_info_batch(
+            nds_id=params.get("nds_id"),
+            paths=params.get("paths"),
+            concurrency=params.get("concurrency"),
+            client_id=client_id,
+            response=response
+        ),
     }
 
     try:
@@ -171,7 +646,7 @@ async def handle_websocket_message(client_id: str, message: Dict[str, Any]) -> W
     except Exception as e:
         log.error(f"处理请求出错[{client_id}]: {str(e)}")
         response.type = WSMessageType.ERROR
-        response.code = 500
+        response.code = error_code(e)
         response.message = "服务器内部错误"
         response.data = str(e)
 
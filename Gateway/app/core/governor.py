@@ -0,0 +1,87 @@
+import time
+import asyncio
+from typing import Dict, Optional, Any
+
+
+class TokenBucket:
+    """令牌桶
+
+    令牌以 rate 个/秒的速度补充, 最多积累 burst 个; 请求超过现有令牌时按欠额等待,
+    等待期间持有锁, 后续请求按到达顺序排队。rate 为空或不大于0时不限速。
+    """
+
+    def __init__(self, rate: Optional[float] = None, burst: Optional[float] = None):
+        self.rate: Optional[float] = None
+        self.burst: float = 0
+        self.tokens: float = 0
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        self.waited = 0.0
+        self.update(rate, burst)
+
+    def update(self, rate: Optional[float], burst: Optional[float] = None) -> None:
+        """修改速率, burst 默认为1秒的令牌数"""
+        self._refill()
+        limited = self.rate is not None
+        self.rate = rate if rate and rate > 0 else None
+        self.burst = (burst if burst and burst > 0 else self.rate) or 0
+        # 从不限速切换为限速时令牌桶为满
+        self.tokens = min(self.tokens, self.burst) if limited else self.burst
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        if self.rate:
+            self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount: float) -> None:
+        """获取令牌, 不足时等待"""
+        if not self.rate or amount <= 0:
+            return
+        async with self._lock:
+            self._refill()
+            self.tokens -= amount
+            if self.tokens < 0 and self.rate:
+                delay = -self.tokens / self.rate
+                self.waited += delay
+                await asyncio.sleep(delay)
+
+    def status(self) -> Dict[str, Any]:
+        self._refill()
+        return {
+            "rate": self.rate,
+            "burst": self.burst,
+            "tokens": round(self.tokens, 2),
+            "waited": round(self.waited, 3)
+        }
+
+
+class Governor:
+    """单个NDS的流量控制: 字节速率与操作速率两个令牌桶
+
+    操作指连接、stat、目录列表、打开文件、FTP RETR 等命令; 字节按读取的数据量计算
+    """
+
+    def __init__(self, bytes_per_sec: Optional[float] = None, ops_per_sec: Optional[float] = None):
+        self.bytes = TokenBucket(bytes_per_sec)
+        self.ops = TokenBucket(ops_per_sec)
+
+    def update(self, bytes_per_sec: Optional[float] = None, ops_per_sec: Optional[float] = None) -> None:
+        """修改限速, None或不大于0表示不限速"""
+        self.bytes.update(bytes_per_sec)
+        self.ops.update(ops_per_sec)
+
+    async def acquire(self, ops: int = 0, nbytes: int = 0) -> None:
+        """获取操作与字节配额"""
+        if ops:
+            await self.ops.acquire(ops)
+        if nbytes:
+            await self.bytes.acquire(nbytes)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "bytes_per_sec": self.bytes.rate,
+            "ops_per_sec": self.ops.rate,
+            "bytes": self.bytes.status(),
+            "ops": self.ops.status()
+        }
@@ -76,10 +76,17 @@ async def websocket_handler(message):
     from app.api.logs import broadcast_log
     await broadcast_log(log_entry)
 
+_broadcast_tasks = set()
+
 def sync_websocket_handler(message):
-    """同步环境下的WebSocket处理器"""
-    loop = asyncio.get_event_loop()
-    loop.create_task(websocket_handler(message))
+    """同步环境下的WebSocket处理器, 没有运行中的事件循环(启动前、关闭后或线程中)时不广播"""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    task = loop.create_task(websocket_handler(message))
+    _broadcast_tasks.add(task)
+    task.add_done_callback(_broadcast_tasks.discard)
 
 # 添加WebSocket日志处理器
 logger.add(sync_websocket_handler, level="INFO")
@@ -6,11 +6,16 @@ import aioftp
 import asyncio
 import inspect
 import asyncssh
+import contextlib
 from io import BytesIO
-from datetime import datetime
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
 from contextlib import asynccontextmanager
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, AsyncIterator, NamedTuple, Tuple, Union
 from app.core.logger import log
+from app.core.governor import Governor
+from app.core.ssh_mux import SSHMux
+from app.core.ws_frame import FrameBuffer
 
 
 # ZIP 文件格式常量
@@ -51,6 +56,136 @@ def is_regex(pattern):
         return False
 
 
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+async def read_stream_into(stream, size: int, block_size: int = 64 * 1024, headroom: int = 0) -> bytearray:
+    """从数据流读取 size 字节到预分配的 bytearray
+
+    每个数据块只复制一次到结果缓冲区, 数据流提前结束时截断为实际读取的长度
+
+    Args:
+        stream: 提供 read(n) 协程的数据流
+        size: 要读取的字节数
+        block_size: 单次读取的最大字节数
+        headroom: 缓冲区开头预留的字节数(如帧头), 数据写在其后
+    Returns:
+        读取的数据, 前 headroom 字节为预留空间
+    """
+    buffer = bytearray(headroom + size)
+    total = 0
+    with memoryview(buffer) as view:
+        while total < size:
+            block = await stream.read(min(size - total, block_size))
+            if not block:
+                break
+            view[headroom + total:headroom + total + len(block)] = block
+            total += len(block)
+    if total < size:
+        del buffer[headroom + total:]
+    return buffer
+
+
+# 目录名中的时间: YYYYMMDD[HH[MM[SS]]] 或 YYYY-MM-DD
+DIR_TIME_PATTERN = re.compile(r"(?<!\d)(\d{4}-\d{2}-\d{2}|\d{14}|\d{12}|\d{10}|\d{8})(?!\d)")
+# 文件名中的时间: _YYYYMMDDHHMMSS 或 -YYYYMMDDHHMMSS
+FILE_TIME_PATTERN = re.compile(r"[_-](\d{14})")
+TIME_SPANS = {
+    8: ("%Y%m%d", timedelta(days=1)),
+    10: ("%Y%m%d%H", timedelta(hours=1)),
+    12: ("%Y%m%d%H%M", timedelta(minutes=1)),
+    14: ("%Y%m%d%H%M%S", timedelta(seconds=1)),
+}
+# 只有年份在该范围内的数字才视为时间, 避免把形如 10011201 的普通编号当作日期剪枝
+TIME_YEARS = (2000, 2099)
+
+
+def name_time_span(name: str, is_dir: bool) -> Optional[Tuple[datetime, datetime]]:
+    """从目录名或文件名中提取时间范围
+
+    Args:
+        name: 目录名或文件名(不含路径)
+        is_dir: 是否为目录
+    Returns:
+        (开始时间, 结束时间), 名称中不含有效时间时返回None
+    """
+    for match in (DIR_TIME_PATTERN if is_dir else FILE_TIME_PATTERN).finditer(name):
+        value = match.group(1).replace("-", "")
+        time_format, span = TIME_SPANS[len(value)]
+        try:
+            start = datetime.strptime(value, time_format)
+        except ValueError:
+            continue
+        if TIME_YEARS[0] <= start.year <= TIME_YEARS[1]:
+            return start, start + span
+    return None
+
+
+class ScanEntry(NamedTuple):
+    """目录项"""
+    path: str
+    is_dir: bool
+    size: Optional[int] = None
+    mtime: Optional[float] = None
+
+
+@dataclass
+class ScanFilter:
+    """扫描条件, 在遍历过程中用于剪枝
+
+    Attributes:
+        pattern: 文件路径过滤正则
+        since: 时间窗口开始, 目录名/文件名中的时间早于该时间时跳过
+        until: 时间窗口结束, 目录名/文件名中的时间晚于该时间时跳过
+        include: 路径前缀白名单, 为空时不限制
+        exclude: 路径前缀黑名单
+        max_depth: 最大目录深度, 扫描根目录为0, None表示不限制
+    """
+    pattern: Optional[str] = None
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+    include: List[str] = field(default_factory=list)
+    exclude: List[str] = field(default_factory=list)
+    max_depth: Optional[int] = None
+
+    def __post_init__(self):
+        self.include = [prefix.rstrip("/") for prefix in self.include if prefix]
+        self.exclude = [prefix.rstrip("/") for prefix in self.exclude if prefix]
+
+    @staticmethod
+    def _under(path: str, prefix: str) -> bool:
+        return path == prefix or path.startswith(prefix + "/")
+
+    def _in_window(self, name: str, is_dir: bool) -> bool:
+        if not self.since and not self.until:
+            return True
+        if not (span := name_time_span(name, is_dir)):
+            return True
+        start, end = span
+        return not ((self.since and end <= self.since) or (self.until and start > self.until))
+
+    def allow_dir(self, path: str, depth: int) -> bool:
+        """是否需要遍历该目录"""
+        path = path.rstrip("/")
+        if self.max_depth is not None and depth > self.max_depth:
+            return False
+        if any(self._under(path, prefix) for prefix in self.exclude):
+            return False
+        if self.include and not any(self._under(path, prefix) or self._under(prefix, path) for prefix in self.include):
+            return False
+        return self._in_window(path.rsplit("/", 1)[-1], True)
+
+    def allow_file(self, path: str) -> bool:
+        """文件是否满足条件"""
+        if any(self._under(path, prefix) for prefix in self.exclude):
+            return False
+        if self.include and not any(self._under(path, prefix) for prefix in self.include):
+            return False
+        if not self._in_window(path.rsplit("/", 1)[-1], False):
+            return False
+        return not self.pattern or re.search(self.pattern, path) is not None
+
+
 class NDSError(Exception):
     """NDS客户端异常基类"""
 
@@ -102,9 +237,15 @@ class NDSClient:
     SUPPORTED_PROTOCOLS = {"FTP", "SFTP"}
     RETRY_COUNT = 3
     RETRY_DELAY = 1  # 秒
+    FTP_BLOCK_SIZE = 64 * 1024  # FTP 数据连接单次读取字节数
+    ZIP_TAIL_SIZE = 128 * 1024  # get_zip_info 尾部预读字节数, 需大于 EOCD + 最大注释长度(65557)
+    SFTP_CHUNK_SIZE = 4 * 1024 * 1024  # iter_read 单次交给 asyncssh 并行读取的字节数
 
     def __init__(self, protocol: str, host: str, port: int, user: str, passwd: str,
-                 pool_num: Optional[int] = None, nds_id: Optional[str] = None):
+                 pool_num: Optional[int] = None, nds_id: Optional[str] = None,
+                 scan_concurrency: int = 4, scan_limit: Optional[asyncio.Semaphore] = None,
+                 read_block_size: Optional[int] = None, read_pipeline: Optional[int] = None,
+                 governor: Optional[Governor] = None, ssh_mux: Optional[SSHMux] = None):
         if protocol not in self.SUPPORTED_PROTOCOLS:
             raise NDSError(f"Unsupported protocol: {protocol}", level=1, nds_id=nds_id)
 
@@ -115,6 +256,12 @@ class NDSClient:
         self.passwd = passwd
         self.pool_num = pool_num
         self.ID = int(nds_id) if nds_id is not None else None
+        self.scan_concurrency = scan_concurrency  # SFTP扫描时单个会话的并发目录请求数
+        self.scan_limit = scan_limit  # 同一NDS所有连接共享的目录请求上限
+        self.read_block_size = read_block_size  # SFTP单个读取请求的大小, 为空时使用服务器的 max_read_len
+        self.read_pipeline = read_pipeline  # SFTP单次读取时同时未完成的请求数, 为空时使用 asyncssh 默认的128
+        self.governor = governor  # 同一NDS所有连接共享的字节与操作速率限制
+        self.ssh_mux = ssh_mux  # SFTP会话作为通道复用的SSH连接, 为空时独占一个SSH连接
 
         # 私有属性
         self.__ftp = None
@@ -137,16 +284,30 @@ class NDSClient:
         finally:
             await self.close_connect()
 
+    async def _throttle(self, ops: int = 0, nbytes: int = 0) -> None:
+        """按NDS限速获取操作与字节配额"""
+        if self.governor is not None:
+            await self.governor.acquire(ops, nbytes)
+
     async def connect(self, retry_count: int = None):
         """建立连接"""
         retry = self.RETRY_COUNT if not retry_count else retry_count
         for attempt in range(retry):
             try:
+                await self._throttle(ops=1)
                 if self.protocol == "FTP":
                     self.__ftp = aioftp.Client()
                     await self.__ftp.connect(self.host, self.port)
                     await self.__ftp.login(self.user, self.passwd)
                     self.client = self.__ftp
+                elif self.ssh_mux is not None:  # SFTP, 复用SSH连接
+                    self.__sftp = await self.ssh_mux.acquire()
+                    try:
+                        self.client = await self.__sftp.start_sftp_client()
+                    except Exception:
+                        self.ssh_mux.release(self.__sftp, broken=True)
+                        self.__sftp = None
+                        raise
                 else:  # SFTP
                     self.__sftp = await asyncssh.connect(
                         host=self.host,
@@ -158,7 +319,7 @@ class NDSClient:
                     self.client = await self.__sftp.start_sftp_client()
                 return True
             except Exception as e:
-                if attempt == self.RETRY_COUNT - 1:
+                if attempt == retry - 1:
                     raise NDSConnectError(f"Connect error after {retry} attempts: {str(e)}", level=1, nds_id=self.ID)
                 await asyncio.sleep(self.RETRY_DELAY)
 
@@ -204,6 +365,12 @@ class NDSClient:
             log.warning(f"[NDS_ID:{self.ID}] Connection check failed: {str(e)}")
             return False
 
+    def is_closed(self) -> bool:
+        """不发送请求判断连接是否已断开, 仅能发现SFTP底层SSH连接断开"""
+        if not self.client:
+            return True
+        return self.protocol == "SFTP" and self.__sftp is not None and self.__sftp.is_closed()
+
     async def close_connect(self):
         """关闭连接"""
         try:
@@ -212,6 +379,14 @@ class NDSClient:
                     await self.__ftp.quit()
                 except Exception as e:
                     log.warning(f"[NDS_ID:{self.ID}] Error closing FTP connection: {e}")
+            elif self.protocol == "SFTP" and self.__sftp and self.ssh_mux is not None:
+                try:
+                    if self.client:
+                        self.client.exit()
+                except Exception as e:
+                    log.warning(f"[NDS_ID:{self.ID}] Error closing SFTP channel: {e}")
+                finally:
+                    self.ssh_mux.release(self.__sftp)
             elif self.protocol == "SFTP" and self.__sftp:
                 try:
                     self.__sftp.close()
@@ -225,51 +400,161 @@ class NDSClient:
             self.__ftp = None
             self.__sftp = None
 
-    async def scan(self, scan_path: str, filter_pattern: Optional[str] = None) -> List[str]:
+    async def scan(self, scan_path: str, filter_pattern: Optional[str] = None,
+                   scan_filter: Optional[ScanFilter] = None, snapshot: Optional[Any] = None) -> List[str]:
         """扫描远程目录并返回文件列表"""
+        files = []
+        async for batch in self.iter_scan(scan_path, filter_pattern, scan_filter, snapshot):
+            files.extend(batch)
+        return files
+
+    async def iter_scan(self, scan_path: str, filter_pattern: Optional[str] = None,
+                        scan_filter: Optional[ScanFilter] = None, snapshot: Optional[Any] = None) -> AsyncIterator[List[str]]:
+        """扫描远程目录, 每个目录遍历完成后返回其中满足条件的文件
+
+        Args:
+            scan_path: 扫描根目录
+            filter_pattern: 文件路径过滤正则, 未在 scan_filter 中指定 pattern 时使用
+            scan_filter: 扫描条件, 时间窗口、路径前缀和深度用于跳过整个子目录
+            snapshot: 目录快照, 修改时间未变化的目录不再重新列出
+        Yields:
+            单个目录中满足条件的文件路径列表
+        """
         if not scan_path:
             raise NDSError("Invalid scan path", level=1)
 
-        files = []
-        use_filter = True if filter_pattern and is_regex(filter_pattern) else False
-        if filter_pattern and not use_filter:
+        scan_filter = scan_filter or ScanFilter()
+        scan_filter.pattern = scan_filter.pattern or filter_pattern
+        if scan_filter.pattern and not is_regex(scan_filter.pattern):
             raise NDSError("Scanner filter error", level=1)
 
         if self.client is None:
             raise NDSError("Not init NDS Client", "NDSClient.scan", -1)
 
         if self.protocol == "FTP":
-
+            # FTP控制连接不支持并发请求, 逐个目录遍历
             try:
-                async for path, info in self.client.list(scan_path, recursive=True):
-                    if info.get('type') == 'file':
-                        if use_filter:
-                            if re.search(filter_pattern, str(path)):
-                                files.append(str(path))
-                        else:
-                            files.append(str(path))
+                async for batch in self._walk(scan_path, scan_filter, 1, snapshot):
+                    yield batch
             except Exception as e:
                 await self.close_connect()
                 raise e
-
         elif self.protocol == "SFTP":
-            #  使用队列方式代替函数递归
-            stack = [scan_path]
-            while stack:
-                current_path = stack.pop()
-                async for entry in self.client.scandir(current_path):
-                    full_path = f"{current_path.rstrip('/')}/{entry.filename}"
-                    if stat.S_ISDIR(entry.attrs.permissions):
-                        stack.append(full_path)
-                    else:
-                        if use_filter:
-                            if re.search(filter_pattern, str(full_path)):
-                                files.append(str(full_path))
-                        else:
-                            files.append(str(full_path))
+            async for batch in self._walk(scan_path, scan_filter, self.scan_concurrency, snapshot):
+                yield batch
         else:
             raise NDSError("Invalid protocol, only support FTP and SFTP", "NDSClient.scan", 1)
-        return files
+
+    async def _list_dir(self, path: str) -> List[ScanEntry]:
+        """列出目录内容(不递归)"""
+        await self._throttle(ops=1)
+        entries = []
+        if self.protocol == "FTP":
+            async for entry_path, info in self.client.list(path, recursive=False):
+                entry_type = info.get("type")
+                if entry_type not in ("file", "dir"):
+                    continue
+                mtime = self._ftp_mtime(info)
+                size = int(info["size"]) if info.get("size") else None
+                entries.append(ScanEntry(str(entry_path), entry_type == "dir", size, mtime))
+        else:
+            async for entry in self.client.scandir(path):
+                if entry.filename in (".", ".."):
+                    continue
+                full_path = f"{path.rstrip('/')}/{entry.filename}"
+                is_dir = stat.S_ISDIR(entry.attrs.permissions)
+                entries.append(ScanEntry(full_path, is_dir, entry.attrs.size, entry.attrs.mtime))
+        return entries
+
+    @staticmethod
+    def _ftp_mtime(info: Dict[str, Any]) -> Optional[float]:
+        """解析FTP MLSD/MLST 的修改时间(UTC)"""
+        modify = info.get("modify")
+        if not modify:
+            return None
+        try:
+            return datetime.strptime(modify[:14], "%Y%m%d%H%M%S").replace(tzinfo=timezone.utc).timestamp()
+        except ValueError:
+            return None
+
+    async def _dir_mtime(self, path: str) -> Optional[float]:
+        """获取目录修改时间, 获取失败时返回None"""
+        try:
+            await self._throttle(ops=1)
+            info = await self.client.stat(path)
+            return self._ftp_mtime(info) if self.protocol == "FTP" else info.mtime
+        except Exception:
+            return None
+
+    async def _walk(self, scan_path: str, scan_filter: ScanFilter, concurrency: int,
+                    snapshot: Optional[Any] = None) -> AsyncIterator[List[str]]:
+        """并发广度优先遍历目录, 每个目录遍历完成后返回其中满足条件的文件
+
+        同一会话上最多同时进行 concurrency 个目录请求,
+        同一NDS所有连接的目录请求总数受 scan_limit 限制; 不满足 scan_filter 的子目录不会被遍历。
+        指定 snapshot 时, 修改时间未变化的目录直接使用快照中的目录项, 只需获取其子目录的修改时间
+
+        Args:
+            scan_path: 扫描根目录
+            scan_filter: 扫描条件
+            concurrency: 并发目录请求数
+            snapshot: 目录快照, 需提供 lookup(path, mtime) 与 store(path, mtime, entries)
+        Yields:
+            单个目录中满足条件的文件路径列表
+        """
+        # 队列项: (目录, 深度, 修改时间, 修改时间是否来自最新的父目录列表)
+        directories: asyncio.Queue[Tuple[str, int, Optional[float], bool]] = asyncio.Queue()
+        results: asyncio.Queue = asyncio.Queue()
+        pending = 1  # 已入队但未完成遍历的目录数
+        directories.put_nowait((scan_path, 0, None, False))
+
+        async def _visit(current_path: str, depth: int, mtime: Optional[float], fresh: bool) -> None:
+            nonlocal pending
+            entries = None
+            async with self.scan_limit or contextlib.nullcontext():
+                if snapshot is not None:
+                    if not fresh:
+                        mtime = await self._dir_mtime(current_path)
+                    entries = snapshot.lookup(current_path, mtime)
+                reused = entries is not None
+                if not reused:
+                    entries = await self._list_dir(current_path)
+                    if snapshot is not None:
+                        snapshot.store(current_path, mtime, entries)
+            files = []
+            for entry in entries:
+                if entry.is_dir:
+                    if scan_filter.allow_dir(entry.path, depth + 1):
+                        pending += 1
+                        directories.put_nowait((entry.path, depth + 1, entry.mtime, not reused))
+                elif scan_filter.allow_file(entry.path):
+                    files.append(entry.path)
+            results.put_nowait(files)
+
+        async def _worker() -> None:
+            nonlocal pending
+            while True:
+                current_path, depth, mtime, fresh = await directories.get()
+                try:
+                    await _visit(current_path, depth, mtime, fresh)
+                except Exception as e:
+                    results.put_nowait(e)
+                    return
+                pending -= 1
+                if pending == 0:
+                    results.put_nowait(None)
+
+        workers = [asyncio.create_task(_worker()) for _ in range(max(1, concurrency))]
+        try:
+            while (item := await results.get()) is not None:
+                if isinstance(item, Exception):
+                    raise item
+                if item:
+                    yield item
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
 
     async def file_exists(self, remote_path: str) -> bool:
         """检查远程文件是否存在"""
@@ -282,10 +567,9 @@ class NDSClient:
             raise NDSError(str(e), f"NDSClient.file_exists remote_path:{remote_path}", 1, self.ID)
 
     async def stat(self, file_path: str) -> Optional[Dict[str, Any]]:
-        """获取文件状态信息"""
+        """获取文件状态信息, 文件不存在或获取失败时返回None"""
         try:
-            if not await self.file_exists(file_path):
-                return None
+            await self._throttle(ops=1)
             info_obj = await self.client.stat(file_path)
             if not info_obj:
                 return None
@@ -299,8 +583,8 @@ class NDSClient:
                 ).strftime('%Y-%m-%d %H:%M:%S') if modify else modify
             elif self.protocol == "SFTP":
                 info = {attr: getattr(info_obj, attr, None) for attr in dir(info_obj) if not attr.startswith('_')}
-                modify = info.get('modify')
-                modify = datetime.fromtimestamp(modify).strftime('%Y-%m-%d %H:%M:%S') if modify else modify
+                modify = info.get('mtime')  # SFTPAttrs 的修改时间字段为 mtime
+                modify = datetime.fromtimestamp(modify).strftime('%Y-%m-%d %H:%M:%S') if modify is not None else modify
             else:
                 return None
 
@@ -326,12 +610,24 @@ class NDSClient:
         except Exception as e:
             log.error(f"[NDS_ID:{self.ID}] Error in close: {e}")
 
-    async def open(self, file_path):
-        self.stream_info = await self.stat(file_path)
+    async def open(self, file_path, stream_info: Optional[Dict[str, Any]] = None):
+        """打开文件
+
+        Args:
+            file_path: 文件路径
+            stream_info: 刚通过 stat 获取的文件状态, 为空时重新获取
+        """
+        self.stream_info = stream_info or await self.stat(file_path)
         if not self.stream_info:
             raise NDSFileNotFoundError(f"File not found: {file_path}", nds_id=self.ID)
         if self.protocol == "SFTP":
-            self.__stream = await self.client.open(file_path, 'rb')
+            # asyncssh 将大于 block_size 的读取拆分为最多 max_requests 个并行请求, 只传入显式配置的参数
+            options = {}
+            if self.read_block_size:
+                options["block_size"] = self.read_block_size
+            if self.read_pipeline:
+                options["max_requests"] = self.read_pipeline
+            self.__stream = await self.client.open(file_path, 'rb', **options)
         self.stream_path = file_path
 
     async def seek(self, offset: int = 0, whence: int = 0) -> None:
@@ -354,14 +650,16 @@ class NDSClient:
                 else offset
             )
 
-    async def read(self, size: Optional[int] = None, offset: Optional[int] = None) -> bytes:
+    async def read(self, size: Optional[int] = None, offset: Optional[int] = None) -> Buffer:
         """读取文件内容
 
+        FTP 直接读入预分配的 bytearray, SFTP 返回 asyncssh 读取的 bytes, 读取结果不再额外复制
+
         Args:
             size: 要读取的字节数, None表示读取到文件末尾
             offset: 偏移量(0:开始, 1:当前, 2:结尾), None表示不设置偏移量, 可配合seek使用
         Returns:
-            读取的字节数据
+            读取的字节数据(bytes 或 bytearray)
         Raises:
             NDSIOError: 读取过程中发生错误
         """
@@ -375,28 +673,19 @@ class NDSClient:
         async with self._lock:
             if self.protocol == "FTP":
                 try:
+                    size = size if size and self.__stream_offset + size <= self.stream_info['size'] else \
+                        self.stream_info['size'] - self.__stream_offset
+                    await self._throttle(ops=1, nbytes=size)
                     stream = await self.client.get_stream(
                         "RETR " + self.stream_path,
                         ('1xx', '200', '250'),  # 接受更多有效的FTP响应码
                         offset=self.__stream_offset
                     )
-                    tmp_io = BytesIO()
-                    size = size if size and self.__stream_offset + size <= self.stream_info['size'] else \
-                        self.stream_info['size'] - self.__stream_offset
-                    total = size
-                    offset = self.__stream_offset
-                    while total > 0:
-                        block = await stream.read(min(abs(total), 2048))
-                        if not block:
-                            break
-                        tmp_io.write(block)
-                        total -= len(block)
-                        offset += len(block)
-                        if size and tmp_io.tell() >= size:
-                            await stream.finish('xxx')
-                            break
+                    data = await read_stream_into(stream, size, self.FTP_BLOCK_SIZE)
+                    if size and len(data) >= size:
+                        await stream.finish('xxx')
                     self.__stream_offset = self.__stream_offset + size if size else self.stream_info["size"]
-                    return tmp_io.getvalue()[0:size]
+                    return data
                 except Exception as e:
                     raise NDSError(f'read warning: {e}', "NDSClient.read", -1, self.ID)
             elif self.protocol == "SFTP":
@@ -405,6 +694,7 @@ class NDSClient:
                 try:
                     size = size if size and self.__stream_offset + size <= self.stream_info['size'] else \
                         self.stream_info['size'] - self.__stream_offset
+                    await self._throttle(nbytes=size)
                     data = await self.__stream.read(size, self.__stream_offset)
                     self.__stream_offset = self.__stream_offset + size if size else self.stream_info['size']
                 except Exception as e:
@@ -413,11 +703,129 @@ class NDSClient:
             else:
                 raise NDSError("Invalid protocol, only support FTP and SFTP", "NDSClient.read", 1, self.ID)
 
-    async def get_zip_info(self, file_path: str = None) -> list[KeyType[Any, Any]]:
+    async def iter_read(self, size: Optional[int] = None, block_size: int = 512 * 1024,
+                        headroom: int = 0) -> AsyncIterator[Union[Buffer, FrameBuffer]]:
+        """从当前位置开始按块读取文件内容
+
+        FTP 只建立一次数据连接连续读取, SFTP 按块读取; 调用方提前结束迭代时会关闭FTP数据连接。
+        指定 headroom 时FTP数据直接读入预留了帧头空间的 FrameBuffer, 发送时不再复制;
+        SFTP 的数据由 asyncssh 返回, 忽略 headroom
+
+        Args:
+            size: 要读取的字节数, None表示读取到文件末尾
+            block_size: 每块的最大字节数
+            headroom: 每块预留的帧头字节数
+        Yields:
+            文件数据块
+        Raises:
+            NDSError: 读取过程中发生错误
+        """
+        if self.client is None:
+            raise NDSError("Not init NDS Client", "NDSClient.iter_read", -1, self.ID)
+        if self.stream_path is None:
+            raise NDSError("File is not open", "NDSClient.iter_read", 0, self.ID)
+
+        async with self._lock:
+            remaining = self.stream_info['size'] - self.__stream_offset
+            remaining = max(0, min(size, remaining) if size else remaining)
+            if self.protocol == "FTP":
+                try:
+                    await self._throttle(ops=1)
+                    stream = await self.client.get_stream(
+                        "RETR " + self.stream_path,
+                        ('1xx', '200', '250'),
+                        offset=self.__stream_offset
+                    )
+                except Exception as e:
+                    raise NDSError(f'read warning: {e}', "NDSClient.iter_read", -1, self.ID)
+                try:
+                    while remaining > 0:
+                        try:
+                            await self._throttle(nbytes=min(remaining, block_size))
+                            block = await read_stream_into(stream, min(remaining, block_size), self.FTP_BLOCK_SIZE,
+                                                           headroom)
+                        except Exception as e:
+                            raise NDSError(f'read warning: {e}', "NDSClient.iter_read", -1, self.ID)
+                        if len(block) <= headroom:
+                            break
+                        remaining -= len(block) - headroom
+                        self.__stream_offset += len(block) - headroom
+                        yield FrameBuffer(block, headroom) if headroom else block
+                finally:
+                    with contextlib.suppress(Exception):
+                        await stream.finish('xxx')
+            elif self.protocol == "SFTP":
+                if self.__stream is None:
+                    raise NDSError("File is not open", "NDSClient.iter_read", 1, self.ID)
+                # 每次交给 asyncssh 一个较大的区间并行读取, 返回当前区间时下一个区间已在读取中, 请求队列不会在区间边界排空
+                chunk_size = max(block_size, self.SFTP_CHUNK_SIZE, (self.read_block_size or 0) * (self.read_pipeline or 0))
+
+                async def fetch(offset: int, length: int) -> bytes:
+                    await self._throttle(nbytes=length)
+                    return await self.__stream.read(length, offset)
+
+                position = self.__stream_offset
+                length = min(remaining, chunk_size)
+                pending = asyncio.ensure_future(fetch(position, length)) if length > 0 else None
+                try:
+                    while pending is not None:
+                        data = await pending
+                        pending = None
+                        if not data:
+                            break
+                        position += len(data)
+                        left = remaining - len(data)
+                        if len(data) == length and left > 0:
+                            length = min(left, chunk_size)
+                            pending = asyncio.ensure_future(fetch(position, length))
+                        view = memoryview(data)
+                        for start in range(0, len(view), block_size):
+                            block = view[start:start + block_size]
+                            self.__stream_offset += len(block)
+                            remaining -= len(block)
+                            yield block
+                except NDSError:
+                    raise
+                except Exception as e:
+                    raise NDSError(f'read warning: {e}', "NDSClient.iter_read", -1, self.ID)
+                finally:
+                    if pending is not None:
+                        pending.cancel()
+                        with contextlib.suppress(BaseException):
+                            await pending
+            else:
+                raise NDSError("Invalid protocol, only support FTP and SFTP", "NDSClient.iter_read", 1, self.ID)
+
+    @staticmethod
+    def _find_end_record(tail: bytes) -> int:
+        """在文件尾部数据中查找中央目录结束记录(EOCD)的位置
+
+        EOCD之后只允许跟随注释, 注释长度必须与尾部剩余字节数一致
+
+        Args:
+            tail: 以文件末尾结束的数据
+        Returns:
+            EOCD在tail中的位置, 未找到返回-1
+        """
+        cd_end_size = struct.calcsize(ZIP_END_RECORD)
+        pos = len(tail)
+        while (pos := tail.rfind(ZIP_END_MAGIC, 0, pos)) >= 0:
+            if pos + cd_end_size <= len(tail):
+                comment_size = struct.unpack_from(ZIP_END_RECORD, tail, pos)[-1]
+                if pos + cd_end_size + comment_size == len(tail):
+                    return pos
+        return -1
+
+    async def get_zip_info(self, file_path: str = None, tail_size: Optional[int] = None) -> list[KeyType[Any, Any]]:
         """解析ZIP文件结构并返回文件信息列表
 
+        一次读取文件尾部 tail_size 字节, 在其中定位EOCD、ZIP64结构和中央目录,
+        仅当中央目录超出尾部数据时才再读取一次; 本地文件头取自第一个条目的位置,
+        位于尾部数据内时直接截取, 否则再读取一次
+
         Args:
             file_path: 文件路径, 为None时使用当前打开的文件
+            tail_size: 尾部预读字节数, 默认 ZIP_TAIL_SIZE
         Returns:
             文件信息列表
         Raises:
@@ -425,59 +833,67 @@ class NDSClient:
         """
         if file_path:
             await self.open(file_path)
-        # 读取文件头
+        file_size = self.stream_info['size']
         header_size = struct.calcsize(ZIP_LOCAL_HEADER)
-        await self.seek(0, 0)
-        tmp_data = await self.read(header_size)
-        header_data = struct.unpack(ZIP_LOCAL_HEADER, tmp_data)
-        if len(tmp_data) != header_size or header_data[0] != ZIP_MAGIC:
-            raise Exception("ZIP header warning")
-        self.stream_info['header_size'] = header_data[10] + header_data[11] + header_size
-        # 解析中央目录结构
         cd_end_size = struct.calcsize(ZIP_END_RECORD)  # sizeEndCentDir
-        await self.seek(cd_end_size, 2)
-        tmp_data = await self.read()
-        if len(tmp_data) != cd_end_size or tmp_data[0:4] != ZIP_END_MAGIC or tmp_data[-2:] != b"\000\000":
-            raise Exception("ZIP CentDirectory warning")  # 要么不是ZIP文件，要么带了注释，暂时不解决注释问题
-        cd_rec = struct.unpack(ZIP_END_RECORD, tmp_data)
-        cd_rec = list(cd_rec)
-        cd_rec.append(b"")
-        cd_rec.append(self.stream_info['size'] - cd_end_size)
-        # 尝试读取ZIP64中央目录文件(用于兼容ZIP64)
         cd_end_64_size = struct.calcsize(ZIP64_END_RECORD)  # sizeEndCentDir64
         cd_end_l64_size = struct.calcsize(ZIP64_LOCATOR_RECORD)  # sizeEndCentDir64Locator
-        if cd_end_size + cd_end_l64_size < self.stream_info['size']:
-            await self.seek(-cd_end_size - cd_end_l64_size, 2)
-            tmp_data = await self.read(cd_end_l64_size)
-            if len(tmp_data) == cd_end_l64_size:
-                sig, disk_no, _rel_off, disks = struct.unpack(ZIP64_LOCATOR_RECORD, tmp_data)
-                if sig == ZIP64_LOCATOR:
-                    if disk_no != 0 or disks > 1:
-                        raise Exception("ZIP Files that span multiple disks are not supported")
-                    # Assume no 'zip64 extensible data'
-                    await self.seek(-cd_end_64_size - cd_end_l64_size - cd_end_64_size, 2)
-                    tmp_data = await self.read(cd_end_64_size)
-                    if len(tmp_data) == cd_end_64_size:
-                        sig, _sz, _create_version, _read_version, disk_num, disk_dir, \
-                            dir_count, dir_count2, dir_size, dir_offset = \
-                            struct.unpack(ZIP64_END_RECORD, tmp_data)
-                        if sig == ZIP64_MAGIC:
-                            # 更新为ZIP64中央目录结构
-                            cd_rec[0] = sig  # _ECD_SIGNATURE
-                            cd_rec[1] = disk_num  # _ECD_DISK_NUMBER
-                            cd_rec[2] = disk_dir  # _ECD_DISK_START
-                            cd_rec[3] = dir_count  # _ECD_ENTRIES_THIS_DISK
-                            cd_rec[4] = dir_count2  # _ECD_ENTRIES_TOTAL
-                            cd_rec[5] = dir_size  # _ECD_SIZE
-                            cd_rec[6] = dir_offset  # _ECD_OFFSET
+        if file_size < header_size + cd_end_size:
+            raise NDSZipError(f"ZIP file too small: {self.stream_path}", nds_id=self.ID)
+
+        # 读取文件尾部
+        tail_size = min(file_size, tail_size or self.ZIP_TAIL_SIZE)
+        tail_offset = file_size - tail_size
+        await self.seek(tail_offset, 0)
+        tail = await self.read(tail_size)
+        if len(tail) != tail_size:
+            raise NDSZipError("ZIP tail read incomplete", nds_id=self.ID)
+
+        # 定位中央目录结束记录(支持带注释的ZIP文件)
+        end_pos = self._find_end_record(tail)
+        if end_pos < 0:
+            raise NDSZipError("ZIP CentDirectory warning", nds_id=self.ID)
+        cd_rec = list(struct.unpack_from(ZIP_END_RECORD, tail, end_pos))
+        cd_location = tail_offset + end_pos  # _ECD_LOCATION EOCD在文件中的位置
+        is_zip64 = False
+
+        # 尝试读取ZIP64中央目录结构(用于兼容ZIP64), 假定不存在 'zip64 extensible data'
+        locator_pos = end_pos - cd_end_l64_size
+        if locator_pos >= 0:
+            sig, disk_no, _rel_off, disks = struct.unpack_from(ZIP64_LOCATOR_RECORD, tail, locator_pos)
+            if sig == ZIP64_LOCATOR:
+                if disk_no != 0 or disks > 1:
+                    raise NDSZipError("ZIP Files that span multiple disks are not supported", nds_id=self.ID)
+                end_64_pos = locator_pos - cd_end_64_size
+                if end_64_pos >= 0:
+                    sig, _sz, _create_version, _read_version, disk_num, disk_dir, \
+                        dir_count, dir_count2, dir_size, dir_offset = \
+                        struct.unpack_from(ZIP64_END_RECORD, tail, end_64_pos)
+                    if sig == ZIP64_MAGIC:
+                        # 更新为ZIP64中央目录结构
+                        cd_rec[0] = sig  # _ECD_SIGNATURE
+                        cd_rec[1] = disk_num  # _ECD_DISK_NUMBER
+                        cd_rec[2] = disk_dir  # _ECD_DISK_START
+                        cd_rec[3] = dir_count  # _ECD_ENTRIES_THIS_DISK
+                        cd_rec[4] = dir_count2  # _ECD_ENTRIES_TOTAL
+                        cd_rec[5] = dir_size  # _ECD_SIZE
+                        cd_rec[6] = dir_offset  # _ECD_OFFSET
+                        is_zip64 = True
+
         cd_end_size = cd_rec[5]  # _ECD_SIZE 中央目录字节尺寸
         cd_offset = cd_rec[6]  # _ECD_OFFSET 中央目录开始位置
-        concat = cd_rec[9] - cd_end_size - cd_offset  # _ECD_LOCATION = 9
-        concat -= (cd_end_64_size + cd_end_l64_size) if cd_rec[0] == ZIP64_MAGIC else 0  # ZIP64扩展结构
+        concat = cd_location - cd_end_size - cd_offset
+        concat -= (cd_end_64_size + cd_end_l64_size) if is_zip64 else 0  # ZIP64扩展结构
         offset = cd_offset + concat
-        await self.seek(offset, 0)
-        tmp_data = await self.read(cd_end_size)
-        await self.close()
+        if offset < 0 or offset + cd_end_size > file_size:
+            raise NDSZipError("Bad central directory offset", nds_id=self.ID)
+
+        # 中央目录在尾部数据内时直接截取, 否则再读取一次
+        if offset >= tail_offset:
+            tmp_data = tail[offset - tail_offset:offset - tail_offset + cd_end_size]
+        else:
+            await self.seek(offset, 0)
+            tmp_data = await self.read(cd_end_size)
         data = BytesIO(tmp_data)
         cd_dir_size = struct.calcsize(ZIP_CENTRAL_DIR)  # sizeCentralDir
         total = 0
@@ -499,9 +915,9 @@ class NDSClient:
             # _MASK_UTF_FILENAME = 1 << 11 = 2048
             info.sub_file_name = info.sub_file_name.decode('utf-8') if flags & 2048 else info.sub_file_name.decode(
                 'cp437')
-            # _CD_LOCAL_HEADER_OFFSET 文件开始位置，需要加上文件头尺寸
+            # _CD_LOCAL_HEADER_OFFSET 文件开始位置，解析文件头后加上文件前附加数据长度与文件头尺寸
             info.file_path = self.stream_info['file_path']
-            info.header_offset = centdir[18] + self.stream_info['header_size']
+            info.header_offset = centdir[18]
             info.compress_size = centdir[10]
             info.file_size = centdir[11]
             info.flag_bits = centdir[5]
@@ -519,6 +935,25 @@ class NDSClient:
             # _CD_COMMENT_LENGTH = 14 // 注释
             data.seek(centdir[13] + centdir[14], 1)
             total = total + cd_dir_size + centdir[12] + centdir[13] + centdir[14]
+
+        # 读取第一个条目的本地文件头, 位于尾部数据内时直接截取
+        first = min((info.header_offset for info in file_info_array), default=0) + concat
+        if first < 0:
+            raise NDSZipError("Bad local header offset", nds_id=self.ID)
+        if tail_offset <= first and first + header_size <= file_size:
+            tmp_data = tail[first - tail_offset:first - tail_offset + header_size]
+        else:
+            await self.seek(first, 0)
+            tmp_data = await self.read(header_size)
+        await self.close()
+        if len(tmp_data) != header_size:
+            raise NDSZipError("ZIP header warning", nds_id=self.ID)
+        header_data = struct.unpack(ZIP_LOCAL_HEADER, tmp_data)
+        if header_data[0] != ZIP_MAGIC:
+            raise NDSZipError("ZIP header warning", nds_id=self.ID)
+        self.stream_info['header_size'] = header_data[10] + header_data[11] + header_size
+        for info in file_info_array:
+            info.header_offset += concat + self.stream_info['header_size']
         return file_info_array
 
     @asynccontextmanager
@@ -539,7 +974,7 @@ class NDSClient:
             if not await self.check_connect():
                 await self.connect()
 
-    async def read_file_bytes(self, file_path: str, header_offset: int = 0, size: Optional[int] = None) -> bytes:
+    async def read_file_bytes(self, file_path: str, header_offset: int = 0, size: Optional[int] = None) -> Buffer:
         """读取文件内容
 
         Args:
@@ -548,7 +983,7 @@ class NDSClient:
             size: 要读取的字节数, None表示读取到文件末尾
 
         Returns:
-            bytes: 读取的字节数据
+            bytes | bytearray: 读取的字节数据
 
         Raises:
             NDSError: 文件读取错误
@@ -0,0 +1,117 @@
+import asyncio
+import asyncssh
+from app.core.logger import log
+from typing import Dict, Set, Any
+
+
+class SSHMux:
+    """SSH连接复用
+
+    同一NDS的多个SFTP会话作为通道共用SSH连接, 每个SSH连接最多承载 channels 个SFTP通道。
+    SSH连接数少于 connections 时新通道使用新的SSH连接, 使并发读取分散在多个TCP连接上(默认为1, 即不分散);
+    之后新通道分配给通道最少的连接, 所有连接都已满时新建SSH连接。
+    SSH握手在锁外进行: 新建连接前先预留通道名额, 同时到达的请求加入建立中的连接, 重连时共用一次握手,
+    握手期间已建立连接上的通道分配不受影响。
+    SSH连接上的通道全部关闭后断开连接; 打开通道失败或连接已断开的SSH连接不再分配新通道。
+    """
+
+    def __init__(self, host: str, port: int, user: str, passwd: str, channels: int = 8, connections: int = 1,
+                 nds_id: Any = None):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.passwd = passwd
+        self.channels = max(1, channels)
+        self.connections = max(1, connections)  # 优先分散到的SSH连接数
+        self.nds_id = nds_id
+        self._conns: Dict[asyncssh.SSHClientConnection, int] = {}  # SSH连接 -> 已分配通道数
+        self._retired: Set[asyncssh.SSHClientConnection] = set()  # 不再分配新通道的连接
+        self._pending: Dict[asyncio.Future, int] = {}  # 建立中的SSH连接 -> 已预留通道数
+        self.connects = 0
+
+    async def acquire(self) -> asyncssh.SSHClientConnection:
+        """分配一个通道名额, 返回承载该通道的SSH连接"""
+        # 分配与预留之间没有await, 无需加锁
+        healthy = [conn for conn in self._conns if conn not in self._retired and not conn.is_closed()]
+        usable = [conn for conn in healthy if self._conns[conn] < self.channels]
+        spread = len(healthy) + len(self._pending) >= self.connections
+        if usable and spread:
+            conn = min(usable, key=self._conns.__getitem__)
+            self._conns[conn] += 1
+            return conn
+        joinable = [future for future, count in self._pending.items() if count < self.channels]
+        if joinable and spread:
+            future = min(joinable, key=self._pending.__getitem__)
+            self._pending[future] += 1
+            return await self._join(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[future] = 1
+        try:
+            conn = await asyncssh.connect(
+                host=self.host,
+                port=self.port,
+                username=self.user,
+                password=self.passwd,
+                known_hosts=None
+            )
+        except BaseException as e:
+            self._pending.pop(future, None)
+            future.set_exception(e if isinstance(e, Exception) else ConnectionError("SSH connection cancelled"))
+            future.exception()  # 没有等待者时避免未获取异常的警告
+            raise
+        self.connects += 1
+        self._conns[conn] = self._pending.pop(future)
+        future.set_result(conn)
+        log.debug(f"[NDS_ID:{self.nds_id}] SSH connection opened, {len(self._conns)} connections")
+        return conn
+
+    async def _join(self, future: asyncio.Future) -> asyncssh.SSHClientConnection:
+        """等待建立中的SSH连接, 等待被取消时归还预留的名额"""
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            if future in self._pending:
+                self._pending[future] -= 1
+            elif future.done() and not future.cancelled() and future.exception() is None:
+                self.release(future.result())
+            raise
+
+    def release(self, conn: asyncssh.SSHClientConnection, broken: bool = False) -> None:
+        """释放通道名额, 连接上没有通道时断开连接
+
+        Args:
+            broken: 连接不可用, 不再分配新通道
+        """
+        if broken:
+            self._retired.add(conn)
+        count = self._conns.get(conn, 0) - 1
+        if count > 0:
+            self._conns[conn] = count
+            return
+        self._conns.pop(conn, None)
+        self._retired.discard(conn)
+        try:
+            conn.close()
+        except Exception as e:
+            log.warning(f"[NDS_ID:{self.nds_id}] Error closing SSH connection: {e}")
+
+    def close(self) -> None:
+        """断开所有SSH连接"""
+        for conn in list(self._conns):
+            try:
+                conn.close()
+            except Exception:
+                pass
+        self._conns.clear()
+        self._retired.clear()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "connections": len(self._conns),
+            "channels": sum(self._conns.values()),
+            "channels_per_connection": self.channels,
+            "connecting": len(self._pending),
+            "spread_connections": self.connections,
+            "connects": self.connects
+        }
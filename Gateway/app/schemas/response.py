@@ -1,5 +1,5 @@
 import uuid
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Generic, TypeVar, Optional, Dict, Any
 
 
@@ -49,24 +49,22 @@ class ResponseModel(BaseModel, Generic[DataT]):
         examples=["550e8400-e29b-41d4-a716-446655440000"]
     )
     
-    class Config:
-        """Pydantic配置类"""
-        json_schema_extra = {
-            "examples": [{
-                "summary": "成功响应示例",
-                "description": "这是一个成功的响应示例",
-                "value": {
-                    "code": 200,
-                    "message": "success",
-                    "data": {
-                        "id": 1,
-                        "name": "示例数据"
-                    },
-                    "request_id": "550e8400-e29b-41d4-a716-446655440000"
-                }
-            }]
-        }
-        
+    model_config = ConfigDict(json_schema_extra={
+        "examples": [{
+            "summary": "成功响应示例",
+            "description": "这是一个成功的响应示例",
+            "value": {
+                "code": 200,
+                "message": "success",
+                "data": {
+                    "id": 1,
+                    "name": "示例数据"
+                },
+                "request_id": "550e8400-e29b-41d4-a716-446655440000"
+            }
+        }]
+    })
+
 
 # 预定义常用响应类型
 ResponseDict = ResponseModel[Dict[str, Any]]
@@ -0,0 +1,142 @@
+import os
+import mmap
+import time
+from pathlib import Path
+from collections import OrderedDict
+from app.core.logger import log
+from typing import Dict, List, Optional, Tuple, Any
+
+
+BlockKey = Tuple[str, str, str, int, int]  # (nds_id, path, mtime, size, block_no)
+
+
+# noinspection PyBroadException
+class BlockCache:
+    """NDS文件块缓存
+
+    文件按 block_size 切分为固定大小的块, 以 (nds_id, path, mtime, size, block_no) 为键缓存在本地数据文件中,
+    文件被重写或增长后键随之变化, 旧块不再命中; 读取时块长度与预期不一致视为未命中并淘汰。
+    数据文件预分配 max_bytes 大小并通过 mmap 访问, 每个块占用一个槽位, 槽位用尽时按LRU淘汰。
+    文件的 mtime 与大小在 meta_ttl 秒内复用最近一次 stat 的结果, mtime 未知的文件不缓存。索引只保存在内存中, 重启后缓存清空。
+    """
+
+    def __init__(self, path: str, max_bytes: int = 1024 * 1024 * 1024, block_size: int = 1024 * 1024,
+                 meta_ttl: float = 60.0):
+        self.path = path
+        self.block_size = block_size
+        self.slots = max(1, max_bytes // block_size)
+        self.max_bytes = self.slots * block_size
+        self.meta_ttl = meta_ttl
+        self._index: "OrderedDict[BlockKey, Tuple[int, int]]" = OrderedDict()  # 键 -> (槽位, 数据长度)
+        self._free: List[int] = list(range(self.slots - 1, -1, -1))
+        self._meta: "OrderedDict[Tuple[str, str], Tuple[Optional[str], int, float]]" = OrderedDict()
+        self._file = None
+        self._mmap: Optional[mmap.mmap] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._open()
+
+    def _open(self) -> None:
+        """创建数据文件并映射到内存"""
+        try:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, "w+b")
+            self._file.truncate(self.max_bytes)
+            self._mmap = mmap.mmap(self._file.fileno(), self.max_bytes)
+            log.info(f"块缓存已启用: {self.path}, {self.slots}个块, 块大小{self.block_size}")
+        except Exception as e:
+            log.error(f"块缓存启用失败: {e}")
+            self.close()
+
+    def open(self) -> None:
+        """重新打开数据文件(如网关重启后), 已打开时不做处理"""
+        if self._mmap is None:
+            self._open()
+
+    @property
+    def enabled(self) -> bool:
+        return self._mmap is not None
+
+    def remember(self, nds_id: str, path: str, mtime: Optional[str], size: int) -> None:
+        """记录文件的修改时间与大小"""
+        key = (str(nds_id), path)
+        self._meta.pop(key, None)
+        self._meta[key] = (mtime, size, time.monotonic() + self.meta_ttl)
+        while len(self._meta) > 4096:
+            self._meta.popitem(last=False)
+
+    def meta(self, nds_id: str, path: str) -> Optional[Tuple[Optional[str], int]]:
+        """获取未过期的文件修改时间与大小"""
+        if (item := self._meta.get((str(nds_id), path))) is None:
+            return None
+        mtime, size, expires = item
+        if expires < time.monotonic():
+            del self._meta[(str(nds_id), path)]
+            return None
+        return mtime, size
+
+    def contains(self, key: BlockKey) -> bool:
+        return key in self._index
+
+    def get(self, key: BlockKey, length: int) -> Optional[bytes]:
+        """读取长度为 length 的缓存块, 未命中或长度不一致时返回None"""
+        if self._mmap is None or (item := self._index.get(key)) is None:
+            self.misses += 1
+            return None
+        if item[1] != length:
+            self._free.append(self._index.pop(key)[0])
+            self.misses += 1
+            return None
+        self._index.move_to_end(key)
+        self.hits += 1
+        slot, length = item
+        offset = slot * self.block_size
+        return self._mmap[offset:offset + length]
+
+    def put(self, key: BlockKey, data) -> None:
+        """写入缓存块, 槽位用尽时淘汰最久未使用的块"""
+        if self._mmap is None or len(data) > self.block_size:
+            return
+        if (item := self._index.pop(key, None)) is not None:
+            slot = item[0]
+        elif self._free:
+            slot = self._free.pop()
+        else:
+            _, (slot, _) = self._index.popitem(last=False)
+            self.evictions += 1
+        offset = slot * self.block_size
+        self._mmap[offset:offset + len(data)] = data
+        self._index[key] = (slot, len(data))
+
+    def status(self) -> Dict[str, Any]:
+        """获取缓存状态"""
+        return {
+            "enabled": self.enabled,
+            "blocks": len(self._index),
+            "bytes": sum(length for _, length in self._index.values()),
+            "max_bytes": self.max_bytes,
+            "block_size": self.block_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+    def close(self) -> None:
+        """关闭数据文件"""
+        self._index.clear()
+        self._free = list(range(self.slots - 1, -1, -1))
+        try:
+            if self._mmap is not None:
+                self._mmap.close()
+            if self._file is not None:
+                self._file.close()
+        except Exception:
+            pass
+        self._mmap = None
+        self._file = None
+        if os.path.exists(self.path):
+            try:
+                os.remove(self.path)
+            except Exception:
+                pass
@@ -0,0 +1,91 @@
+import time
+from datetime import datetime
+from typing import Dict, Optional, Any
+
+
+class CircuitBreaker:
+    """NDS熔断器
+
+    closed: 正常放行, 连续 threshold 次连接失败后进入 open;
+    open: 请求直接失败, timeout 秒后进入 half_open;
+    half_open: 只放行一个探测请求, 探测成功回到 closed, 失败重新进入 open。
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, threshold: int = 5, timeout: float = 30.0):
+        self.threshold = max(1, threshold)
+        self.timeout = timeout
+        self.state = self.CLOSED
+        self.failures = 0  # 连续失败次数
+        self.opened_at = 0.0
+        self.probing = False  # half_open 状态下是否已有探测请求
+        self.trips = 0  # 熔断次数
+        self.rejected = 0  # 熔断期间直接失败的请求数
+        self.last_error: Optional[str] = None
+        self.last_change: Optional[str] = None
+
+    @property
+    def closed(self) -> bool:
+        return self.state == self.CLOSED
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        self.last_change = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    def allow(self) -> bool:
+        """判断请求是否放行; half_open 状态下放行的请求负责探测"""
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.timeout:
+            self._set_state(self.HALF_OPEN)
+            self.probing = False
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.HALF_OPEN and not self.probing:
+            self.probing = True
+            return True
+        self.rejected += 1
+        return False
+
+    def retry_after(self) -> float:
+        """距离下一次探测的秒数"""
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self.opened_at + self.timeout - time.monotonic())
+
+    def success(self) -> None:
+        """记录连接成功"""
+        self.failures = 0
+        self.probing = False
+        if self.state != self.CLOSED:
+            self._set_state(self.CLOSED)
+
+    def failure(self, error: Optional[str] = None) -> bool:
+        """记录连接失败
+
+        Returns:
+            是否因此进入 open 状态
+        """
+        self.failures += 1
+        self.last_error = error
+        self.probing = False
+        if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.threshold):
+            self._set_state(self.OPEN)
+            self.opened_at = time.monotonic()
+            self.trips += 1
+            return True
+        return False
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "threshold": self.threshold,
+            "timeout": self.timeout,
+            "retry_after": round(self.retry_after(), 1),
+            "trips": self.trips,
+            "rejected": self.rejected,
+            "last_error": self.last_error,
+            "last_change": self.last_change
+        }
@@ -1,9 +1,14 @@
+import time
 import asyncio
 from datetime import datetime
 from app.core.logger import log
-from typing import Dict, Optional
-from dataclasses import dataclass
+from collections import deque
+from typing import Dict, Optional, List, Deque, Any
+from dataclasses import dataclass, field
 from app.core.nds_client import NDSClient
+from app.core.governor import Governor
+from app.core.ssh_mux import SSHMux
+from app.services.circuit_breaker import CircuitBreaker
 from contextlib import asynccontextmanager
 
 
@@ -17,6 +22,18 @@ class NDSError(Exception):
         log.error(f"{nds_info}NDSPool Error: {message}")
 
 
+class NDSUnavailableError(NDSError):
+    """NDS熔断中, 请求直接失败"""
+    code = 503
+
+    def __init__(self, server_id: str, retry_after: float = 0.0):
+        # 熔断期间请求量大, 不逐条记录错误日志
+        Exception.__init__(self, f"NDS {server_id} unavailable (circuit open), retry after {retry_after:.0f}s")
+        self.message = str(self)
+        self.server_id = server_id
+        self.retry_after = retry_after
+
+
 @dataclass
 class PoolConfig:
     """连接池配置"""
@@ -26,98 +43,514 @@ class PoolConfig:
     user: str
     passwd: str
     pool_size: int = 2
+    scan_concurrency: int = 4  # SFTP扫描时单个连接的并发目录请求数
+    scan_max_inflight: int = 16  # 该NDS所有连接同时进行的目录请求上限
+    read_block_size: Optional[int] = None  # SFTP单个读取请求的大小, None表示使用服务器的 max_read_len
+    read_pipeline: Optional[int] = None  # SFTP单次读取时同时未完成的请求数, None表示使用 asyncssh 默认值
+    max_bytes_per_sec: Optional[float] = None  # 读取字节速率上限, None表示不限速
+    max_ops_per_sec: Optional[float] = None  # 操作(连接/stat/目录列表/RETR等)速率上限, None表示不限速
+    min_idle: int = 0  # 预热并保持的空闲连接数
+    check_idle: float = 60.0  # 空闲超过该秒数的连接取出时先检查连接状态
+    adaptive: bool = False  # 根据取连接等待时间与NDS延迟自动调整 pool_size
+    min_size: int = 1  # 自适应模式下 pool_size 的下限
+    max_size: Optional[int] = None  # 自适应模式下 pool_size 的上限, None表示初始 pool_size 的2倍
+    wait_threshold: float = 0.05  # 平均取连接等待超过该秒数时扩容
+    latency_limit: float = 2.0  # 建立/检查连接的平均耗时超过该秒数时视为NDS变慢
+    lane_reserve: Dict[str, int] = field(default_factory=lambda: {"scan": 0, "meta": 1, "read": 1})  # 各通道预留的连接数
+    lane_share: Dict[str, float] = field(default_factory=lambda: {"scan": 0.5, "meta": 1.0, "read": 1.0})  # 各通道最多占用 pool_size 的比例
+    sftp_channels: int = 8  # 每个SSH连接承载的SFTP通道数, 1表示每个连接独占SSH连接
+    ssh_connections: int = 1  # 通道优先分散到的SSH连接数, 大于1时分段读取使用不同的TCP连接
+    breaker_threshold: int = 5  # 连续连接失败该次数后熔断
+    breaker_timeout: float = 30.0  # 熔断后经过该秒数放行一个探测请求
+
+
+@dataclass
+class PoolMetrics:
+    """连接池运行统计, 用于自适应调整连接数"""
+    checkouts: int = 0  # 本周期取出连接次数
+    wait_time: float = 0.0  # 本周期取连接的总等待时间
+    waiting: int = 0  # 当前等待连接的请求数
+    max_waiting: int = 0  # 本周期同时等待连接的最大请求数
+    errors: int = 0  # 本周期建立连接失败与连接失效次数
+    idle_min: Optional[int] = None  # 本周期取出连接后剩余空闲连接数的最小值
+    latency: Optional[float] = None  # 建立/检查连接耗时的指数移动平均
+    last: Optional[Dict[str, Any]] = None  # 最近一次调整判断
+    decisions: Deque[Dict[str, Any]] = field(default_factory=lambda: deque(maxlen=10))  # 最近的扩缩容记录
+
+    def observe_latency(self, seconds: float) -> None:
+        self.latency = seconds if self.latency is None else self.latency * 0.8 + seconds * 0.2
+
+    def reset(self) -> None:
+        """开始新的统计周期"""
+        self.checkouts = 0
+        self.wait_time = 0.0
+        self.max_waiting = self.waiting
+        self.errors = 0
+        self.idle_min = None
 
 
 @dataclass
 class ConnectionInfo:
     """连接信息"""
     client: Optional[NDSClient]
+    last_used: float = field(default_factory=time.monotonic)  # 最近一次使用或检查通过的时间
 
 
 # noinspection PyBroadException
 class NDSPool:
-    """NDS连接池管理器"""
+    """NDS连接池管理器
+
+    连接按用途分为 scan(目录扫描)、meta(stat/zip_info)、read(文件读取) 三个通道。
+    每个通道可预留连接(其他通道不能占用), 超出预留部分从未预留的连接中借用, 且不超过 lane_share 比例;
+    通道没有使用中的连接时总可以借用一个连接, 避免预留过多时饿死。
+    """
 
-    def __init__(self):
-        self._pools: Dict[str, asyncio.Queue[ConnectionInfo]] = {}  # server_id -> connection queue
+    LANES = ("scan", "meta", "read")
+
+    def __init__(self, health_interval: float = 30.0, adapt_interval: float = 10.0):
+        self._pools: Dict[str, asyncio.Queue[ConnectionInfo]] = {}  # server_id -> 空闲连接队列
         self._configs: Dict[str, PoolConfig] = {}  # server_id -> config
+        self._created: Dict[str, int] = {}  # server_id -> 已创建(含使用中)的连接数
+        self._available: Dict[str, asyncio.Condition] = {}  # server_id -> 空闲连接或连接名额变化通知
+        self._scan_limits: Dict[str, asyncio.Semaphore] = {}  # server_id -> 目录请求上限
+        self._governors: Dict[str, Governor] = {}  # server_id -> 速率限制
+        self._metrics: Dict[str, PoolMetrics] = {}  # server_id -> 运行统计
+        self._busy: Dict[str, Dict[str, int]] = {}  # server_id -> {通道: 使用中的连接数}
+        self._muxes: Dict[str, SSHMux] = {}  # server_id -> SFTP复用的SSH连接
+        self._breakers: Dict[str, CircuitBreaker] = {}  # server_id -> 熔断器
+        self.health_interval = health_interval  # 后台检查空闲连接的间隔(秒)
+        self.adapt_interval = adapt_interval  # 自适应调整连接数的间隔(秒)
+        self._tasks: List[asyncio.Task] = []
         self.nds_log = {}
 
     def add_server(self, server_id: str, config: PoolConfig) -> None:
         """添加服务器配置"""
+        if config.adaptive:
+            config.max_size = max(config.max_size or config.pool_size * 2, config.min_size)
+            config.pool_size = min(max(config.pool_size, config.min_size), config.max_size)
         self._configs[server_id] = config
-        self._pools[server_id] = asyncio.Queue(maxsize=config.pool_size)
+        self._pools[server_id] = asyncio.Queue()
+        self._created[server_id] = 0
+        self._available[server_id] = asyncio.Condition()
+        self._scan_limits[server_id] = asyncio.Semaphore(config.scan_max_inflight)
+        self._governors[server_id] = Governor(config.max_bytes_per_sec, config.max_ops_per_sec)
+        self._metrics[server_id] = PoolMetrics()
+        self._busy[server_id] = {lane: 0 for lane in self.LANES}
+        self._breakers[server_id] = CircuitBreaker(config.breaker_threshold, config.breaker_timeout)
+        if config.protocol == "SFTP" and config.sftp_channels > 1:
+            self._muxes[server_id] = SSHMux(config.host, config.port, config.user, config.passwd,
+                                            channels=config.sftp_channels, connections=config.ssh_connections,
+                                            nds_id=server_id)
         self.nds_log[server_id] = 0
         log.info(f"[NDS_ID:{server_id}] Server added to pool")
 
     @asynccontextmanager
-    async def get_client(self, server_id: str):
+    async def get_client(self, server_id: str, lane: str = "read"):
         """获取客户端连接的上下文管理器
-        
+
+        连接总数不超过 pool_size, 连接用尽或通道占满时等待其他请求归还。取出连接时只对空闲超过 check_idle 秒的
+        连接检查状态, 其余连接由后台任务定期检查; 使用过程中出错的连接直接关闭。
+        NDS熔断时直接抛出 NDSUnavailableError。
+
         Args:
             server_id: 服务器ID
+            lane: 通道, scan/meta/read
         """
         if server_id not in self._configs:
             raise NDSError(f"Server {server_id} not configured", server_id)
+        if lane not in self.LANES:
+            raise NDSError(f"Unknown lane: {lane}", server_id)
+        breaker = self._breakers[server_id]
+        if not breaker.allow():
+            raise NDSUnavailableError(server_id, breaker.retry_after())
+        if not breaker.closed:
+            await self._probe_server(server_id)
 
         queue = self._pools[server_id]
         conn = None
 
         try:
-            # 1. 尝试从队列获取连接
+            conn = await self._acquire(server_id, lane)
+            yield conn.client
+            conn, returned = None, conn
+            await self._release(server_id, queue, returned, reuse=True, lane=lane)
+        except Exception as e:
+            if conn:
+                conn, failed = None, conn
+                await self._release(server_id, queue, failed, reuse=False, lane=lane)
+            if isinstance(e, NDSUnavailableError):
+                raise
+            log.error(f"[NDS_ID:{server_id}] Error in get_client: {e}")
+            raise NDSError(f"Failed to get client: {e}", server_id)
+        finally:
+            # 任务被取消时连接状态未知, 关闭连接
+            if conn:
+                await self._release(server_id, queue, conn, reuse=False, lane=lane)
+
+    @asynccontextmanager
+    async def get_clients(self, server_id: str, count: int, lane: str = "read"):
+        """获取最多 count 个连接的上下文管理器
+
+        第一个连接与 get_client 相同, 按需等待; 其余连接只取当前可以立即占用的空闲连接, 不等待,
+        实际获取的连接数可能少于 count。
+        """
+        async with self.get_client(server_id, lane) as client:
+            queue = self._pools[server_id]
+            extra: List[ConnectionInfo] = []
             try:
-                conn = queue.get_nowait()
-                if not conn.client or not await conn.client.check_connect():
-                    await self._close_connection(conn, server_id)
+                while len(extra) < count - 1 and (conn := await self._try_acquire(server_id, lane)) is not None:
+                    extra.append(conn)
+                yield [client] + [conn.client for conn in extra]
+            except BaseException:
+                # 出错或被取消时连接状态未知, 关闭连接
+                failed, extra = extra, []
+                for conn in failed:
+                    await self._release(server_id, queue, conn, reuse=False, lane=lane)
+                raise
+            finally:
+                for conn in extra:
+                    await self._release(server_id, queue, conn, reuse=True, lane=lane)
+
+    def _new_client(self, server_id: str) -> NDSClient:
+        """按服务器配置创建客户端"""
+        config = self._configs[server_id]
+        return NDSClient(
+            protocol=config.protocol,
+            host=config.host,
+            port=config.port,
+            user=config.user,
+            passwd=config.passwd,
+            nds_id=server_id,
+            scan_concurrency=config.scan_concurrency,
+            scan_limit=self._scan_limits[server_id],
+            read_block_size=config.read_block_size,
+            read_pipeline=config.read_pipeline,
+            governor=self._governors[server_id],
+            ssh_mux=self._muxes.get(server_id)
+        )
+
+    def _lane_admits(self, server_id: str, lane: str) -> bool:
+        """判断通道是否还可以占用一个连接"""
+        config = self._configs[server_id]
+        busy = self._busy[server_id]
+        used = busy[lane]
+        if used < config.lane_reserve.get(lane, 0):
+            return True
+        if used == 0:
+            return True
+        if used >= max(1, int(config.pool_size * config.lane_share.get(lane, 1.0))):
+            return False
+        # 不借用其他通道尚未使用的预留连接
+        held = sum(max(0, config.lane_reserve.get(other, 0) - busy[other]) for other in self.LANES if other != lane)
+        return sum(busy.values()) + held < config.pool_size
+
+    async def _acquire(self, server_id: str, lane: str) -> ConnectionInfo:
+        """取出空闲连接, 没有空闲连接且未达到上限时创建新连接, 否则等待"""
+        queue = self._pools[server_id]
+        config = self._configs[server_id]
+        available = self._available[server_id]
+        metrics = self._metrics[server_id]
+        breaker = self._breakers[server_id]
+
+        def ready() -> bool:
+            if self._pools.get(server_id) is not queue or not breaker.closed:
+                return True
+            return (not queue.empty() or self._created[server_id] < config.pool_size) \
+                and self._lane_admits(server_id, lane)
+
+        while True:
+            async with available:
+                if not ready():
+                    begin = time.monotonic()
+                    metrics.waiting += 1
+                    metrics.max_waiting = max(metrics.max_waiting, metrics.waiting)
+                    try:
+                        await available.wait_for(ready)
+                    finally:
+                        metrics.waiting -= 1
+                        metrics.wait_time += time.monotonic() - begin
+                if self._pools.get(server_id) is not queue:
+                    raise NDSError(f"Server {server_id} removed", server_id)
+                if not breaker.closed:
+                    raise NDSUnavailableError(server_id, breaker.retry_after())
+                if queue.empty():
+                    self._created[server_id] += 1
                     conn = None
-            except asyncio.QueueEmpty:
-                conn = None
-                pass
-            
-            # 2. 如果没有可用连接，创建新连接
-            if not conn:
-                if queue.qsize() < self._configs[server_id].pool_size:
-                    config = self._configs[server_id]
-                    client = NDSClient(
-                        protocol=config.protocol,
-                        host=config.host,
-                        port=config.port,
-                        user=config.user,
-                        passwd=config.passwd,
-                        nds_id=server_id
-                    )
-                    await client.connect()
-                    conn = ConnectionInfo(client=client)
                 else:
-                    # 3. 如果队列已满，等待可用连接
-                    conn = await queue.get()  # 无限等待直到有可用连接
-                    if not conn.client or not await conn.client.check_connect():
-                        await self._close_connection(conn, server_id)
-                        raise NDSError("Failed to get valid connection", server_id)
+                    conn = queue.get_nowait()
+                self._busy[server_id][lane] += 1
+                metrics.checkouts += 1
+                metrics.idle_min = min(queue.qsize(), metrics.idle_min if metrics.idle_min is not None else queue.qsize())
+            if conn is None:
+                return await self._open_connection(server_id, queue, lane)
+            if not await self._validate_checkout(server_id, queue, conn, lane):
+                log.info(f"[NDS_ID:{server_id}] Idle connection lost, reconnecting")
+                await self._release(server_id, queue, conn, reuse=False, lane=lane)
+                continue
+            return conn
+
+    async def _try_acquire(self, server_id: str, lane: str) -> Optional[ConnectionInfo]:
+        """不等待地取出空闲连接, 没有空闲连接或通道已满时返回None"""
+        queue = self._pools[server_id]
+        available = self._available[server_id]
+        metrics = self._metrics[server_id]
+        async with available:
+            if not self._breakers[server_id].closed or queue.empty() or not self._lane_admits(server_id, lane):
+                return None
+            conn = queue.get_nowait()
+            self._busy[server_id][lane] += 1
+            metrics.checkouts += 1
+            metrics.idle_min = min(queue.qsize(), metrics.idle_min if metrics.idle_min is not None else queue.qsize())
+        if not await self._validate_checkout(server_id, queue, conn, lane):
+            await self._release(server_id, queue, conn, reuse=False, lane=lane)
+            return None
+        return conn
+
+    async def _validate_checkout(self, server_id: str, queue: asyncio.Queue, conn: ConnectionInfo, lane: str) -> bool:
+        """检查取出的空闲连接是否可用, 只对空闲超过 check_idle 秒的连接发送检查请求
+
+        检查期间被取消时关闭连接并归还名额与通道占用
+        """
+        try:
+            return not conn.client.is_closed() and (
+                time.monotonic() - conn.last_used <= self._configs[server_id].check_idle
+                or await self._probe(server_id, conn))
+        except BaseException:
+            await self._release(server_id, queue, conn, reuse=False, lane=lane)
+            raise
+
+    async def _probe(self, server_id: str, conn: ConnectionInfo) -> bool:
+        """检查连接状态并记录耗时"""
+        begin = time.monotonic()
+        try:
+            valid = await conn.client.check_connect()
+        except Exception:
+            valid = False
+        if (metrics := self._metrics.get(server_id)) is not None:
+            if valid:
+                metrics.observe_latency(time.monotonic() - begin)
+            else:
+                metrics.errors += 1
+                self._record_failure(server_id, "connection check failed")
+        return valid
+
+    def _record_failure(self, server_id: str, error: str) -> None:
+        """记录连接失败, 达到阈值时熔断"""
+        breaker = self._breakers.get(server_id)
+        if breaker is not None and breaker.failure(error):
+            log.warning(f"[NDS_ID:{server_id}] Circuit open for {breaker.timeout}s after {breaker.failures} failures: {error}")
+
+    async def _probe_server(self, server_id: str) -> None:
+        """半开状态下用一个新连接探测NDS, 成功后关闭熔断器, 失败时重新熔断"""
+        queue = self._pools[server_id]
+        available = self._available[server_id]
+        breaker = self._breakers[server_id]
+        async with available:
+            slot = self._created[server_id] < self._configs[server_id].pool_size
+            if slot:
+                self._created[server_id] += 1
+        client = self._new_client(server_id)
+        try:
+            await client.connect(retry_count=1)
+        except BaseException as e:
+            # 探测被取消时同样归还占用的名额, 否则熔断器关闭后该名额永久丢失
+            if slot:
+                await self._release(server_id, queue, ConnectionInfo(client=None), reuse=False)
+            if not isinstance(e, Exception):
+                raise
+            self._record_failure(server_id, f"probe failed: {e}")
+            raise NDSUnavailableError(server_id, breaker.retry_after())
+        finally:
+            breaker.probing = False  # 探测被取消时允许下一个请求探测
+        breaker.success()
+        log.info(f"[NDS_ID:{server_id}] Circuit closed, probe connection succeeded")
+        async with available:
+            available.notify_all()
+        if slot:
+            await self._release(server_id, queue, ConnectionInfo(client=client), reuse=True)
+        else:
+            await client.close_connect()
+
+    async def _open_connection(self, server_id: str, queue: asyncio.Queue, lane: Optional[str] = None) -> ConnectionInfo:
+        """建立新连接, 调用前已占用连接名额"""
+        client = self._new_client(server_id)
+        metrics = self._metrics[server_id]
+        begin = time.monotonic()
+        try:
+            await client.connect()
+        except BaseException as e:
+            metrics.errors += 1
+            await self._release(server_id, queue, ConnectionInfo(client=None), reuse=False, lane=lane)
+            if isinstance(e, Exception):
+                self._record_failure(server_id, str(e))
+            raise
+        metrics.observe_latency(time.monotonic() - begin)
+        self._breakers[server_id].success()
+        return ConnectionInfo(client=client)
 
-            # 4. 返回连接
-            client = conn.client
-            yield client
+    async def _release(self, server_id: str, queue: asyncio.Queue, conn: ConnectionInfo, reuse: bool,
+                       lane: Optional[str] = None) -> None:
+        """归还连接; reuse 为False或连接数超过 pool_size(缩容后)时关闭连接并释放连接名额
 
-            # 5. 检查连接状态并决定是否放回队列
+        Args:
+            lane: 连接占用的通道, 后台检查与预热的连接不属于任何通道
+        """
+        current = self._pools.get(server_id) is queue  # 服务器已移除或重新添加时不再放回
+        if current and self._created[server_id] > self._configs[server_id].pool_size:
+            reuse = False
+        if not reuse or not current or not conn.client:
+            await self._close_connection(conn, server_id)
+            if not current:
+                return
+        available = self._available[server_id]
+        async with available:
+            if lane is not None:
+                self._busy[server_id][lane] -= 1
+            if conn.client:
+                conn.last_used = time.monotonic()
+                queue.put_nowait(conn)
+            else:
+                self._created[server_id] -= 1
+            # 等待者所在通道不同, 唤醒全部等待者重新判断
+            available.notify_all()
+
+    async def start(self) -> None:
+        """预热连接并启动后台健康检查与自适应调整"""
+        await asyncio.gather(*(self.prewarm(server_id) for server_id in list(self._configs)))
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._health_loop()), asyncio.create_task(self._adapt_loop())]
+
+    async def prewarm(self, server_id: str) -> int:
+        """创建连接直到空闲连接数达到 min_idle
+
+        Returns:
+            新建的连接数
+        """
+        if server_id not in self._configs or not self._breakers[server_id].closed:
+            return 0
+        queue = self._pools[server_id]
+        config = self._configs[server_id]
+        available = self._available[server_id]
+        opened = 0
+        while True:
+            async with available:
+                if queue.qsize() >= config.min_idle or self._created[server_id] >= config.pool_size:
+                    break
+                self._created[server_id] += 1
             try:
-                is_valid = await client.check_connect()
-            except:
-                is_valid = False
-            
-            if is_valid:
+                conn = await self._open_connection(server_id, queue)
+            except Exception as e:
+                log.warning(f"[NDS_ID:{server_id}] Prewarm connection failed: {e}")
+                break
+            await self._release(server_id, queue, conn, reuse=True)
+            opened += 1
+        if opened:
+            log.info(f"[NDS_ID:{server_id}] Prewarmed {opened} connections")
+        return opened
+
+    async def _health_loop(self) -> None:
+        """定期检查空闲连接并补足预热连接"""
+        while True:
+            await asyncio.sleep(self.health_interval)
+            for server_id in list(self._configs):
                 try:
-                    await queue.put(conn)
-                except:
-                    await self._close_connection(conn, server_id)
-            else:
-                await self._close_connection(conn, server_id)
+                    await self._check_idle(server_id)
+                    await self.prewarm(server_id)
+                except Exception as e:
+                    log.warning(f"[NDS_ID:{server_id}] Health check failed: {e}")
 
-        except Exception as e:
-            if conn:
-                await self._close_connection(conn, server_id)
-            log.error(f"[NDS_ID:{server_id}] Error in get_client: {e}")
-            raise NDSError(f"Failed to get client: {e}", server_id)
+    async def _check_idle(self, server_id: str) -> None:
+        """检查空闲超过 health_interval 的连接, 检查期间连接不会被取出"""
+        if server_id not in self._configs:
+            return
+        queue = self._pools[server_id]
+        available = self._available[server_id]
+        now = time.monotonic()
+        stale = []
+        async with available:
+            for _ in range(queue.qsize()):
+                conn = queue.get_nowait()
+                if now - conn.last_used >= self.health_interval:
+                    stale.append(conn)
+                else:
+                    queue.put_nowait(conn)
+        if not stale:
+            return
+        results = await asyncio.gather(*(self._probe(server_id, conn) for conn in stale))
+        lost = 0
+        for conn, valid in zip(stale, results):
+            if valid is not True:
+                lost += 1
+            await self._release(server_id, queue, conn, reuse=valid is True)
+        if lost:
+            log.info(f"[NDS_ID:{server_id}] Health check closed {lost}/{len(stale)} idle connections")
+
+    async def _adapt_loop(self) -> None:
+        """定期调整自适应模式连接池的大小"""
+        while True:
+            await asyncio.sleep(self.adapt_interval)
+            for server_id, config in list(self._configs.items()):
+                if config.adaptive:
+                    try:
+                        await self._adapt(server_id)
+                    except Exception as e:
+                        log.warning(f"[NDS_ID:{server_id}] Pool adapt failed: {e}")
+
+    async def _adapt(self, server_id: str) -> Dict[str, Any]:
+        """根据本周期统计扩容或缩容一个连接
+
+        NDS出错或变慢时缩容; 取连接等待时间过长或有请求排队且NDS正常时扩容;
+        整个周期都有超出 min_idle 的空闲连接时缩容。
+        """
+        config = self._configs[server_id]
+        metrics = self._metrics[server_id]
+        queue = self._pools[server_id]
+        size = config.pool_size
+        wait = metrics.wait_time / metrics.checkouts if metrics.checkouts else 0.0
+        idle = metrics.idle_min if metrics.idle_min is not None else queue.qsize()
+        slow = metrics.latency is not None and metrics.latency > config.latency_limit
+
+        if metrics.errors:
+            target, reason = size - 1, f"{metrics.errors} connection errors"
+        elif slow:
+            target, reason = size - 1, f"latency {metrics.latency:.3f}s > {config.latency_limit}s"
+        elif wait > config.wait_threshold or metrics.waiting:
+            target, reason = size + 1, f"avg wait {wait:.3f}s, {metrics.waiting} waiting"
+        elif idle > config.min_idle:
+            target, reason = size - 1, f"{idle} connections idle all period"
+        else:
+            target, reason = size, "steady"
+        target = min(max(target, config.min_size), config.max_size)
+        action = "grow" if target > size else "shrink" if target < size else "hold"
+
+        decision = {
+            "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "action": action,
+            "size": target,
+            "reason": reason,
+            "avg_wait": round(wait, 4),
+            "max_waiting": metrics.max_waiting,
+            "checkouts": metrics.checkouts,
+            "latency": round(metrics.latency, 4) if metrics.latency is not None else None
+        }
+        metrics.last = decision
+        metrics.reset()
+        if action == "hold":
+            return decision
+
+        metrics.decisions.append(decision)
+        log.info(f"[NDS_ID:{server_id}] Pool {action}: {size} -> {target} ({reason})")
+        config.pool_size = target
+        available = self._available[server_id]
+        surplus = []
+        async with available:
+            # 缩容时先关闭空闲连接, 使用中的连接归还时关闭
+            while self._created[server_id] - len(surplus) > target and not queue.empty():
+                surplus.append(queue.get_nowait())
+            available.notify_all()
+        for conn in surplus:
+            await self._release(server_id, queue, conn, reuse=False)
+        return decision
 
     @staticmethod
     async def _close_connection(conn: ConnectionInfo, server_id: str) -> None:
@@ -132,6 +565,9 @@ class NDSPool:
 
     async def close(self) -> None:
         """关闭连接池"""
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
         # 先复制一份server_id列表，避免在迭代过程中修改字典
         server_ids = list(self._pools.keys())
         
@@ -160,10 +596,22 @@ class NDSPool:
             except Exception as e:
                 log.error(f"[NDS_ID:{server_id}] Error closing connection: {e}")
 
-        # 移除配置
+        # 移除配置, 使用中的连接归还时直接关闭
+        available = self._available[server_id]
         del self._pools[server_id]
         del self._configs[server_id]
+        del self._created[server_id]
+        del self._available[server_id]
+        del self._scan_limits[server_id]
+        del self._governors[server_id]
+        del self._metrics[server_id]
+        del self._busy[server_id]
+        del self._breakers[server_id]
+        if (mux := self._muxes.pop(server_id, None)) is not None:
+            mux.close()
         del self.nds_log[server_id]
+        async with available:
+            available.notify_all()
         log.info(f"[NDS_ID:{server_id}] Server removed from pool")
 
     async def get_pool_status(self, server_id: str) -> Dict:
@@ -188,10 +636,37 @@ class NDSPool:
             "host": config.host,
             "port": config.port,
             "max_connections": config.pool_size,
-            "available": config.pool_size - queue.qsize(),
-            "current_connections": queue.qsize(),
+            "available": queue.qsize(),
+            "current_connections": self._created[server_id],
+            "min_idle": config.min_idle,
             # "connected": is_connected,
-            "last_used": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            "last_used": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "governor": self._governors[server_id].status(),
+            "adaptive": self._adaptive_status(server_id),
+            "ssh": self._muxes[server_id].status() if server_id in self._muxes else None,
+            "breaker": self._breakers[server_id].status(),
+            "lanes": {
+                lane: {
+                    "busy": self._busy[server_id][lane],
+                    "reserve": config.lane_reserve.get(lane, 0),
+                    "share": config.lane_share.get(lane, 1.0)
+                } for lane in self.LANES
+            }
+        }
+
+    def _adaptive_status(self, server_id: str) -> Dict[str, Any]:
+        """获取连接池大小的调整依据"""
+        config = self._configs[server_id]
+        metrics = self._metrics[server_id]
+        return {
+            "enabled": config.adaptive,
+            "size": config.pool_size,
+            "min_size": config.min_size,
+            "max_size": config.max_size,
+            "waiting": metrics.waiting,
+            "latency": round(metrics.latency, 4) if metrics.latency is not None else None,
+            "last": metrics.last,
+            "decisions": list(metrics.decisions)
         }
         
     async def get_all_pool_status(self) -> Dict:
@@ -209,6 +684,47 @@ class NDSPool:
                 }
         return result
 
+    def get_pool_size(self, server_id: str) -> int:
+        """获取指定服务器的连接池大小"""
+        if server_id not in self._configs:
+            raise NDSError(f"Server {server_id} not configured", server_id)
+        return self._configs[server_id].pool_size
+
+    def set_limits(self, server_id: str, bytes_per_sec: Optional[float] = None,
+                   ops_per_sec: Optional[float] = None) -> Dict:
+        """运行时修改指定服务器的速率限制, None或不大于0表示不限速"""
+        if server_id not in self._configs:
+            raise NDSError(f"Server {server_id} not configured", server_id)
+        config = self._configs[server_id]
+        config.max_bytes_per_sec = bytes_per_sec if bytes_per_sec and bytes_per_sec > 0 else None
+        config.max_ops_per_sec = ops_per_sec if ops_per_sec and ops_per_sec > 0 else None
+        self._governors[server_id].update(config.max_bytes_per_sec, config.max_ops_per_sec)
+        log.info(f"[NDS_ID:{server_id}] Limits updated: bytes/s={config.max_bytes_per_sec}, ops/s={config.max_ops_per_sec}")
+        return self._governors[server_id].status()
+
+    def get_protocol(self, server_id: str) -> Optional[str]:
+        """获取指定服务器的协议, 未配置时返回None"""
+        if server_id not in self._configs:
+            return None
+        return self._configs[server_id].protocol
+
+    def get_idle_count(self, server_id: str, lane: Optional[str] = None) -> int:
+        """获取连接池中空闲的连接数, 指定通道时只计算该通道当前可以占用的空闲连接"""
+        if server_id not in self._pools:
+            return 0
+        idle = self._pools[server_id].qsize()
+        if lane is None:
+            return idle
+        busy = self._busy[server_id]
+        count = 0
+        try:
+            while count < idle and self._lane_admits(server_id, lane):
+                busy[lane] += 1
+                count += 1
+        finally:
+            busy[lane] -= count
+        return count
+
     def get_server_ids(self) -> list:
         """获取所有已配置的服务器ID列表"""
         return list(self._configs.keys())
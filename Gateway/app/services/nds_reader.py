@@ -0,0 +1,245 @@
+import asyncio
+import contextlib
+from app.core.logger import log
+from app.core.nds_client import NDSClient, Buffer, NDSError, NDSFileNotFoundError
+from app.services.nds_pool import NDSPool
+from app.services.read_ahead import ReadAhead
+from app.services.block_cache import BlockCache
+from app.core.ws_frame import FrameBuffer
+from typing import Dict, List, Optional, Tuple, Union, Any, AsyncIterator
+
+
+# noinspection PyBroadException
+class NDSReader:
+    """NDS文件读取管道
+
+    读取任务从连接池获取连接后按块读取文件, 数据块放入有界队列, 由调用方边读边发送。
+    单个读取占用的内存约为 (queue_size + 2) * block_size, 与读取大小无关。
+    读取大小超过 segment_threshold 且连接池有空闲连接时, 先一次性获取各段的连接(只取可以立即占用的空闲连接),
+    再按实际获取的连接数切分区间, 每段使用一个连接并发读取, 按顺序拼接返回, 内存约为段数倍。
+    配置了 read_ahead 时, FTP的顺序读取优先从预读缓冲返回;
+    配置了 block_cache 且文件的修改时间已知时, 按块读取并缓存到本地。
+    """
+
+    def __init__(self, pool: NDSPool, block_size: int = 512 * 1024, queue_size: int = 4,
+                 segment_threshold: int = 32 * 1024 * 1024, max_segments: int = 4,
+                 read_ahead: Optional[ReadAhead] = None, block_cache: Optional[BlockCache] = None):
+        self.pool = pool
+        self.read_ahead = read_ahead
+        self.block_cache = block_cache
+        self.block_size = block_size
+        self.queue_size = queue_size
+        self.segment_threshold = segment_threshold
+        self.max_segments = max_segments
+        self.active = 0
+        self.reads = 0
+        self.segmented = 0
+        self.bytes_read = 0
+
+    async def blocks(self, nds_id: str, path: str, header_offset: int = 0, size: Optional[int] = None,
+                     headroom: int = 0) -> AsyncIterator[Tuple[Union[Buffer, FrameBuffer], bool]]:
+        """读取文件并逐块返回
+
+        调用方应使用 contextlib.aclosing 包装, 提前结束时读取任务会被取消并归还连接
+
+        Args:
+            nds_id: NDS ID
+            path: 文件路径
+            header_offset: 起始偏移量
+            size: 读取字节数, None表示读取到文件末尾
+            headroom: 帧头字节数, 大于0时直接从NDS读取的FTP数据块以 FrameBuffer 返回, 发送时不再复制
+        Yields:
+            (数据块, 是否为最后一块), 文件提前结束时最后一块为空
+        Raises:
+            NDSError: 读取失败
+        """
+        self.active += 1
+        self.reads += 1
+        try:
+            meta = self.block_cache.meta(nds_id, path) if self.block_cache is not None and size else None
+            # 修改时间未知或读取超出已知文件大小(文件可能已增长)时不使用块缓存
+            if meta is not None and meta[0] is not None and header_offset + size <= meta[1] \
+                    and size <= self.block_cache.max_bytes // 4:
+                items = self._cached(nds_id, path, header_offset, size, meta)
+            else:
+                items = self._stream(nds_id, path, header_offset, size, headroom)
+            async with contextlib.aclosing(items) as items:
+                async for item in items:
+                    yield item
+        finally:
+            self.active -= 1
+
+    async def _cached(self, nds_id: str, path: str, header_offset: int, size: int,
+                      meta: Tuple[Optional[str], int]) -> AsyncIterator[Tuple[Buffer, bool]]:
+        """通过块缓存读取: 命中的块直接返回, 连续未命中的块合并为一次读取并写入缓存"""
+        cache = self.block_cache
+        block_size = cache.block_size
+        mtime, file_size = meta
+        end = min(header_offset + size, file_size)
+        if end <= header_offset:
+            yield b"", True
+            return
+
+        def _key(number: int):
+            return str(nds_id), path, mtime, file_size, number
+
+        def _length(number: int) -> int:
+            return min(block_size, file_size - number * block_size)
+
+        def _part(data: Buffer, number: int) -> memoryview:
+            base = number * block_size
+            return memoryview(data)[max(header_offset, base) - base:min(end, base + block_size) - base]
+
+        number, final = header_offset // block_size, (end - 1) // block_size
+        while number <= final:
+            if (data := cache.get(_key(number), _length(number))) is not None:
+                yield _part(data, number), number == final
+                number += 1
+                continue
+            run = number
+            while run < final and not cache.contains(_key(run + 1)):
+                run += 1
+            start = number * block_size
+            current, filled = bytearray(_length(number)), 0
+            stream = self._stream(nds_id, path, start, min((run + 1) * block_size, file_size) - start)
+            async with contextlib.aclosing(stream) as items:
+                async for block, _ in items:
+                    view, position = memoryview(block), 0
+                    while position < len(view) and number <= run:
+                        take = min(len(current) - filled, len(view) - position)
+                        current[filled:filled + take] = view[position:position + take]
+                        filled += take
+                        position += take
+                        if filled == len(current):
+                            cache.put(_key(number), current)
+                            yield _part(current, number), number == final
+                            number += 1
+                            if number <= run:
+                                current, filled = bytearray(_length(number)), 0
+            if number <= run:
+                raise NDSError(f"File truncated: {path} at {number * block_size + filled}", nds_id=nds_id)
+
+    async def _stream(self, nds_id: str, path: str, header_offset: int, size: Optional[int],
+                      headroom: int = 0) -> AsyncIterator[Tuple[Union[Buffer, FrameBuffer], bool]]:
+        """直接从NDS读取: 优先使用预读缓冲, 大读取按空闲连接分段"""
+        if self.read_ahead is not None and size:
+            if (data := await self.read_ahead.read(nds_id, path, header_offset, size)) is not None:
+                view = memoryview(data)
+                for offset in range(0, len(view), self.block_size):
+                    yield view[offset:offset + self.block_size], offset + self.block_size >= len(view)
+                if not view:
+                    yield b"", True
+                return
+
+        total = await self._segment_total(nds_id, path, header_offset, size)
+        async with self.pool.get_clients(nds_id, self.max_segments if total is not None else 1, "read") as clients:
+            segments = self._plan(nds_id, path, header_offset, size, total, len(clients))
+            queues: List[asyncio.Queue] = []
+            tasks: List[asyncio.Task] = []
+            for client, (offset, length) in zip(clients, segments):
+                queue = asyncio.Queue(maxsize=self.queue_size)
+                queues.append(queue)
+                tasks.append(asyncio.create_task(self._produce(queue, client, nds_id, path, offset, length, headroom)))
+            try:
+                for index, queue in enumerate(queues):
+                    final = index == len(queues) - 1
+                    received = 0
+                    while True:
+                        item = await queue.get()
+                        if isinstance(item, BaseException):
+                            raise item
+                        block, last = item
+                        received += len(block)
+                        if final or not last:
+                            yield item
+                            if last:
+                                return
+                            continue
+                        # 中间段必须完整读取, 否则后续分段的数据会错位
+                        if received < segments[index][1]:
+                            raise NDSError(f"Segment truncated: {path} at {segments[index][0] + received}", nds_id=nds_id)
+                        if block:
+                            yield block, False
+                        break
+            finally:
+                for task in tasks:
+                    if not task.done():
+                        task.cancel()
+                with contextlib.suppress(BaseException):
+                    await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _segment_total(self, nds_id: str, path: str, header_offset: int, size: Optional[int]) -> Optional[int]:
+        """判断是否分段读取
+
+        Returns:
+            需要分段时返回实际读取的字节数, 否则返回None
+        """
+        if not size or size < self.segment_threshold or self.pool.get_idle_count(nds_id, "read") < 1:
+            return None
+        async with self.pool.get_client(nds_id, "meta") as client:
+            if not (file_stat := await client.stat(path)):
+                raise NDSFileNotFoundError(f"File not found: {path}", nds_id=nds_id)
+        total = max(0, min(size, file_stat["size"] - header_offset))
+        return total if total >= self.segment_threshold else None
+
+    def _plan(self, nds_id: str, path: str, header_offset: int, size: Optional[int],
+              total: Optional[int], segments: int) -> List[Tuple[int, Optional[int]]]:
+        """按已获取的连接数切分读取区间
+
+        Returns:
+            [(偏移量, 长度)], 不分段时长度为请求的 size
+        """
+        if total is None or segments < 2:
+            return [(header_offset, size)]
+
+        # 分段边界按块大小对齐
+        length = -(-total // segments)
+        length = -(-length // self.block_size) * self.block_size
+        plan = []
+        offset = header_offset
+        end = header_offset + total
+        while offset < end:
+            plan.append((offset, min(length, end - offset)))
+            offset += length
+        self.segmented += 1
+        log.debug(f"[NDS_ID:{nds_id}] 分段读取[{path}]: {len(plan)}段, {total}字节")
+        return plan
+
+    async def _produce(self, queue: asyncio.Queue, client: NDSClient, nds_id: str, path: str, header_offset: int,
+                       size: Optional[int], headroom: int = 0) -> None:
+        """读取任务: 使用已获取的连接按块读取文件放入队列, 队列已满时等待发送"""
+        try:
+            await client.open(path)
+            if self.block_cache is not None:
+                self.block_cache.remember(nds_id, path, client.stream_info.get("modify"), client.stream_info["size"])
+            try:
+                await client.seek(header_offset)
+                total = max(0, client.stream_info["size"] - header_offset)
+                total = min(size, total) if size else total
+                received = 0
+                async for block in client.iter_read(total, self.block_size, headroom):
+                    received += len(block)
+                    self.bytes_read += len(block)
+                    await queue.put((block, received >= total))
+                if received < total or total == 0:
+                    await queue.put((b"", True))
+            finally:
+                await client.close()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log.error(f"[NDS_ID:{nds_id}] 读取文件失败[{path}]: {e}")
+            await queue.put(e)
+
+    def status(self) -> Dict[str, Any]:
+        """获取读取状态"""
+        return {
+            "active": self.active,
+            "reads": self.reads,
+            "segmented": self.segmented,
+            "bytes_read": self.bytes_read,
+            "block_size": self.block_size,
+            "queue_size": self.queue_size,
+            "segment_threshold": self.segment_threshold,
+            "max_segments": self.max_segments
+        }
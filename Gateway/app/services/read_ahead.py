@@ -0,0 +1,219 @@
+import time
+import asyncio
+import contextlib
+from collections import OrderedDict
+from app.core.logger import log
+from app.services.nds_pool import NDSPool
+from typing import Dict, Optional, Tuple, Any, AsyncIterator
+
+
+class ReadAheadSession:
+    """单个文件的预读会话
+
+    占用一个连接池连接并保持数据连接打开, buffer 保存从 start 开始的已读数据,
+    window 为后台预读在最近一次读取位置之后最多缓冲的字节数
+    """
+
+    def __init__(self, nds_id: str, path: str, start: int, window: int):
+        self.nds_id = nds_id
+        self.path = path
+        self.start = start
+        self.window = window
+        self.buffer = bytearray()
+        self.eof = False
+        self.closed = False
+        self.last_used = time.monotonic()
+        self.lock = asyncio.Lock()
+        self.wanted = asyncio.Event()
+        self.stack = contextlib.AsyncExitStack()
+        self.blocks: Optional[AsyncIterator[bytes]] = None
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def end(self) -> int:
+        """已缓冲数据的结束位置"""
+        return self.start + len(self.buffer)
+
+    async def fetch(self) -> bool:
+        """从数据连接读取下一块, 到达文件末尾时返回False"""
+        if self.eof:
+            return False
+        try:
+            block = await self.blocks.__anext__()
+        except StopAsyncIteration:
+            self.eof = True
+            return False
+        self.buffer += block
+        return True
+
+    def trim(self, offset: int) -> None:
+        """丢弃 offset 之前的数据"""
+        if offset > self.start:
+            drop = min(offset - self.start, len(self.buffer))
+            del self.buffer[:drop]
+            self.start += drop
+
+
+# noinspection PyBroadException
+class ReadAhead:
+    """FTP顺序预读
+
+    FTP每次读取都要重新建立数据连接。同一文件的读取按偏移量顺序到达时(解析器按 header_offset 读取子包),
+    为该文件保持一个打开的 RETR 数据连接, 后续偏移量的读取直接从缓冲区返回。
+    后台预读只缓冲最近一次读取位置之后 window 字节, 每次命中后窗口增加本次读取的大小, 最多 budget 字节。
+    会话空闲超过 idle_timeout 秒或文件已读完且缓冲区为空时关闭并归还连接。
+    """
+
+    def __init__(self, pool: NDSPool, budget: int = 8 * 1024 * 1024, max_sessions: int = 4,
+                 idle_timeout: float = 3.0, max_gap: int = 1024 * 1024, block_size: int = 256 * 1024,
+                 window: int = 1024 * 1024):
+        self.pool = pool
+        self.budget = budget
+        self.window = min(window, budget)  # 会话建立时的预读窗口
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.max_gap = max_gap
+        self.block_size = block_size
+        self._sessions: Dict[Tuple[str, str], ReadAheadSession] = {}
+        self._hints: "OrderedDict[Tuple[str, str], int]" = OrderedDict()  # 最近一次读取的结束位置
+        self.hits = 0
+        self.misses = 0
+        self.bytes_served = 0
+
+    async def read(self, nds_id: str, path: str, offset: int, size: int) -> Optional[bytearray]:
+        """尝试从预读缓冲读取
+
+        Returns:
+            读取的数据, 无法从预读会话读取时返回None, 由调用方直接读取
+        """
+        if size > self.budget or self.pool.get_protocol(nds_id) != "FTP":
+            return None
+        key = (str(nds_id), path)
+        session = self._sessions.get(key)
+        if session is None:
+            hint = self._hints.pop(key, None)
+            self._hints[key] = offset + size
+            while len(self._hints) > 1024:
+                self._hints.popitem(last=False)
+            # 第二次顺序读取时才建立会话
+            if hint is None or not 0 <= offset - hint <= self.max_gap:
+                return None
+            if len(self._sessions) >= self.max_sessions or self.pool.get_idle_count(nds_id, "read") < 1:
+                return None
+            session = await self._open(key, offset, size)
+            if session is None:
+                return None
+
+        data = await self._serve(session, offset, size)
+        if data is None:
+            self.misses += 1
+            self._hints[key] = offset + size
+        else:
+            self.hits += 1
+            self.bytes_served += len(data)
+        return data
+
+    async def _open(self, key: Tuple[str, str], offset: int, size: int) -> Optional[ReadAheadSession]:
+        """建立预读会话, 初始窗口不小于本次读取大小"""
+        nds_id, path = key
+        session = ReadAheadSession(nds_id, path, offset, min(self.budget, max(self.window, size)))
+        self._sessions[key] = session
+        async with session.lock:  # 同一文件的并发读取等待会话建立完成
+            try:
+                client = await session.stack.enter_async_context(self.pool.get_client(nds_id, "read"))
+                await client.open(path)
+                session.stack.push_async_callback(client.close)
+                await client.seek(offset)
+                session.blocks = client.iter_read(None, self.block_size)
+                session.stack.push_async_callback(session.blocks.aclose)
+            except Exception as e:
+                log.warning(f"[NDS_ID:{nds_id}] 预读会话建立失败[{path}]: {e}")
+                await self._close(session)
+                return None
+        session.task = asyncio.create_task(self._prefetch(session))
+        log.debug(f"[NDS_ID:{nds_id}] 预读会话已建立[{path}] offset: {offset}")
+        return session
+
+    async def _serve(self, session: ReadAheadSession, offset: int, size: int) -> Optional[bytearray]:
+        """从会话缓冲区读取, 偏移量在缓冲区之前或跳跃过大时返回None"""
+        async with session.lock:
+            if session.closed or offset < session.start or offset - session.end > self.max_gap:
+                return None
+            session.last_used = time.monotonic()
+            end = offset + size
+            hit = session.end >= end  # 预读已覆盖本次读取
+            try:
+                while session.end < end and not session.eof:
+                    # 缓冲区超出预算时丢弃请求位置之前的数据
+                    if session.end - session.start > self.budget:
+                        session.trim(offset)
+                    await session.fetch()
+            except Exception as e:
+                log.warning(f"[NDS_ID:{session.nds_id}] 预读失败[{session.path}]: {e}")
+                await self._close(session)
+                return None
+            begin = offset - session.start
+            data = session.buffer[begin:begin + size]
+            session.trim(end)
+            if hit:
+                session.window = min(self.budget, session.window + size)
+        session.wanted.set()
+        return data
+
+    async def _prefetch(self, session: ReadAheadSession) -> None:
+        """后台预读: 缓冲区不足窗口时继续读取, 空闲超时或文件已读完后关闭会话"""
+        try:
+            while not session.closed:
+                async with session.lock:
+                    if not session.eof and len(session.buffer) < session.window:
+                        if await session.fetch():
+                            continue
+                    if session.eof and not session.buffer:
+                        break
+                session.wanted.clear()
+                timeout = session.last_used + self.idle_timeout - time.monotonic()
+                if timeout <= 0:
+                    break
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(session.wanted.wait(), timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log.warning(f"[NDS_ID:{session.nds_id}] 预读失败[{session.path}]: {e}")
+        async with session.lock:
+            await self._close(session)
+
+    async def _close(self, session: ReadAheadSession) -> None:
+        """关闭会话并归还连接"""
+        if session.closed:
+            return
+        session.closed = True
+        session.buffer = bytearray()
+        if self._sessions.get((session.nds_id, session.path)) is session:
+            del self._sessions[(session.nds_id, session.path)]
+        try:
+            await session.stack.aclose()
+        except Exception as e:
+            log.warning(f"[NDS_ID:{session.nds_id}] 预读会话关闭失败[{session.path}]: {e}")
+
+    async def close(self) -> None:
+        """关闭所有预读会话"""
+        for session in list(self._sessions.values()):
+            if session.task and not session.task.done():
+                session.task.cancel()
+                with contextlib.suppress(BaseException):
+                    await session.task
+            await self._close(session)
+        self._hints.clear()
+
+    def status(self) -> Dict[str, Any]:
+        """获取预读状态"""
+        return {
+            "sessions": len(self._sessions),
+            "buffered": sum(len(session.buffer) for session in self._sessions.values()),
+            "window": self.window,
+            "hits": self.hits,
+            "misses": self.misses,
+            "bytes_served": self.bytes_served,
+            "budget": self.budget
+        }
@@ -0,0 +1,146 @@
+import asyncio
+import contextlib
+from dataclasses import dataclass, field
+from app.core.logger import log
+from app.services.nds_reader import NDSReader
+from typing import Dict, List, Optional, Tuple, Any
+
+
+@dataclass
+class ReadRequest:
+    """等待合并的读取请求"""
+    offset: int
+    size: int
+    future: asyncio.Future
+
+    def __post_init__(self):
+        # 共享读取失败时等待方可能已离开, 取出异常避免 asyncio 记录 "Future exception was never retrieved"
+        self.future.add_done_callback(lambda future: future.cancelled() or future.exception())
+
+
+@dataclass
+class ReadSpan:
+    """合并后的读取区间"""
+    start: int
+    end: int
+    requests: List[ReadRequest] = field(default_factory=list)
+
+
+# noinspection PyBroadException
+class ReadCoalescer:
+    """读取合并
+
+    同一 (nds_id, path) 在 window 秒内到达的读取请求按偏移量排序, 重叠或间隔不超过 max_gap 的区间
+    合并为一次NDS读取(单次不超过 max_span 字节), 读取结果再按请求切分返回。
+    只合并不超过 max_size 的小读取, 未能与其他请求合并的读取仍由调用方流式读取。
+    """
+
+    def __init__(self, reader: NDSReader, window: float = 0.005, max_gap: int = 64 * 1024,
+                 max_span: int = 16 * 1024 * 1024, max_size: int = 4 * 1024 * 1024):
+        self.reader = reader
+        self.window = window
+        self.max_gap = max_gap
+        self.max_span = max_span
+        self.max_size = max_size
+        self._pending: Dict[Tuple[str, str], List[ReadRequest]] = {}
+        self._tasks: set = set()
+        self.requests = 0
+        self.coalesced = 0
+        self.spans = 0
+
+    async def read(self, nds_id: str, path: str, offset: int, size: int) -> Optional[memoryview]:
+        """在合并窗口内等待同一文件的其他读取请求
+
+        Returns:
+            合并读取的数据, 未与其他请求合并时返回None
+        """
+        if self.window <= 0 or size > self.max_size:
+            return None
+        loop = asyncio.get_running_loop()
+        key = (str(nds_id), path)
+        request = ReadRequest(offset=offset, size=size, future=loop.create_future())
+        if (group := self._pending.get(key)) is None:
+            group = self._pending[key] = []
+            loop.call_later(self.window, self._schedule, key)
+        group.append(request)
+        self.requests += 1
+        return await request.future
+
+    async def fetch(self, nds_id: str, path: str, ranges: List[Tuple[int, int]]) -> List[memoryview]:
+        """立即合并读取同一文件的多个区间
+
+        Args:
+            nds_id: NDS ID
+            path: 文件路径
+            ranges: [(偏移量, 大小)]
+        Returns:
+            与 ranges 顺序一致的数据
+        """
+        loop = asyncio.get_running_loop()
+        requests = [ReadRequest(offset=offset, size=size, future=loop.create_future()) for offset, size in ranges]
+        self.requests += len(requests)
+        await asyncio.gather(*(self._read_span(str(nds_id), path, span, True) for span in self._merge(requests)))
+        return [request.future.result() for request in requests]
+
+    def _schedule(self, key: Tuple[str, str]) -> None:
+        """合并窗口结束, 启动读取任务"""
+        task = asyncio.create_task(self._flush(key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _flush(self, key: Tuple[str, str]) -> None:
+        """合并窗口内的请求并读取"""
+        requests = [request for request in self._pending.pop(key, []) if not request.future.done()]
+        await asyncio.gather(*(self._read_span(key[0], key[1], span, False) for span in self._merge(requests)))
+
+    def _merge(self, requests: List[ReadRequest]) -> List[ReadSpan]:
+        """按偏移量合并重叠或相邻的区间"""
+        spans: List[ReadSpan] = []
+        for request in sorted(requests, key=lambda item: item.offset):
+            end = request.offset + request.size
+            if spans and request.offset <= spans[-1].end + self.max_gap and \
+                    max(end, spans[-1].end) - spans[-1].start <= self.max_span:
+                spans[-1].end = max(end, spans[-1].end)
+                spans[-1].requests.append(request)
+            else:
+                spans.append(ReadSpan(start=request.offset, end=end, requests=[request]))
+        return spans
+
+    async def _read_span(self, nds_id: str, path: str, span: ReadSpan, force: bool) -> None:
+        """读取一个合并区间并按请求切分"""
+        if len(span.requests) == 1 and not force:
+            if not span.requests[0].future.done():
+                span.requests[0].future.set_result(None)
+            return
+        self.spans += 1
+        self.coalesced += len(span.requests)
+        try:
+            data = bytearray(span.end - span.start)
+            received = 0
+            async with contextlib.aclosing(self.reader.blocks(nds_id, path, span.start, len(data))) as blocks:
+                async for block, _ in blocks:
+                    data[received:received + len(block)] = block
+                    received += len(block)
+            if received < len(data):
+                del data[received:]
+        except Exception as e:
+            log.warning(f"[NDS_ID:{nds_id}] 合并读取失败[{path}]: {e}")
+            for request in span.requests:
+                if not request.future.done():
+                    request.future.set_exception(e)
+            return
+        view = memoryview(data)
+        for request in span.requests:
+            if not request.future.done():
+                begin = request.offset - span.start
+                request.future.set_result(view[begin:begin + request.size])
+
+    def status(self) -> Dict[str, Any]:
+        """获取读取合并状态"""
+        return {
+            "requests": self.requests,
+            "coalesced": self.coalesced,
+            "spans": self.spans,
+            "pending": sum(len(group) for group in self._pending.values()),
+            "window": self.window
+        }
@@ -0,0 +1,159 @@
+import time
+import uuid
+from dataclasses import dataclass, field
+from app.core.nds_client import ScanEntry
+from typing import Dict, List, Optional, Tuple, Any
+
+
+@dataclass
+class DirSnapshot:
+    """单个目录的快照"""
+    mtime: Optional[float]
+    entries: List[ScanEntry] = field(default_factory=list)
+    visited: int = 0  # 最近一次访问该目录的扫描代数
+
+
+class ScanSnapshot:
+    """单个扫描根目录的快照
+
+    记录每个目录的修改时间与目录项, 目录修改时间未变化时遍历可直接复用上次的目录项;
+    同时记录每个文件首次出现时的扫描代数, 用于按水位返回新增文件。
+    水位格式为 "{epoch}:{generation}", epoch 在快照重建(如Gateway重启)后变化。
+    扫描完成后移除该次扫描及之后的扫描都未访问的目录(如按日期剪枝后不再遍历的旧目录)及其文件记录。
+    """
+
+    # 修改时间距当前不足该秒数的目录不缓存, 避免同一秒内的后续修改被遗漏
+    RACY_SECONDS = 2
+
+    def __init__(self):
+        self.epoch = uuid.uuid4().hex[:12]
+        self.generation = 0
+        self._dirs: Dict[str, DirSnapshot] = {}
+        self._seen: Dict[str, int] = {}  # 文件路径 -> 首次出现的扫描代数
+        self.reused = 0
+        self.listed = 0
+
+    def lookup(self, path: str, mtime: Optional[float], generation: int = 0) -> Optional[List[ScanEntry]]:
+        """目录修改时间与快照一致时返回快照中的目录项, 否则返回None"""
+        snapshot = self._dirs.get(path)
+        if mtime is None or snapshot is None or snapshot.mtime != mtime:
+            return None
+        snapshot.visited = max(snapshot.visited, generation)
+        self.reused += 1
+        return snapshot.entries
+
+    def store(self, path: str, mtime: Optional[float], entries: List[ScanEntry], generation: int = 0) -> None:
+        """保存目录的最新目录项, 并清理已删除文件的记录"""
+        self.listed += 1
+        if old := self._dirs.get(path):
+            current = {entry.path for entry in entries if not entry.is_dir}
+            for entry in old.entries:
+                if not entry.is_dir and entry.path not in current:
+                    self._seen.pop(entry.path, None)
+            generation = max(old.visited, generation)
+        if mtime is not None and time.time() - mtime < self.RACY_SECONDS:
+            mtime = None
+        self._dirs[path] = DirSnapshot(mtime=mtime, entries=entries, visited=generation)
+
+    def begin(self) -> "ScanPass":
+        """开始一次扫描"""
+        self.generation += 1
+        return ScanPass(self, self.generation)
+
+    def mark(self, files: List[str], generation: int) -> None:
+        """记录扫描看到的文件, 新文件记为该次扫描的代数"""
+        for path in files:
+            self._seen.setdefault(path, generation)
+
+    def expire(self, generation: int) -> None:
+        """移除代数 generation 及之后的扫描都未访问的目录及其文件记录"""
+        for path in [path for path, snapshot in self._dirs.items() if snapshot.visited < generation]:
+            for entry in self._dirs.pop(path).entries:
+                if not entry.is_dir:
+                    self._seen.pop(entry.path, None)
+
+    def delta(self, files: List[str], watermark: Optional[str]) -> Tuple[List[str], bool]:
+        """按水位筛选新增文件
+
+        Returns:
+            (新增文件列表, 是否为全量结果)
+        """
+        since = self.parse_watermark(watermark)
+        if since is None:
+            return files, True
+        return [path for path in files if self._seen.get(path, self.generation) > since], False
+
+    def parse_watermark(self, watermark: Optional[str]) -> Optional[int]:
+        """解析水位, 水位无效或不属于当前快照时返回None"""
+        if not watermark or not isinstance(watermark, str):
+            return None
+        epoch, _, generation = watermark.partition(":")
+        if epoch != self.epoch or not generation.isdigit():
+            return None
+        return int(generation)
+
+    def status(self) -> Dict[str, Any]:
+        """获取快照状态"""
+        return {
+            "epoch": self.epoch,
+            "generation": self.generation,
+            "directories": len(self._dirs),
+            "files": len(self._seen),
+            "reused": self.reused,
+            "listed": self.listed
+        }
+
+
+class ScanPass:
+    """单次扫描
+
+    目录访问与新文件都记为本次扫描的代数, 并发扫描同一根目录时各自的水位只覆盖自己记录的文件
+    """
+
+    def __init__(self, snapshot: ScanSnapshot, generation: int):
+        self.snapshot = snapshot
+        self.generation = generation
+
+    def lookup(self, path: str, mtime: Optional[float]) -> Optional[List[ScanEntry]]:
+        return self.snapshot.lookup(path, mtime, self.generation)
+
+    def store(self, path: str, mtime: Optional[float], entries: List[ScanEntry]) -> None:
+        self.snapshot.store(path, mtime, entries, self.generation)
+
+    def mark(self, files: List[str]) -> None:
+        self.snapshot.mark(files, self.generation)
+
+    def delta(self, files: List[str], watermark: Optional[str]) -> Tuple[List[str], bool]:
+        return self.snapshot.delta(files, watermark)
+
+    def finish(self) -> None:
+        """扫描完整结束, 清理本次扫描未访问的目录"""
+        self.snapshot.expire(self.generation)
+
+    @property
+    def watermark(self) -> str:
+        """本次扫描的水位"""
+        return f"{self.snapshot.epoch}:{self.generation}"
+
+
+class ScanSnapshotStore:
+    """按 (nds_id, 扫描根目录) 管理扫描快照"""
+
+    def __init__(self):
+        self._snapshots: Dict[Tuple[str, str], ScanSnapshot] = {}
+
+    def get(self, nds_id: str, root: str) -> ScanSnapshot:
+        """获取扫描快照, 不存在时创建"""
+        key = (str(nds_id), root.rstrip("/") or "/")
+        if key not in self._snapshots:
+            self._snapshots[key] = ScanSnapshot()
+        return self._snapshots[key]
+
+    def remove(self, nds_id: str) -> None:
+        """移除指定NDS的所有快照"""
+        for key in [key for key in self._snapshots if key[0] == str(nds_id)]:
+            del self._snapshots[key]
+
+    def status(self) -> Dict[str, Any]:
+        """获取所有快照状态"""
+        return {f"{nds_id}:{root}": snapshot.status() for (nds_id, root), snapshot in self._snapshots.items()}
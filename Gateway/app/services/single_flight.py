@@ -0,0 +1,159 @@
+import asyncio
+from app.core.logger import log
+from typing import Dict, List, Optional, Any, Hashable, Callable, Awaitable, AsyncIterator, TypeVar
+
+T = TypeVar("T")
+
+
+class CallFlight:
+    """进行中的共享调用"""
+
+    def __init__(self, future: asyncio.Future):
+        self.future = future
+        self.waiters = 0
+
+
+class StreamFlight:
+    """进行中的共享流式操作
+
+    items 保存 base 序号之后尚未被所有订阅者消费的数据, 最多 max_items 条;
+    尚未丢弃任何数据时后加入的请求可以从头重放, 丢弃数据后不再接受新的订阅者。
+    """
+
+    def __init__(self, max_items: int):
+        self.max_items = max_items
+        self.items: List[Any] = []
+        self.base = 0  # items[0] 的序号
+        self.positions: Dict[int, int] = {}  # 订阅者 -> 下一条待消费数据的序号
+        self.joined = 0  # 已加入的订阅者数, 用作订阅者编号
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.changed = asyncio.Condition()
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def subscribers(self) -> int:
+        return len(self.positions)
+
+    def has_room(self) -> bool:
+        """是否可以继续产生数据, 缓冲已满时丢弃所有订阅者都已消费的数据"""
+        if len(self.items) < self.max_items:
+            return True
+        slowest = min(self.positions.values(), default=self.base + len(self.items))
+        if slowest > self.base:
+            del self.items[:slowest - self.base]
+            self.base = slowest
+            return True
+        return False
+
+# noinspection PyBroadException
+class SingleFlight:
+    """进行中请求去重
+
+    参数相同的并发请求共用一次NDS操作: run 共享单个结果, stream 共享异步迭代器产生的数据,
+    后加入的请求从头重放已产生的数据。操作完成后不再保留结果, 之后的请求重新执行。
+    stream 的数据最多缓冲 max_items 条, 产生速度跟随最慢的订阅者, 已被所有订阅者消费的数据在缓冲满时丢弃;
+    丢弃数据后无法再重放, 之后的请求重新执行。所有等待者都离开时取消共享的操作。
+    """
+
+    def __init__(self, max_items: int = 4):
+        self.max_items = max(1, max_items)  # 共享流式操作缓冲的最大数据条数
+        self._calls: Dict[Hashable, CallFlight] = {}
+        self._streams: Dict[Hashable, StreamFlight] = {}
+        self.started = 0  # 实际执行的操作数
+        self.shared = 0  # 复用进行中操作的请求数
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable[T]]) -> T:
+        """同一 key 的并发调用共用一次 factory() 的结果"""
+        flight = self._calls.get(key)
+        if flight is None:
+            flight = self._calls[key] = CallFlight(asyncio.ensure_future(factory()))
+            flight.future.add_done_callback(lambda done: self._finish_call(key, flight))
+            self.started += 1
+        else:
+            self.shared += 1
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.future)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.future.done():
+                flight.future.cancel()
+
+    def _finish_call(self, key: Hashable, flight: CallFlight) -> None:
+        if self._calls.get(key) is flight:
+            del self._calls[key]
+        if not flight.future.cancelled():
+            flight.future.exception()  # 避免无人等待时出现未获取异常的警告
+
+    async def stream(self, key: Hashable, factory: Callable[[], AsyncIterator[T]]) -> AsyncIterator[T]:
+        """同一 key 的并发调用共用一次 factory() 迭代产生的数据"""
+        flight = self._streams.get(key)
+        if flight is None:
+            flight = self._streams[key] = StreamFlight(self.max_items)
+            flight.task = asyncio.create_task(self._drive(key, flight, factory()))
+            self.started += 1
+        else:
+            self.shared += 1
+        subscriber = flight.joined
+        flight.joined += 1
+        flight.positions[subscriber] = 0
+        try:
+            while True:
+                async with flight.changed:
+                    await flight.changed.wait_for(
+                        lambda: flight.positions[subscriber] < flight.base + len(flight.items) or flight.done)
+                    index = flight.positions[subscriber]
+                    if index < flight.base + len(flight.items):
+                        item = flight.items[index - flight.base]
+                    elif flight.error is not None:
+                        raise flight.error
+                    else:
+                        return
+                yield item
+                async with flight.changed:
+                    flight.positions[subscriber] = index + 1
+                    flight.changed.notify_all()
+        finally:
+            flight.positions.pop(subscriber, None)
+            if not flight.positions and not flight.done:
+                flight.task.cancel()
+                if self._streams.get(key) is flight:
+                    del self._streams[key]
+            else:
+                async with flight.changed:
+                    flight.changed.notify_all()
+
+    async def _drive(self, key: Hashable, flight: StreamFlight, iterator: AsyncIterator[Any]) -> None:
+        """迭代共享的异步迭代器并通知所有等待者, 缓冲已满时等待最慢的订阅者"""
+        try:
+            async for item in iterator:
+                async with flight.changed:
+                    await flight.changed.wait_for(flight.has_room)
+                    if flight.base > 0 and self._streams.get(key) is flight:
+                        del self._streams[key]  # 已丢弃数据, 后加入的请求无法重放
+                    flight.items.append(item)
+                    flight.changed.notify_all()
+        except asyncio.CancelledError:
+            flight.error = ConnectionError("操作已取消")
+        except Exception as e:
+            flight.error = e
+        finally:
+            if hasattr(iterator, "aclose"):
+                try:
+                    await iterator.aclose()
+                except Exception as e:
+                    log.warning(f"关闭共享操作失败: {e}")
+            if self._streams.get(key) is flight:
+                del self._streams[key]
+            async with flight.changed:
+                flight.done = True
+                flight.changed.notify_all()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "inflight": len(self._calls) + len(self._streams),
+            "max_items": self.max_items,
+            "started": self.started,
+            "shared": self.shared
+        }
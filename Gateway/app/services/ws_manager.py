@@ -1,18 +1,170 @@
 import time
 import asyncio
-from typing import Dict, List, Tuple
+import contextlib
+from collections import deque
+from typing import Dict, List, Tuple, AsyncIterator, Deque, Union, Optional, Any
 from fastapi import WebSocket
 from app.core.logger import log
 from app.api.deps import WS_RESPONSE, WSMessageType
+from app.core.ws_frame import pack_frame, FLAG_END, Buffer, FrameBuffer
+
+
+# noinspection PyBroadException
+class ClientChannel:
+    """单个客户端连接的发送队列
+
+    响应与文件帧按顺序进入有界队列, 由写任务逐条发送, 队列已满时发送方等待(背压);
+    心跳等控制消息进入优先队列, 不受队列长度限制且先于数据发送。写入失败后队列关闭, 后续发送直接返回失败。
+    """
+
+    def __init__(self, client_id: str, websocket: WebSocket, max_items: int = 16):
+        self.client_id = client_id
+        self.websocket = websocket
+        self.max_items = max_items
+        self.queue: Deque[Union[Dict[str, Any], bytes]] = deque()
+        self.urgent: Deque[Dict[str, Any]] = deque()
+        self.changed = asyncio.Condition()
+        self.closed = False
+        self.waiting = 0  # 等待队列空位的发送方数量
+        self.sent = 0
+        self.sent_bytes = 0
+        self._task = asyncio.create_task(self._write())
+
+    async def put(self, payload: Union[Dict[str, Any], bytes], timeout: Optional[float] = None) -> bool:
+        """放入发送队列, 队列已满时等待; 超过 timeout 秒或连接已关闭时返回False"""
+        async with self.changed:
+            if not self.closed and len(self.queue) >= self.max_items:
+                self.waiting += 1
+                try:
+                    await asyncio.wait_for(
+                        self.changed.wait_for(lambda: self.closed or len(self.queue) < self.max_items), timeout)
+                except asyncio.TimeoutError:
+                    log.warning(f"发送队列已满[{self.client_id}]: 等待超过{timeout}秒")
+                    return False
+                finally:
+                    self.waiting -= 1
+            if self.closed:
+                return False
+            self.queue.append(payload)
+            self.changed.notify_all()
+            return True
+
+    async def put_urgent(self, payload: Dict[str, Any]) -> bool:
+        """放入优先队列, 不等待"""
+        async with self.changed:
+            if self.closed:
+                return False
+            self.urgent.append(payload)
+            self.changed.notify_all()
+            return True
+
+    async def _write(self) -> None:
+        """写任务: 优先发送控制消息, 再按顺序发送队列中的数据"""
+        try:
+            while True:
+                async with self.changed:
+                    await self.changed.wait_for(lambda: self.urgent or self.queue or self.closed)
+                    if self.urgent:
+                        payload = self.urgent.popleft()
+                    elif self.queue:
+                        payload = self.queue.popleft()
+                    else:
+                        return
+                    self.changed.notify_all()
+                if isinstance(payload, dict):
+                    await self.websocket.send_json(payload)
+                else:
+                    await self.websocket.send_bytes(payload)
+                    self.sent_bytes += len(payload)
+                self.sent += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log.error(f"发送失败[{self.client_id}]: {str(e)}")
+        finally:
+            self.closed = True
+            self.queue.clear()
+            self.urgent.clear()
+            async with self.changed:
+                self.changed.notify_all()
+
+    async def close(self) -> None:
+        """关闭队列并停止写任务, 未发送的数据丢弃"""
+        async with self.changed:
+            self.closed = True
+            self.changed.notify_all()
+        if not self._task.done():
+            self._task.cancel()
+            with contextlib.suppress(BaseException):
+                await self._task
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "queued": len(self.queue),
+            "urgent": len(self.urgent),
+            "max_items": self.max_items,
+            "waiting": self.waiting,
+            "sent": self.sent,
+            "sent_bytes": self.sent_bytes,
+            "closed": self.closed
+        }
+
+
+class CreditWindow:
+    """单个文件传输的发送额度
+
+    接收方在请求中给出初始额度(字节), 之后按已处理的数据通过 credit 消息追加额度;
+    额度用尽时发送方等待, 不再读取下一块数据, NDS读取随之暂停。
+    额度大于0即可发送一帧, 未确认的数据最多超出额度一帧。
+    """
+
+    def __init__(self, credit: int, max_credit: int):
+        self.max_credit = max_credit
+        self.credit = min(credit, max_credit)
+        self.changed = asyncio.Condition()
+        self.granted = self.credit  # 累计授予的额度
+        self.stalls = 0  # 因额度用尽而等待的次数
+        self.closed = False
+
+    async def grant(self, nbytes: int) -> None:
+        """追加额度, 可用额度不超过 max_credit"""
+        async with self.changed:
+            self.credit = min(self.credit + nbytes, self.max_credit)
+            self.granted += nbytes
+            self.changed.notify_all()
+
+    async def consume(self, nbytes: int, timeout: Optional[float] = None) -> bool:
+        """扣除一帧的额度, 额度用尽时等待; 超过 timeout 秒仍无额度或连接已关闭时返回False"""
+        async with self.changed:
+            if not self.closed and self.credit <= 0:
+                self.stalls += 1
+                try:
+                    await asyncio.wait_for(self.changed.wait_for(lambda: self.closed or self.credit > 0), timeout)
+                except asyncio.TimeoutError:
+                    return False
+            if self.closed:
+                return False
+            self.credit -= nbytes
+            return True
+
+    async def close(self) -> None:
+        """连接断开, 唤醒等待额度的发送方"""
+        async with self.changed:
+            self.closed = True
+            self.changed.notify_all()
 
 
 # noinspection PyBroadException
 class ConnectionManager:
-    def __init__(self):
+    def __init__(self, queue_size: int = 16, send_timeout: Optional[float] = 30.0, max_window: int = 64 * 1024 * 1024):
         self.active_connections: Dict[str, WebSocket] = {}
-        self.connection_locks: Dict[str, asyncio.Lock] = {}  # 每个连接一个锁
+        self.channels: Dict[str, ClientChannel] = {}  # 每个连接一个发送队列
+        self.windows: Dict[Tuple[str, str], CreditWindow] = {}  # (客户端ID, 请求ID) -> 启用流控的文件传输
         self.manager_lock = asyncio.Lock()  # 管理锁，只用于连接的添加和删除
         self.chunk_size = 524288  # 512KB
+        self.queue_size = queue_size  # 每个连接发送队列的最大消息数
+        self.send_timeout = send_timeout  # 发送队列已满或额度用尽时发送方最长等待秒数, 超时视为发送失败并释放NDS连接
+        self.max_window = max_window  # 单个文件传输的最大额度
         self.check_interval = 30
         self.check_failures: Dict[str, int] = {}
         self.max_failures = 3
@@ -22,10 +174,10 @@ class ConnectionManager:
     async def connect(self, websocket: WebSocket, client_id: str) -> None:
         async with self.manager_lock:  # 使用管理锁
             if client_id in self.active_connections:
-                await self.disconnect(client_id)
+                await self._remove(client_id)
             await websocket.accept()
             self.active_connections[client_id] = websocket
-            self.connection_locks[client_id] = asyncio.Lock()  # 为新连接创建锁
+            self.channels[client_id] = ClientChannel(client_id, websocket, self.queue_size)
             self.check_failures.pop(client_id, None)
             log.debug(f"客户端[{client_id}]连接成功")
 
@@ -37,81 +189,116 @@ class ConnectionManager:
         """
         try:
             async with self.manager_lock:  # 使用管理锁
-                if websocket := self.active_connections.pop(client_id, None):
-                    try:
-                        # 检查连接是否已经关闭
-                        if not websocket.client_state.DISCONNECTED:
-                            await websocket.close()
-                    except Exception as e:
-                        log.warning(f"关闭WebSocket连接时出现异常[{client_id}]: {str(e)}")
-                    finally:
-                        self.connection_locks.pop(client_id, None)  # 移除连接锁
-                        self.check_failures.pop(client_id, None)
-                        log.debug(f"客户端[{client_id}]已断开")
+                await self._remove(client_id)
         except Exception as e:
             log.error(f"断开连接过程中出现异常[{client_id}]: {str(e)}")
 
-    async def send_response(self, client_id: str, response: WS_RESPONSE, *, lock_acquired: bool = False) -> bool:
+    async def _remove(self, client_id: str) -> None:
+        """移除连接, 调用方持有管理锁"""
+        if websocket := self.active_connections.pop(client_id, None):
+            try:
+                if channel := self.channels.pop(client_id, None):
+                    await channel.close()
+                for key in [key for key in self.windows if key[0] == client_id]:
+                    await self.windows.pop(key).close()
+                # 检查连接是否已经关闭
+                if not websocket.client_state.DISCONNECTED:
+                    await websocket.close()
+            except Exception as e:
+                log.warning(f"关闭WebSocket连接时出现异常[{client_id}]: {str(e)}")
+            finally:
+                self.check_failures.pop(client_id, None)
+                log.debug(f"客户端[{client_id}]已断开")
+
+    async def send_response(self, client_id: str, response: WS_RESPONSE, *, urgent: bool = False) -> bool:
         """
         发送WebSocket响应
+
+        响应放入连接的发送队列后即返回, 队列已满时等待
         
         :param client_id: 客户端ID
         :param response: 响应对象，必须是 WS_RESPONSE 类型
-        :param lock_acquired: 是否已经获取了锁，用于避免死锁
-        :return: 发送是否成功
+        :param urgent: 是否为优先发送的控制消息
+        :return: 是否已放入发送队列
         """
-        if not (websocket := self.active_connections.get(client_id)):
-            return False
-        
-        if not (lock := self.connection_locks.get(client_id)):
+        if not (channel := self.channels.get(client_id)):
             return False
 
         try:
-            if lock_acquired:
-                # 如果已经获取了锁，直接发送
-                await websocket.send_json(response.model_dump())
-                return True
-            else:
-                # 如果没有获取锁，需要先获取锁
-                async with lock:
-                    await websocket.send_json(response.model_dump())
-                    return True
+            if urgent:
+                return await channel.put_urgent(response.model_dump())
+            return await channel.put(response.model_dump(), self.send_timeout)
         except Exception as e:
             log.error(f"发送响应失败[{client_id}]: {str(e)}")
             return False
 
-    async def send_file(self, client_id: str, data: bytes, request_id: str) -> bool:
+    async def send_bytes(self, client_id: str, data: bytes) -> bool:
         """
-        发送文件数据
-        
+        发送一个二进制帧
+
         :param client_id: 客户端ID
-        :param data: 要发送的文件数据
-        :param request_id: 请求ID
-        :return: 发送是否成功
+        :param data: 二进制数据
+        :return: 是否已放入发送队列
         """
-        if not (websocket := self.active_connections.get(client_id)):
+        if not (channel := self.channels.get(client_id)):
             return False
-        
-        if not (lock := self.connection_locks.get(client_id)):
+
+        try:
+            return await channel.put(data, self.send_timeout)
+        except Exception as e:
+            log.error(f"发送数据失败[{client_id}]: {str(e)}")
             return False
 
+    async def send_stream(self, client_id: str, blocks: AsyncIterator[Tuple[Union[Buffer, FrameBuffer], bool]], request_id: str,
+                          window: Optional[int] = None) -> bool:
+        """
+        边读取边发送文件数据
+
+        每个数据块封装为一帧，最后一块带 FLAG_END 标志；预留了帧头空间的 FrameBuffer 原地写入帧头后直接发送，不复制数据。
+        读取数据块时抛出的异常由调用方处理。
+        指定 window 时启用流控: 每帧发送前扣除帧长度的额度, 额度用尽时暂停读取, 直到客户端通过 credit 消息追加额度。
+
+        :param client_id: 客户端ID
+        :param blocks: (数据块, 是否为最后一块) 的异步迭代器
+        :param request_id: 请求ID
+        :param window: 初始额度(字节)，为空时不启用流控
+        :return: 发送是否成功
+        """
+        key = (client_id, request_id)
+        credit = None
+        if window is not None:
+            credit = self.windows[key] = CreditWindow(window, self.max_window)
         try:
-            async with lock:
-                response = WS_RESPONSE(type=WSMessageType.FILE, request_id=request_id)
-                response.data = "start"
-                # 传入lock_acquired=True，因为我们已经获取了锁
-                if await self.send_response(client_id, response, lock_acquired=True):
-                    for i in range(0, len(data), self.chunk_size):
-                        await websocket.send_bytes(data[i:i + self.chunk_size])
-                    response.data = "end"
-                    await self.send_response(client_id, response, lock_acquired=True)
-                else:
-                    log.error(f"发送文件失败[{client_id}]: 标记符发送失败")
+            seq = 0
+            async for block, last in blocks:
+                frame = pack_frame(request_id, seq, block, FLAG_END if last else 0)
+                if credit is not None and not await credit.consume(len(frame), self.send_timeout):
+                    log.error(f"发送文件失败[{client_id}]: 等待额度超过{self.send_timeout}秒")
                     return False
-                return True
-        except Exception as e:
-            log.error(f"发送文件失败[{client_id}]: {str(e)}")
+                if not await self.send_bytes(client_id, frame):
+                    log.error(f"发送文件失败[{client_id}]: 第{seq}帧发送失败")
+                    return False
+                if last:
+                    return True
+                seq += 1
             return False
+        finally:
+            if credit is not None and self.windows.get(key) is credit:
+                del self.windows[key]
+
+    async def grant(self, client_id: str, request_id: str, nbytes: int) -> bool:
+        """
+        为文件传输追加额度
+
+        :param client_id: 客户端ID
+        :param request_id: 请求ID
+        :param nbytes: 追加的字节数
+        :return: 传输是否存在, 已完成的传输忽略
+        """
+        if not (credit := self.windows.get((client_id, request_id))):
+            return False
+        await credit.grant(nbytes)
+        return True
 
     async def _check_all_connections(self) -> None:
         while True:
@@ -129,19 +316,17 @@ class ConnectionManager:
                     # 等待所有检查完成
                     results = await asyncio.gather(*check_tasks, return_exceptions=True)
                     
-                    # 处理检查结果
-                    async with self.manager_lock:
-                        for client_id, result in zip(client_ids, results):
-                            if isinstance(result, Exception):
-                                fails = self.check_failures[client_id] = self.check_failures.get(client_id, 0) + 1
-                                if fails >= self.max_failures:
-                                    await self.disconnect(client_id)
-                            elif not result:
-                                fails = self.check_failures[client_id] = self.check_failures.get(client_id, 0) + 1
-                                if fails >= self.max_failures:
-                                    await self.disconnect(client_id)
-                            else:
-                                self.check_failures.pop(client_id, None)
+                    # 处理检查结果, 连续失败的连接在释放管理锁后断开
+                    failed = []
+                    for client_id, result in zip(client_ids, results):
+                        if isinstance(result, Exception) or not result:
+                            fails = self.check_failures[client_id] = self.check_failures.get(client_id, 0) + 1
+                            if fails >= self.max_failures:
+                                failed.append(client_id)
+                        else:
+                            self.check_failures.pop(client_id, None)
+                    for client_id in failed:
+                        await self.disconnect(client_id)
                             
             except Exception as e:
                 log.error(f"连接检查错误: {str(e)}")
@@ -149,11 +334,22 @@ class ConnectionManager:
                 await asyncio.sleep(self.check_interval)
 
     async def _check_single_connection(self, client_id: str) -> bool:
-        try:
-            await self.send_response(client_id, WS_RESPONSE(
-                type=WSMessageType.CHECK,
-                data=int(time.time())
-            ))
-            return True
-        except Exception:
+        """发送心跳; 上一次心跳仍未发出时视为连接阻塞"""
+        if not (channel := self.channels.get(client_id)) or channel.urgent:
             return False
+        return await self.send_response(client_id, WS_RESPONSE(
+            type=WSMessageType.CHECK,
+            data=int(time.time())
+        ), urgent=True)
+
+    def status(self) -> Dict[str, Any]:
+        """获取各连接发送队列与流控状态"""
+        result = {client_id: channel.status() for client_id, channel in self.channels.items()}
+        for (client_id, request_id), credit in self.windows.items():
+            if client_id in result:
+                result[client_id].setdefault("windows", {})[request_id] = {
+                    "credit": credit.credit,
+                    "granted": credit.granted,
+                    "stalls": credit.stalls
+                }
+        return result
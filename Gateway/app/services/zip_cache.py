@@ -0,0 +1,160 @@
+import json
+import time
+import asyncio
+import sqlite3
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from dataclasses import dataclass
+from app.core.logger import log
+from typing import Dict, List, Optional, Tuple, Any
+
+
+@dataclass
+class CacheEntry:
+    """缓存条目"""
+    size: int
+    modify: Optional[str]
+    entries: List[Dict[str, Any]]
+    nbytes: int
+
+
+# noinspection PyBroadException
+class ZipInfoCache:
+    """ZIP中央目录解析结果缓存
+
+    以 (nds_id, path) 为键缓存 get_zip_info 的结果, 使用文件的 size/modify 校验是否过期。
+    内存部分按LRU淘汰并受字节预算限制, 可选使用sqlite持久化, 重启后仍可命中。
+    sqlite读写在线程中执行, 不阻塞事件循环; 超出字节预算的条目不缓存也不持久化。
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, db_path: Optional[str] = None):
+        self.max_bytes = max_bytes
+        self.db_path = db_path
+        self._entries: "OrderedDict[Tuple[str, str], CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()  # 同一连接的读写串行执行
+        self.hits = 0
+        self.misses = 0
+        self.open()
+
+    def open(self) -> None:
+        """打开持久化存储, 已打开或未配置路径时不做处理"""
+        if self.db_path and self._db is None:
+            self._open_db(self.db_path)
+
+    def _open_db(self, db_path: str) -> None:
+        """打开持久化存储"""
+        try:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS zip_info ("
+                "nds_id TEXT NOT NULL, path TEXT NOT NULL, size INTEGER NOT NULL, modify TEXT, "
+                "data BLOB NOT NULL, updated REAL NOT NULL, PRIMARY KEY (nds_id, path))"
+            )
+            log.info(f"ZIP信息缓存持久化已启用: {db_path}")
+        except Exception as e:
+            log.error(f"ZIP信息缓存持久化启用失败: {e}")
+            self._db = None
+
+    async def get(self, nds_id: str, path: str, size: int, modify: Optional[str]) -> Optional[List[Dict[str, Any]]]:
+        """获取缓存的中央目录信息, 文件大小或修改时间不一致时视为未命中"""
+        key = (str(nds_id), path)
+        entry = self._entries.get(key)
+        if entry is None and self._db is not None:
+            if (entry := await asyncio.to_thread(self._load, key)) is not None:
+                self._store(key, entry)
+        if entry is not None and entry.size == size and entry.modify == modify:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.entries
+        if entry is not None:
+            await self._remove(key)
+        self.misses += 1
+        return None
+
+    async def put(self, nds_id: str, path: str, size: int, modify: Optional[str], entries: List[Dict[str, Any]]) -> None:
+        """写入缓存"""
+        key = (str(nds_id), path)
+        data = json.dumps(entries, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self._store(key, CacheEntry(size=size, modify=modify, entries=entries, nbytes=len(data)))
+        if self._db is not None and len(data) <= self.max_bytes:
+            await asyncio.to_thread(self._write, key, size, modify, data)
+
+    def _store(self, key: Tuple[str, str], entry: CacheEntry) -> None:
+        """写入内存并按字节预算淘汰"""
+        if old := self._entries.pop(key, None):
+            self._bytes -= old.nbytes
+        if entry.nbytes > self.max_bytes:
+            return
+        self._entries[key] = entry
+        self._bytes += entry.nbytes
+        while self._bytes > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes
+
+    def _load(self, key: Tuple[str, str]) -> Optional[CacheEntry]:
+        """从持久化存储加载条目, 在线程中执行"""
+        try:
+            with self._db_lock:
+                row = self._db.execute(
+                    "SELECT size, modify, data FROM zip_info WHERE nds_id = ? AND path = ?", key
+                ).fetchone()
+            if not row:
+                return None
+            size, modify, data = row
+            return CacheEntry(size=size, modify=modify, entries=json.loads(data), nbytes=len(data))
+        except Exception as e:
+            log.warning(f"ZIP信息缓存读取失败[{key[1]}]: {e}")
+            return None
+
+    def _write(self, key: Tuple[str, str], size: int, modify: Optional[str], data: bytes) -> None:
+        """写入持久化存储, 在线程中执行"""
+        try:
+            with self._db_lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO zip_info (nds_id, path, size, modify, data, updated) VALUES (?, ?, ?, ?, ?, ?)",
+                    (key[0], key[1], size, modify, data, time.time())
+                )
+        except Exception as e:
+            log.warning(f"ZIP信息缓存写入失败[{key[1]}]: {e}")
+
+    def _delete(self, key: Tuple[str, str]) -> None:
+        """从持久化存储删除条目, 在线程中执行"""
+        try:
+            with self._db_lock:
+                self._db.execute("DELETE FROM zip_info WHERE nds_id = ? AND path = ?", key)
+        except Exception as e:
+            log.warning(f"ZIP信息缓存删除失败[{key[1]}]: {e}")
+
+    async def _remove(self, key: Tuple[str, str]) -> None:
+        """移除过期条目"""
+        if entry := self._entries.pop(key, None):
+            self._bytes -= entry.nbytes
+        if self._db is not None:
+            await asyncio.to_thread(self._delete, key)
+
+    def status(self) -> Dict[str, Any]:
+        """获取缓存状态"""
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "persistent": self._db is not None
+        }
+
+    def close(self) -> None:
+        """关闭持久化存储"""
+        if self._db is not None:
+            try:
+                with self._db_lock:
+                    self._db.close()
+            except Exception:
+                pass
+            self._db = None
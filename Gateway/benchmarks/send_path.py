@@ -0,0 +1,166 @@
+"""文件读取-发送路径基准测试
+
+对比旧实现(BytesIO + 2KB块 + getvalue()[0:size], 发送时 bytes 切片后直接发送)与当前实现
+(NDSClient.iter_read 将FTP数据直接读入预留帧头空间的 FrameBuffer, 发送时原地写入帧头)
+读取并发送的耗时、峰值内存与复制字节数。
+
+旧实现读取时经 BytesIO 拼接与 getvalue 切片复制, 发送时每个切片再复制一次;
+当前实现每块数据只在读入 FrameBuffer 时复制一次, 发送阶段不再复制。
+
+复制字节数使用 tracemalloc 统计:
+    读取阶段: 读取过程中的内存峰值增量(包含结果本身)
+    发送阶段: 每帧发送时存活的临时对象(切片与帧)之和
+
+用法(在 Gateway 目录下执行):
+    python -m benchmarks.send_path [--size-mb 32] [--concurrency 8]
+"""
+import time
+import asyncio
+import argparse
+import tracemalloc
+from io import BytesIO
+from typing import List
+from app.core.nds_client import NDSClient
+from app.core.ws_frame import FLAG_END, FrameBuffer, pack_frame, frame_headroom
+
+MB = 1024 * 1024
+CHUNK_SIZE = 524288
+
+
+class FakeStream:
+    """模拟 FTP 数据流, 每次返回不超过 max_block 的新数据块"""
+
+    def __init__(self, size: int, max_block: int = 64 * 1024):
+        self.remaining = size
+        self.max_block = max_block
+
+    async def read(self, n: int) -> bytes:
+        await asyncio.sleep(0)  # 让出事件循环, 使并发读取交错执行
+        n = min(n, self.remaining, self.max_block)
+        self.remaining -= n
+        return b"\0" * n
+
+    async def finish(self, expected_codes=None) -> None:
+        pass
+
+
+class FakeFTP:
+    """模拟 aioftp 客户端, RETR 返回 FakeStream"""
+
+    def __init__(self, stream: FakeStream):
+        self.stream = stream
+
+    async def get_stream(self, command, codes, offset=0) -> FakeStream:
+        return self.stream
+
+
+class CopyMeter:
+    """统计发送阶段每帧存活的临时对象大小"""
+
+    def __init__(self):
+        self.base = 0
+        self.copied = 0
+
+    def begin(self) -> None:
+        self.base = tracemalloc.get_traced_memory()[0]
+
+    async def send_bytes(self, frame) -> None:
+        self.copied += tracemalloc.get_traced_memory()[0] - self.base
+
+
+async def legacy_read(stream: FakeStream, size: int, request_id: str) -> bytes:
+    """旧实现: BytesIO 拼接 2KB 块后 getvalue()[0:size]"""
+    tmp_io = BytesIO()
+    total = size
+    while total > 0:
+        block = await stream.read(min(abs(total), 2048))
+        if not block:
+            break
+        tmp_io.write(block)
+        total -= len(block)
+    return tmp_io.getvalue()[0:size]
+
+
+async def legacy_send(meter: CopyMeter, data: bytes, request_id: str) -> None:
+    """旧实现: 整个文件读取完成后按 chunk_size 切片, 切片直接作为二进制消息发送(前后各一条JSON标记消息)"""
+    for offset in range(0, len(data), CHUNK_SIZE):
+        await meter.send_bytes(data[offset:offset + CHUNK_SIZE])
+
+
+async def current_read(stream: FakeStream, size: int, request_id: str) -> List[FrameBuffer]:
+    """当前实现: NDSReader 调用 NDSClient.iter_read 的 FTP 读取路径, 数据块预留帧头空间"""
+    client = NDSClient("FTP", "127.0.0.1", 21, "u", "p", nds_id="1")
+    client.client = FakeFTP(stream)
+    await client.open("/bench.zip", {"size": size})
+    return [block async for block in client.iter_read(size, CHUNK_SIZE, frame_headroom(request_id))]
+
+
+async def current_send(meter: CopyMeter, blocks: List[FrameBuffer], request_id: str) -> None:
+    """当前实现: 与 ConnectionManager.send_stream 相同地在每块预留的空间写入帧头后发送"""
+    for seq, block in enumerate(blocks):
+        await meter.send_bytes(pack_frame(request_id, seq, block, FLAG_END if seq == len(blocks) - 1 else 0))
+
+
+async def run(read, send, size: int, concurrency: int) -> dict:
+    """执行一组并发读取-发送, 返回每MB复制字节数、峰值内存与耗时"""
+    read_copied = 0
+    send_copied = 0
+
+    async def one(index: int) -> None:
+        request_id = f"bench-{index}"
+        data = await read(FakeStream(size), size, request_id)
+        await send(CopyMeter(), data, request_id)
+
+    # 单个请求逐个执行以准确统计复制字节数
+    tracemalloc.start()
+    for index in range(concurrency):
+        tracemalloc.reset_peak()
+        start = tracemalloc.get_traced_memory()[0]
+        data = await read(FakeStream(size), size, f"bench-{index}")
+        read_copied += tracemalloc.get_traced_memory()[1] - start
+        meter = CopyMeter()
+        meter.begin()
+        await send(meter, data, f"bench-{index}")
+        send_copied += meter.copied
+        del data
+    tracemalloc.stop()
+
+    # 并发执行统计峰值内存与耗时
+    tracemalloc.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    transferred = size * concurrency / MB
+    return {
+        "read": read_copied / transferred,
+        "send": send_copied / transferred,
+        "peak": peak / MB,
+        "elapsed": elapsed
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="文件读取-发送路径基准测试")
+    parser.add_argument("--size-mb", type=int, default=32, help="单次读取大小(MB)")
+    parser.add_argument("--concurrency", type=int, default=8, help="并发读取数")
+    args = parser.parse_args()
+    size = args.size_mb * MB
+
+    print(f"size={args.size_mb}MB concurrency={args.concurrency} chunk={CHUNK_SIZE // 1024}KB")
+    print(f"{'path':<8}{'time s':>10}{'peak MB':>10}{'read B/MB':>14}{'send B/MB':>14}{'total B/MB':>14}")
+    results = {}
+    for name, read, send in (("legacy", legacy_read, legacy_send), ("current", current_read, current_send)):
+        result = results[name] = await run(read, send, size, args.concurrency)
+        total = result["read"] + result["send"]
+        print(f"{name:<8}{result['elapsed']:>10.2f}{result['peak']:>10.1f}"
+              f"{result['read']:>14,.0f}{result['send']:>14,.0f}{total:>14,.0f}")
+    speedup = results["legacy"]["elapsed"] / max(results["current"]["elapsed"], 1e-9)
+    copied = (results["current"]["read"] + results["current"]["send"]) / (results["legacy"]["read"] + results["legacy"]["send"])
+    print(f"耗时为旧实现的 1/{speedup:.1f}, 每MB复制字节数为旧实现的 {copied:.0%}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,117 @@
+import asyncio
+import contextlib
+from app.services.block_cache import BlockCache
+from app.services.nds_reader import NDSReader
+
+FILES = {}  # 路径 -> (修改时间, 内容)
+
+
+class FakeClient:
+    """从 FILES 读取的NDS客户端"""
+
+    def __init__(self):
+        self.data = b""
+        self.offset = 0
+        self.stream_info = {}
+
+    async def open(self, path):
+        modify, self.data = FILES[path]
+        self.stream_info = {"size": len(self.data), "modify": modify}
+
+    async def seek(self, offset):
+        self.offset = offset
+
+    async def iter_read(self, total, block_size, headroom=0):
+        end = self.offset + total
+        while self.offset < end:
+            block = self.data[self.offset:min(end, self.offset + block_size)]
+            self.offset += len(block)
+            yield block
+
+    async def close(self):
+        pass
+
+
+class FakePool:
+    def get_idle_count(self, nds_id, lane=None):
+        return 0
+
+    @contextlib.asynccontextmanager
+    async def get_clients(self, nds_id, count, lane="read"):
+        yield [FakeClient()]
+
+
+def make_reader(tmp_path, meta_ttl=60.0):
+    cache = BlockCache(str(tmp_path / "blocks.dat"), max_bytes=64 * 1024, block_size=1024, meta_ttl=meta_ttl)
+    return NDSReader(FakePool(), block_size=512, block_cache=cache), cache
+
+
+async def read(reader, path, offset, size):
+    out = bytearray()
+    async with contextlib.aclosing(reader.blocks("1", path, offset, size)) as blocks:
+        async for block, _ in blocks:
+            out += block
+    return bytes(out)
+
+
+def test_file_growing(tmp_path):
+    reader, cache = make_reader(tmp_path)
+    small = bytes(range(256)) * 6  # 1536 字节, 最后一块不足 block_size
+    FILES["/grow"] = ("2024-01-01 00:00:00", small[:1500])
+    cache.remember("1", "/grow", "2024-01-01 00:00:00", 1500)
+
+    async def run():
+        assert await read(reader, "/grow", 0, 1500) == small[:1500]
+        assert await read(reader, "/grow", 0, 1500) == small[:1500]
+        assert cache.hits > 0
+        # 文件增长, 修改时间未变化
+        grown = bytes(reversed(range(256))) * 10
+        FILES["/grow"] = ("2024-01-01 00:00:00", small[:1500] + grown[:1000])
+        assert await read(reader, "/grow", 1000, 1500) == FILES["/grow"][1][1000:2500]
+        assert await read(reader, "/grow", 1000, 1500) == FILES["/grow"][1][1000:2500]
+
+    asyncio.run(run())
+    cache.close()
+
+
+def test_file_rewritten(tmp_path):
+    reader, cache = make_reader(tmp_path, meta_ttl=0.2)
+    FILES["/rewrite"] = ("2024-01-01 00:00:00", b"a" * 3000)
+    cache.remember("1", "/rewrite", "2024-01-01 00:00:00", 3000)
+
+    async def run():
+        assert await read(reader, "/rewrite", 0, 3000) == b"a" * 3000
+        assert await read(reader, "/rewrite", 0, 3000) == b"a" * 3000
+        assert cache.hits > 0
+        # 文件被同样大小的内容重写, 记录的修改时间过期后重新获取
+        FILES["/rewrite"] = ("2024-01-01 00:05:00", b"b" * 3000)
+        await asyncio.sleep(0.3)
+        assert await read(reader, "/rewrite", 0, 3000) == b"b" * 3000
+        assert await read(reader, "/rewrite", 500, 1000) == b"b" * 1000
+
+    asyncio.run(run())
+    cache.close()
+
+
+def test_block_length_mismatch_is_miss(tmp_path):
+    cache = BlockCache(str(tmp_path / "blocks.dat"), max_bytes=4096, block_size=1024)
+    key = ("1", "/f", "2024-01-01 00:00:00", 2500, 2)
+    cache.put(key, b"x" * 100)
+    assert cache.get(key, 452) is None
+    assert not cache.contains(key)
+    cache.close()
+
+
+def test_close_releases_file_and_reopen(tmp_path):
+    path = tmp_path / "blocks.dat"
+    cache = BlockCache(str(path), max_bytes=4096, block_size=1024)
+    key = ("1", "/f", "2024-01-01 00:00:00", 100, 0)
+    cache.put(key, b"x" * 100)
+    cache.close()
+    assert not cache.enabled and not path.exists()
+    # 重启时重新打开, 关闭前的缓存块已丢弃
+    cache.open()
+    assert cache.enabled and cache.get(key, 100) is None
+    cache.put(key, b"y" * 100)
+    assert cache.get(key, 100) == b"y" * 100
+    cache.close()
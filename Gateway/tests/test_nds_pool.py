@@ -0,0 +1,78 @@
+import asyncio
+from app.services.nds_pool import NDSPool, PoolConfig
+
+
+class FakeClient:
+    """connect 与 check_connect 在 release 事件设置前一直挂起的客户端"""
+
+    def __init__(self, release: asyncio.Event):
+        self.release = release
+        self.closed = False
+
+    async def connect(self, retry_count=None):
+        await self.release.wait()
+
+    async def check_connect(self):
+        await self.release.wait()
+        return True
+
+    def is_closed(self):
+        return self.closed
+
+    async def close_connect(self):
+        self.closed = True
+
+
+def make_pool(pool_size: int, release: asyncio.Event) -> NDSPool:
+    pool = NDSPool()
+    pool.add_server("1", PoolConfig(protocol="FTP", host="127.0.0.1", port=21, user="u", passwd="p",
+                                    pool_size=pool_size, breaker_threshold=1, breaker_timeout=0))
+    pool._new_client = lambda server_id: FakeClient(release)
+    return pool
+
+
+async def checkout(pool: NDSPool) -> None:
+    async with pool.get_client("1"):
+        pass
+
+
+async def cancel_pending(pool: NDSPool) -> None:
+    """发起一次取连接请求, 在其挂起时取消"""
+    task = asyncio.create_task(checkout(pool))
+    await asyncio.sleep(0.01)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+def test_cancelled_probe_releases_slot():
+    async def run():
+        release = asyncio.Event()
+        pool = make_pool(2, release)
+        pool._breakers["1"].failure("down")
+        # 半开探测在建立连接时被取消, 占用的名额应归还
+        for _ in range(2):
+            await cancel_pending(pool)
+        assert pool._created["1"] == 0
+        release.set()
+        await asyncio.wait_for(checkout(pool), 1)
+        assert pool._breakers["1"].closed
+
+    asyncio.run(run())
+
+
+def test_cancelled_checkout_probe_releases_connection():
+    async def run():
+        release = asyncio.Event()
+        release.set()
+        pool = make_pool(1, release)
+        await checkout(pool)
+        # 空闲超过 check_idle 的连接取出时先检查, 检查期间被取消
+        pool._pools["1"]._queue[0].last_used -= pool._configs["1"].check_idle + 1
+        release.clear()
+        await cancel_pending(pool)
+        assert pool._created["1"] == 0
+        assert pool._busy["1"]["read"] == 0
+        release.set()
+        await asyncio.wait_for(checkout(pool), 1)
+
+    asyncio.run(run())
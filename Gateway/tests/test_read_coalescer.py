@@ -0,0 +1,30 @@
+import gc
+import asyncio
+import pytest
+from app.services.read_coalescer import ReadCoalescer
+
+
+class FailingReader:
+    """每次读取都失败的NDS读取器"""
+
+    def blocks(self, nds_id, path, offset, size):
+        async def _blocks():
+            raise OSError("read failed")
+            yield
+
+        return _blocks()
+
+
+def test_failed_span_exceptions_are_retrieved():
+    errors = []
+
+    async def run():
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: errors.append(context))
+        coalescer = ReadCoalescer(FailingReader())
+        # 两个区间相距较远, 分别读取失败; 调用方只取到第一个异常
+        with pytest.raises(OSError):
+            await coalescer.fetch("1", "/data/a.zip", [(0, 10), (1 << 30, 10)])
+        gc.collect()
+
+    asyncio.run(run())
+    assert errors == []
@@ -0,0 +1,30 @@
+import asyncio
+from app.api.deps import WS_RESPONSE, WSMessageType
+
+
+class EmptyReader:
+    """偏移量超出文件末尾的读取: 只返回空的最后一块"""
+
+    async def blocks(self, nds_id, path, header_offset=0, size=None, headroom=0):
+        yield b"", True
+
+
+class NoCoalescer:
+    async def read(self, nds_id, path, offset, size):
+        return None
+
+
+def test_read_past_eof_fails(monkeypatch):
+    async def run():
+        # gateway 模块导入时启动连接检查任务, 需在事件循环内导入
+        from app.core import gateway
+        monkeypatch.setattr(gateway, "nds_reader", EmptyReader())
+        monkeypatch.setattr(gateway, "read_coalescer", NoCoalescer())
+        response = WS_RESPONSE(type=WSMessageType.RESPONSE, request_id="r1")
+        await gateway.handle_read("1", "/data/a.zip", 1 << 30, 100, None, "client", response)
+        return response
+
+    response = asyncio.run(run())
+    assert response.type == WSMessageType.ERROR
+    assert response.code == 500
+    assert response.message == "读取文件失败"
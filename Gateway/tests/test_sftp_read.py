@@ -0,0 +1,72 @@
+import asyncio
+import time
+from app.core.nds_client import NDSClient
+
+LATENCY = 0.05
+CHUNKS = 8
+
+
+class FakeFile:
+    """每次读取固定延迟的SFTP文件, 记录同时进行的读取数"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.inflight = 0
+        self.max_inflight = 0
+
+    async def read(self, size, offset):
+        self.inflight += 1
+        self.max_inflight = max(self.max_inflight, self.inflight)
+        try:
+            await asyncio.sleep(LATENCY)
+            return bytes(max(0, min(size, self.size - offset)))
+        finally:
+            self.inflight -= 1
+
+    async def close(self):
+        pass
+
+
+class FakeSFTP:
+    """记录打开文件参数的SFTP客户端"""
+
+    def __init__(self, file: FakeFile):
+        self.file = file
+        self.options = None
+
+    async def open(self, path, mode, **options):
+        self.options = options
+        return self.file
+
+
+def open_client(size: int, **kwargs):
+    client = NDSClient("SFTP", "127.0.0.1", 22, "u", "p", nds_id="1", **kwargs)
+    client.client = FakeSFTP(FakeFile(size))
+    asyncio.run(client.open("/data/a.zip", {"size": size}))
+    return client
+
+
+def test_open_keeps_asyncssh_defaults():
+    assert open_client(100).client.options == {}
+    options = open_client(100, read_block_size=65536, read_pipeline=16).client.options
+    assert options == {"block_size": 65536, "max_requests": 16}
+
+
+def test_iter_read_overlaps_latency():
+    size = NDSClient.SFTP_CHUNK_SIZE * CHUNKS
+    client = open_client(size)
+
+    async def run():
+        total = 0
+        started = time.perf_counter()
+        async for block in client.iter_read(size, NDSClient.SFTP_CHUNK_SIZE):
+            total += len(block)
+            # 消费方处理每块的耗时与NDS往返相同, 下一块的读取应与之重叠
+            await asyncio.sleep(LATENCY)
+        return total, time.perf_counter() - started
+
+    total, elapsed = asyncio.run(run())
+    assert total == size
+    # 串行读取约需 2 * CHUNKS 个往返, 重叠后约为 CHUNKS + 1 个
+    assert elapsed < 1.5 * CHUNKS * LATENCY
+    assert client.client.file.max_inflight == 1
@@ -0,0 +1,26 @@
+from app.core.ws_frame import FLAG_END, FrameBuffer, frame_headroom, pack_frame, unpack_frame
+
+
+def framed(request_id: str, payload: bytes) -> FrameBuffer:
+    headroom = frame_headroom(request_id)
+    return FrameBuffer(bytearray(headroom) + payload, headroom)
+
+
+def test_frame_buffer_packed_in_place():
+    block = framed("r1", b"data")
+    frame = pack_frame("r1", 3, block, FLAG_END)
+    # 帧头写入预留空间, 直接发送原缓冲区
+    assert frame is block.buffer
+    request_id, seq, flags, payload = unpack_frame(frame)
+    assert (request_id, seq, flags, bytes(payload)) == ("r1", 3, FLAG_END, b"data")
+
+
+def test_shared_frame_buffer_copied_for_other_requests():
+    block = framed("r1", b"data")
+    first = pack_frame("r1", 0, block)
+    # 共享的数据块已被第一个请求使用, 其他请求(含同长度的ID)复制数据, 不改写已发送的帧
+    second = pack_frame("r2", 0, block)
+    assert second is not block.buffer
+    assert unpack_frame(first)[0] == "r1"
+    assert unpack_frame(second)[0] == "r2"
+    assert bytes(unpack_frame(second)[3]) == b"data"
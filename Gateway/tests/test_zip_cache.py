@@ -0,0 +1,59 @@
+import asyncio
+import asyncssh
+from app.core.nds_client import NDSClient
+from app.services.zip_cache import ZipInfoCache
+
+
+class FakeSFTP:
+    """返回固定属性的SFTP客户端"""
+
+    def __init__(self, attrs: asyncssh.SFTPAttrs):
+        self.attrs = attrs
+
+    async def stat(self, path):
+        return self.attrs
+
+
+def sftp_stat(attrs: asyncssh.SFTPAttrs) -> dict:
+    client = NDSClient("SFTP", "127.0.0.1", 22, "u", "p", nds_id="1")
+    client.client = FakeSFTP(attrs)
+    return asyncio.run(client.stat("/data/a.zip"))
+
+
+def test_sftp_stat_reports_mtime():
+    info = sftp_stat(asyncssh.SFTPAttrs(size=100, mtime=1700000000))
+    assert info["size"] == 100
+    assert info["modify"] is not None
+
+
+def test_zip_info_invalidated_on_mtime_change(tmp_path):
+    before = sftp_stat(asyncssh.SFTPAttrs(size=100, mtime=1700000000))
+    after = sftp_stat(asyncssh.SFTPAttrs(size=100, mtime=1700000060))
+    assert before["modify"] != after["modify"]
+
+    async def run():
+        cache = ZipInfoCache(db_path=str(tmp_path / "zip.db"))
+        entries = [{"sub_file_name": "a.xml", "header_offset": 30}]
+        await cache.put("1", "/data/a.zip", before["size"], before["modify"], entries)
+        assert await cache.get("1", "/data/a.zip", before["size"], before["modify"]) == entries
+        # 同样大小的文件被重写, 修改时间变化后缓存失效
+        assert await cache.get("1", "/data/a.zip", after["size"], after["modify"]) is None
+        assert await cache.get("1", "/data/a.zip", before["size"], before["modify"]) is None
+        cache.close()
+
+    asyncio.run(run())
+
+
+def test_zip_info_reopened_after_close(tmp_path):
+    async def run():
+        cache = ZipInfoCache(db_path=str(tmp_path / "zip.db"))
+        entries = [{"sub_file_name": "a.xml", "header_offset": 30}]
+        await cache.put("1", "/data/a.zip", 100, "2024-01-01 00:00:00", entries)
+        cache.close()
+        # 重启时重新打开持久化存储, 已持久化的条目仍可命中
+        cache.open()
+        cache._entries.clear()
+        assert await cache.get("1", "/data/a.zip", 100, "2024-01-01 00:00:00") == entries
+        cache.close()
+
+    asyncio.run(run())
@@ -0,0 +1,42 @@
+import asyncio
+import pytest
+from app.api.deps import WS_RESPONSE
+
+
+def test_zip_info_batch_uses_fixed_workers(monkeypatch):
+    async def run():
+        # gateway 模块导入时启动连接检查任务, 需在事件循环内导入
+        from app.core import gateway
+        active, peak_active, peak_tasks, sent = 0, 0, 0, []
+
+        async def zip_info(nds_id, path):
+            nonlocal active, peak_active, peak_tasks
+            active += 1
+            peak_active = max(peak_active, active)
+            peak_tasks = max(peak_tasks, len(asyncio.all_tasks()))
+            await asyncio.sleep(0)
+            active -= 1
+            return []
+
+        async def send_response(client_id, item):
+            sent.append(item.data["path"])
+            return True
+
+        monkeypatch.setattr(gateway, "zip_info", zip_info)
+        monkeypatch.setattr(gateway.nds_pool, "get_pool_size", lambda nds_id: 2)
+        monkeypatch.setattr(gateway.ws_manage, "send_response", send_response)
+        baseline = len(asyncio.all_tasks())
+        paths = [f"/data/{index}.zip" for index in range(200)]
+        response = WS_RESPONSE(request_id="r1")
+        await gateway.handle_zip_info_batch("1", paths, None, "client", response)
+        assert response.data == {"total": 200, "success": 200, "failed": 0}
+        assert sorted(sent) == sorted(paths)
+        # 任务数只与并发数有关, 与路径数无关
+        assert peak_active == 2
+        assert peak_tasks <= baseline + 2
+
+        with pytest.raises(ValueError):
+            await gateway.handle_zip_info_batch("1", ["/a.zip"] * (gateway.ZIP_INFO_BATCH_MAX + 1), None,
+                                                "client", WS_RESPONSE(request_id="r2"))
+
+    asyncio.run(run())
@@ -0,0 +1,148 @@
+import struct
+from typing import Dict, Optional, Tuple, Union
+
+
+# 二进制文件帧格式(网络字节序): 版本(B) + 标志位(B) + request_id长度(H) + 帧序号(I)，其后为 request_id 与数据
+FRAME_VERSION = 1
+FRAME_HEADER = "!BBHI"
+FRAME_HEADER_SIZE = struct.calcsize(FRAME_HEADER)
+
+# 标志位
+FLAG_END = 0x01  # 当前请求的最后一帧
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+class FrameError(Exception):
+    """文件帧格式错误"""
+    pass
+
+
+class FrameBuffer:
+    """预留了帧头空间的数据块
+
+    读取方将数据直接写入 buffer[headroom:], 发送时在缓冲区前部写入帧头后整体作为一帧发送, 数据不再复制。
+    数据块被多个请求共享时只有第一个请求可以原地写入帧头, 其余请求仍需复制数据。
+    """
+
+    __slots__ = ("buffer", "headroom", "claimed")
+
+    def __init__(self, buffer: bytearray, headroom: int):
+        self.buffer = buffer
+        self.headroom = headroom
+        self.claimed = False
+
+    def __len__(self) -> int:
+        return len(self.buffer) - self.headroom
+
+    @property
+    def payload(self) -> memoryview:
+        """数据部分的视图"""
+        return memoryview(self.buffer)[self.headroom:]
+
+
+def frame_headroom(request_id: str) -> int:
+    """帧头与 request_id 占用的字节数, 即 FrameBuffer 需要预留的空间"""
+    return FRAME_HEADER_SIZE + len(request_id.encode("utf-8"))
+
+
+def pack_frame(request_id: str, seq: int, payload: Union[Buffer, FrameBuffer] = b"", flags: int = 0) -> Buffer:
+    """封装一个文件帧
+
+    payload 为预留了帧头空间的 FrameBuffer 时直接在其中写入帧头, 不复制数据; 否则帧头与数据拼接, 数据复制一次
+
+    Args:
+        request_id: 请求ID
+        seq: 帧序号, 同一请求内从0开始递增
+        payload: 帧数据
+        flags: 标志位
+    Returns:
+        完整的二进制帧
+    """
+    rid = request_id.encode("utf-8")
+    if isinstance(payload, FrameBuffer):
+        if not payload.claimed and payload.headroom == FRAME_HEADER_SIZE + len(rid):
+            payload.claimed = True
+            struct.pack_into(FRAME_HEADER, payload.buffer, 0, FRAME_VERSION, flags, len(rid), seq)
+            payload.buffer[FRAME_HEADER_SIZE:payload.headroom] = rid
+            return payload.buffer
+        payload = payload.payload
+    return b"".join((struct.pack(FRAME_HEADER, FRAME_VERSION, flags, len(rid), seq), rid, payload))
+
+
+def unpack_frame(frame: Buffer) -> Tuple[str, int, int, memoryview]:
+    """解析文件帧
+
+    Returns:
+        (request_id, 帧序号, 标志位, 数据视图)
+    Raises:
+        FrameError: 帧格式错误
+    """
+    view = memoryview(frame)
+    if len(view) < FRAME_HEADER_SIZE:
+        raise FrameError("Frame too short")
+    version, flags, rid_len, seq = struct.unpack_from(FRAME_HEADER, view)
+    if version != FRAME_VERSION:
+        raise FrameError(f"Unsupported frame version: {version}")
+    start = FRAME_HEADER_SIZE + rid_len
+    if len(view) < start:
+        raise FrameError("Truncated frame header")
+    request_id = bytes(view[FRAME_HEADER_SIZE:start]).decode("utf-8")
+    return request_id, seq, flags, view[start:]
+
+
+class FrameAssembler:
+    """按 request_id 重组交错到达的文件帧"""
+
+    def __init__(self):
+        self._buffers: Dict[str, bytearray] = {}
+        self._next_seq: Dict[str, int] = {}
+        self._finished: Dict[str, bool] = {}
+
+    def feed(self, frame: Buffer) -> Tuple[str, bool]:
+        """写入一个帧
+
+        Returns:
+            (request_id, 该请求是否已接收完成)
+        Raises:
+            FrameError: 帧格式错误或帧序号不连续
+        """
+        request_id, seq, flags, payload = unpack_frame(frame)
+        expected = self._next_seq.get(request_id, 0)
+        if seq != expected:
+            self.discard(request_id)
+            raise FrameError(f"Frame out of order[{request_id}]: expected {expected}, got {seq}")
+        self._buffers.setdefault(request_id, bytearray()).extend(payload)
+        self._next_seq[request_id] = seq + 1
+        finished = bool(flags & FLAG_END)
+        self._finished[request_id] = finished
+        return request_id, finished
+
+    def has(self, request_id: str) -> bool:
+        """是否收到过该请求的帧"""
+        return request_id in self._buffers
+
+    def is_finished(self, request_id: str) -> bool:
+        """该请求的帧是否已接收完成"""
+        return self._finished.get(request_id, False)
+
+    def pop(self, request_id: str) -> Optional[bytearray]:
+        """取出已重组的数据, 未完成或不存在时返回None"""
+        if not self.is_finished(request_id):
+            return None
+        data = self._buffers.pop(request_id)
+        self._next_seq.pop(request_id, None)
+        self._finished.pop(request_id, None)
+        return data
+
+    def discard(self, request_id: str) -> None:
+        """丢弃该请求的帧"""
+        self._buffers.pop(request_id, None)
+        self._next_seq.pop(request_id, None)
+        self._finished.pop(request_id, None)
+
+    def clear(self) -> None:
+        """丢弃所有请求的帧"""
+        self._buffers.clear()
+        self._next_seq.clear()
+        self._finished.clear()
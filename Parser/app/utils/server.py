@@ -5,6 +5,7 @@ import asyncio
 from app.core.config import config
 from app.core.http_client import HttpClient, HttpConfig
 from app.core.logger import log
+from app.core.ws_frame import FrameAssembler
 
 
 class Server:
@@ -65,6 +66,9 @@ class Gateway:
         # WebSocket的URL需要与Gateway的API路由匹配
         self.ws_url = f"ws://{host}:{port}/v1/nds/ws"
         self.client = HttpClient(self.url)
+        # 单个文件传输的额度(字节): 限制已发出但尚未被本端取出并写入重组缓冲的数据量(网络与接收队列中的数据),
+        # 不限制重组缓冲本身; ws_read_file 需要返回完整文件, 单次读取的内存峰值约为文件大小加 read_window
+        self.read_window = config.get("gateway.read_window", 8 * 1024 * 1024)
     
     async def ws_read_file(self, ndsid, path, header_offset=0, compress_size=None):
         """
@@ -82,7 +86,7 @@ class Gateway:
             ws_endpoint = f"{self.ws_url}/{client_id}"
             
             # 创建WebSocket连接
-            async with websockets.connect(ws_endpoint, max_size=2 ** 30) as websocket:  # 设置最大消息大小为1GB
+            async with websockets.connect(ws_endpoint, max_size=2 ** 24) as websocket:  # 单帧最大16MB, 文件按帧分段传输
                 # 构建请求参数
                 request_id = str(uuid.uuid4())
                 request_data = {
@@ -92,38 +96,56 @@ class Gateway:
                         "nds_id": ndsid,
                         "path": path,
                         "header_offset": header_offset,
-                        "size": compress_size if compress_size is not None else 0
+                        "size": compress_size if compress_size is not None else 0,
+                        "window": self.read_window
                     }
                 }
                 
                 # 发送请求
                 await websocket.send(json.dumps(request_data))
                 
-                # 接收文件数据
-                file_data = bytearray()
+                # 接收文件数据, 文件帧按 request_id 重组
+                frames = FrameAssembler()
+                # 已从连接取出并写入重组缓冲、但尚未归还额度的字节数, 累计达到半个额度时归还;
+                # 数据写入缓冲即视为已消费, 完整文件仍保存在 frames 中直到读取结束
+                consumed = 0
                 
                 while True:
                     # 接收数据
                     data = await websocket.recv()
                     
+                    # 如果是二进制数据，为带帧头的文件帧
+                    if isinstance(data, bytes):
+                        frame_id, finished = frames.feed(data)
+                        consumed += len(data)
+                        if not finished and consumed >= self.read_window // 2:
+                            await websocket.send(json.dumps({
+                                "api": "credit",
+                                "request_id": frame_id,
+                                "params": {"bytes": consumed}
+                            }))
+                            consumed = 0
                     # 如果是字符串，可能是JSON响应
-                    if isinstance(data, str):
+                    elif isinstance(data, str):
                         try:
                             json_data = json.loads(data)
-                            # 检查是否为结束标记或错误信息
-                            if json_data.get("type") == "file" and json_data.get("data") == "end":
-                                break
-                            elif json_data.get("type") == "error":
-                                # 使用ensure_ascii=False确保中文正常显示
-                                error_json = json.dumps(json_data, ensure_ascii=False, indent=2)
-                                log.error(f"Gateway返回错误: {error_json}")
-                                raise Exception(f"读取文件失败: {error_json}")
                         except json.JSONDecodeError:
                             log.error(f"无法解析响应: {data}")
                             continue
-                    # 如果是二进制数据，添加到文件数据中
-                    elif isinstance(data, bytes):
-                        file_data.extend(data)
+                        if json_data.get("request_id") != request_id:
+                            continue
+                        # 检查是否为错误信息
+                        if json_data.get("type") == "error":
+                            # 使用ensure_ascii=False确保中文正常显示
+                            error_json = json.dumps(json_data, ensure_ascii=False, indent=2)
+                            log.error(f"Gateway返回错误: {error_json}")
+                            raise Exception(f"读取文件失败: {error_json}")
+                        if json_data.get("type") == "response":
+                            break
+                
+                file_data = frames.pop(request_id)
+                if file_data is None:
+                    raise Exception("读取文件失败: 文件数据不完整")
                 return file_data
                 
         except Exception as e:
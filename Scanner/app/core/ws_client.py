@@ -4,8 +4,9 @@ import websockets
 from uuid import uuid4
 from dataclasses import dataclass, asdict, field
 from websockets.exceptions import ConnectionClosed
-from typing import Optional, Dict, Any, List, Literal
+from typing import Optional, Dict, Any, Literal, AsyncIterator
 from app.core.logger import log
+from app.core.ws_frame import FrameAssembler, FrameError
 
 
 @dataclass
@@ -20,7 +21,7 @@ class WebSocketRequest:
 
 @dataclass
 class WebSocketResponse(Exception):
-    type: Literal["response", "error"]
+    type: Literal["response", "error", "stream"]
     code: int = 200
     message: str = "success"
     data: Optional[Dict[str, Any]] = None
@@ -64,8 +65,8 @@ class WebSocketClient:
         self._receive_task = None
         self._running = False
         self._pending_requests: Dict[str, asyncio.Future] = {}
-        self._current_file_request = None
-        self._file_chunks: List[bytes] = []
+        self._frames = FrameAssembler()  # 按 request_id 重组文件帧
+        self._stream_queues: Dict[str, asyncio.Queue] = {}  # 流式请求的消息队列
 
     async def is_connected(self) -> bool:
         if self.ws is None:
@@ -95,20 +96,18 @@ class WebSocketClient:
             try:
                 message = await self.ws.recv()
                 if isinstance(message, bytes):
-                    if self._current_file_request:
-                        self._file_chunks.append(message)
+                    self._handle_file_frame(message)
                     continue
 
                 data = json.loads(message)
                 
-                if data.get("type") == "check":
-                    continue
-                    
-                if data.get("type") == "file":
-                    await self._handle_file_message(data)
+                if data.get("type") in ("check", "file"):
                     continue
                     
                 response = WebSocketResponse.from_dict(data)
+                if response.request_id in self._stream_queues:
+                    self._stream_queues[response.request_id].put_nowait(response)
+                    continue
                 if response.request_id in self._pending_requests:
                     await self._handle_response_message(response)
                     
@@ -119,16 +118,14 @@ class WebSocketClient:
             except Exception as e:
                 log.error(f"消息处理错误: {str(e)}")
 
-    async def _handle_file_message(self, data: Dict[str, Any]):
-        request_id = data.get("request_id")
-        if not request_id:
-            return
-            
-        if data.get("data") == "start":
-            self._current_file_request = request_id
-            self._file_chunks = []
-        elif data.get("data") == "end":
+    def _handle_file_frame(self, frame: bytes):
+        try:
+            request_id, _ = self._frames.feed(frame)
+        except FrameError as e:
+            log.error(f"文件帧解析错误: {str(e)}")
             return
+        if request_id not in self._pending_requests:
+            self._frames.discard(request_id)
 
     async def _handle_response_message(self, response: WebSocketResponse):
         if not response.request_id:
@@ -137,21 +134,17 @@ class WebSocketClient:
         future = self._pending_requests.pop(response.request_id)
         
         if not response.success:
-            if response.request_id == self._current_file_request:
-                self._current_file_request = None
-                self._file_chunks = []
+            self._frames.discard(response.request_id)
             future.set_exception(response)
             return
             
-        if response.request_id == self._current_file_request:
-            if not self._file_chunks:
-                error_response = WebSocketResponse(type="error", code=403, message="文件传输异常: 没有收到文件数据", request_id=response.request_id)
+        if self._frames.has(response.request_id):
+            if not self._frames.is_finished(response.request_id):
+                self._frames.discard(response.request_id)
+                error_response = WebSocketResponse(type="error", code=403, message="文件传输异常: 文件数据不完整", request_id=response.request_id)
                 future.set_exception(error_response)
                 return
-                
-            response.Bytes = b"".join(self._file_chunks)
-            self._current_file_request = None
-            self._file_chunks = []
+            response.Bytes = self._frames.pop(response.request_id)
                 
         future.set_result(response)
 
@@ -161,19 +154,17 @@ class WebSocketClient:
             await self.ws.close()
             self.ws = None
             
-        # 优先处理文件传输中断
-        if self._current_file_request:
-            future = self._pending_requests.pop(self._current_file_request, None)
-            if future and not future.done():
-                future.set_exception(WebSocketResponse(type="error", code=404, message="文件传输中断: WebSocket连接已断开", request_id=self._current_file_request))
-            self._current_file_request = None
-            self._file_chunks = []
-            
-        # 处理其他待处理的请求
+        # 中断流式请求
+        for request_id, queue in self._stream_queues.items():
+            queue.put_nowait(WebSocketResponse(type="error", code=404, message="WebSocket连接已断开", request_id=request_id))
+
+        # 处理待处理的请求, 传输中的文件一并中断
         for request_id, future in self._pending_requests.items():
             if not future.done():
-                future.set_exception(WebSocketResponse(type="error", code=404, message="WebSocket连接已断开", request_id=request_id))
+                message = "文件传输中断: WebSocket连接已断开" if self._frames.has(request_id) else "WebSocket连接已断开"
+                future.set_exception(WebSocketResponse(type="error", code=404, message=message, request_id=request_id))
         self._pending_requests.clear()
+        self._frames.clear()
         
     async def close(self):
         self._running = False
@@ -187,17 +178,15 @@ class WebSocketClient:
                 pass
         
         # 处理所有待处理的请求
-        if self._current_file_request:
-            future = self._pending_requests.pop(self._current_file_request, None)
-            if future and not future.done():
-                future.set_exception(WebSocketResponse(type="error", code=404, message="文件传输中断: 连接已关闭", request_id=self._current_file_request))
-            self._current_file_request = None
-            self._file_chunks = []
-            
+        for request_id, queue in self._stream_queues.items():
+            queue.put_nowait(WebSocketResponse(type="error", code=404, message="连接已关闭", request_id=request_id))
+
         for request_id, future in self._pending_requests.items():
             if not future.done():
-                future.set_exception(WebSocketResponse(type="error", code=404, message="连接已关闭", request_id=request_id))
+                message = "文件传输中断: 连接已关闭" if self._frames.has(request_id) else "连接已关闭"
+                future.set_exception(WebSocketResponse(type="error", code=404, message=message, request_id=request_id))
         self._pending_requests.clear()
+        self._frames.clear()
         
         # 最后关闭websocket连接
         if self.ws:
@@ -218,25 +207,55 @@ class WebSocketClient:
             return await asyncio.wait_for(future, timeout=timeout)
         except asyncio.CancelledError:
             self._pending_requests.pop(request.request_id, None)
-            if request.request_id == self._current_file_request:
-                self._current_file_request = None
-                self._file_chunks = []
+            self._frames.discard(request.request_id)
             raise WebSocketResponse(type="error", code=404, message="请求已取消", request_id=request.request_id)
         except asyncio.TimeoutError:
             self._pending_requests.pop(request.request_id, None)
-            if request.request_id == self._current_file_request:
-                self._current_file_request = None
-                self._file_chunks = []
+            self._frames.discard(request.request_id)
             raise WebSocketResponse(type="error", code=401, message=f"请求超时: {api}", request_id=request.request_id)
         except Exception as e:
             self._pending_requests.pop(request.request_id, None)
-            if request.request_id == self._current_file_request:
-                self._current_file_request = None
-                self._file_chunks = []
+            self._frames.discard(request.request_id)
             if isinstance(e, WebSocketResponse):
                 raise
             raise WebSocketResponse(type="error", code=402, message=str(e), request_id=request.request_id)
 
+    async def stream_request(self, api: str, params: Optional[Dict[str, Any]] = None, request_id: Optional[str] = None, timeout: float = 300.0, include_final: bool = False) -> AsyncIterator[WebSocketResponse]:
+        """发送流式请求, 逐条返回 stream 消息, 收到最终响应后结束
+
+        timeout 为两条消息之间的最长等待时间; include_final 为True时最终响应作为最后一条返回;
+        最终响应为错误时抛出 WebSocketResponse
+        """
+        request_id = request_id or uuid4().hex
+        if not await self.is_connected():
+            raise WebSocketResponse(type="error", code=400, message="WebSocket未连接", request_id=request_id)
+
+        request = WebSocketRequest(api=api, params=params or {}, request_id=request_id)
+        queue: asyncio.Queue = asyncio.Queue()
+        self._stream_queues[request.request_id] = queue
+
+        try:
+            await self.ws.send(str(request))
+            while True:
+                try:
+                    response = await asyncio.wait_for(queue.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    raise WebSocketResponse(type="error", code=401, message=f"请求超时: {api}", request_id=request.request_id)
+                if response.type == "stream":
+                    yield response
+                elif response.success:
+                    if include_final:
+                        yield response
+                    return
+                else:
+                    raise response
+        except WebSocketResponse:
+            raise
+        except Exception as e:
+            raise WebSocketResponse(type="error", code=402, message=str(e), request_id=request.request_id)
+        finally:
+            self._stream_queues.pop(request.request_id, None)
+
     async def __aenter__(self):
         await self.connect()  # 失败时会抛出异常
         return self
@@ -5,6 +5,7 @@ import asyncio
 from datetime import datetime
 
 from app.core.logger import log
+from app.core.config import config
 from app.utils.server import Server, Gateway
 
 
@@ -34,6 +35,9 @@ class Scanner:
         self.gateway = None             # 网关配置
         self.max_interval = 300         # 最大扫描间隔（秒）
         self.min_interval = 60          # 最小扫描间隔（秒）
+        self.scan_days = config.get("scanner.scan_days")  # 只扫描最近N天的目录和文件，为空或0时扫描全部
+        self.full_scan_interval = config.get("scanner.full_scan_interval", 3600)  # 全量扫描间隔（秒）
+        self.max_file_retries = config.get("scanner.max_file_retries", 5)  # 单个文件失败后的最大重试轮数
         self._tasks = {}                # NDS扫描任务字典
         self._status = {                # 扫描器状态信息
             "running": False,           # 是否正在运行
@@ -72,93 +76,151 @@ class Scanner:
                 "files_processed": 0
             }
             
+            # 增量扫描水位, 只有整轮扫描未中断时才推进, 否则下一轮从上次的水位重新获取
+            watermarks = {}
+            # Center 的 ndsfiles/filter 会丢弃任务时间窗口之外的文件, 窗口变化后这些文件不会再出现在增量结果中,
+            # 因此每隔 full_scan_interval 秒以空水位重新全量扫描一次
+            full_scan_time = None
+            # 获取子包信息或提交失败的文件: (数据类型, 路径) -> 失败次数, 下一轮单独重试, 不阻塞水位推进
+            failed_files = {}
             while self.running and not self.stopping:
                 try:
                     start_time = datetime.now()
                     self._status["tasks"][str(nds_id)]["last_scan"] = start_time.isoformat()
+                    if full_scan_time is None or (start_time - full_scan_time).total_seconds() >= self.full_scan_interval:
+                        log.info(f"NDS[{nds_id}] 开始全量扫描")
+                        watermarks = {}
+                        full_scan_time = start_time
                 
-                    mro_new_files = []
+                    next_watermarks = {}
+                    completed = True
+                    stopped = False
                     await gateway.connect()
                     
-                    mro_files_nds = await gateway.scan_nds(nds_config.get("id"), nds_config.get("MRO_Path"), nds_config.get("MRO_Filter"))
-                    
-                    if mro_files_nds.code == 200:
-                        mro_new_files = await server.ndsfile_filter_files(nds_config.get("id"), "MRO", mro_files_nds.data)
-                    else:
-                        log.warning(f"Scanner thread[{nds_config.get('id')}] scan mro error: {mro_files_nds}")
-                    
-                    mdt_files_nds = await gateway.scan_nds(nds_config.get("id"), nds_config.get("MDT_Path"), nds_config.get("MDT_Filter"))
-                    
-                    if mdt_files_nds.code == 200:
-                        mdt_new_files = await server.ndsfile_filter_files(nds_config.get("id"), "MDT", mdt_files_nds.data)
-                    else:
-                        log.warning(f"Scanner thread[{nds_config.get('id')}] scan mdt error: {mdt_files_nds}")
-                    
-                    
-                    # 合并新文件并保留类型信息
-                    new_files = [
-                        *[{'path': path, 'type': 'MRO'} for path in mro_new_files],
-                        *[{'path': path, 'type': 'MDT'} for path in mdt_new_files]
-                    ]
-                    
-                    # 根据文件名中的时间从远到近（从旧到新）排序
-                    new_files.sort(key=lambda x: self._extract_time(x['path']) or '0001-01-01 00:00:00')
-                    
-                    log.info(f"NDS[{nds_config.get('id')}] 扫描新文件数量: {len(new_files)}")
-                    # 扫描新文件子包
                     nds_id = int(nds_config.get("id"))  # 提前获取ID
                     batch_data = []  # 存储待处理的数据
+                    batch_files = []  # 当前批次包含的文件: (数据类型, 路径)
                     batch_size = 0  # 当前批次的数据大小
                     MAX_BATCH_SIZE = 10 * 1024 * 1024  # 10MB
-                    
-                    for file in new_files:
-                        data = await gateway.zip_info(nds=nds_config.get("id"), path=file['path'])
-                        log.info(f"扫描NDS[{nds_id}]子包文件: {file['path']}")
-                        if data.code == 200:
-                            # 批量添加ndsId和data_type
-                            current_data = [{**item, 'ndsId': nds_id, 'data_type': file['type']} for item in data.data]
-                            current_size = len(json.dumps(current_data).encode('utf-8'))
-                            
-                            # 如果当前批次加上新数据超过5MB，先处理当前批次
-                            if batch_size + current_size > MAX_BATCH_SIZE and batch_data:
-                                try:
-                                    response = await server.batch_add_tasks(batch_data)
-                                    if response.get('code') == 429:  # redis高负荷，暂停写入
-                                        batch_data = []  # 清空未成功提交的数据
-                                        batch_size = 0
-                                        break
-                                    elif response.get('code') == 200:
-                                        log.info(f"批量添加文件成功: {response.get('data')}")
-                                        # 成功提交后再重置批次数据
-                                        batch_data = []
-                                        batch_size = 0
-                                    else:
-                                        log.error(f"批量添加文件失败: {response.get('message')}")
-                                        batch_data = []  # 提交失败也清空数据
-                                        batch_size = 0
-                                except Exception as e:
-                                    log.error(f"批量添加文件失败: {str(e)}")
-                                    batch_data = []
-                                    batch_size = 0
-                                
-                            
-                            # 添加新数据到批次
-                            batch_data.extend(current_data)
-                            batch_size += current_size
-                            if self.stopping or not self.running:
-                                break
-                    
-                    # 处理最后一批数据（如果有）
-                    if batch_data:
+                    new_count = 0
+
+                    def fail(data_type: str, path: str) -> None:
+                        """记录失败的文件, 超过最大重试轮数后放弃"""
+                        key = (data_type, path)
+                        failed_files[key] = failed_files.get(key, 0) + 1
+                        if failed_files[key] > self.max_file_retries:
+                            del failed_files[key]
+                            log.error(f"NDS[{nds_id}] {data_type}文件多次处理失败, 放弃重试: {path}")
+
+                    async def flush() -> bool:
+                        """提交当前批次, 返回是否可以继续写入"""
+                        nonlocal batch_data, batch_files, batch_size, completed
+                        succeeded = False
                         try:
                             response = await server.batch_add_tasks(batch_data)
-                            if response.get('code') == 200:
+                            if response.get('code') == 429:  # redis高负荷，暂停写入
+                                completed = False
+                                return False
+                            elif response.get('code') == 200:
                                 log.info(f"批量添加文件成功: {response.get('data')}")
                                 self._status["tasks"][str(nds_id)]["files_processed"] += len(batch_data)
+                                succeeded = True
                             else:
                                 log.error(f"批量添加文件失败: {response.get('message')}")
                         except Exception as e:
                             log.error(f"批量添加文件失败: {str(e)}")
+                        finally:
+                            # 提交失败也清空数据, 其中的文件下一轮重试
+                            if not succeeded:
+                                for key in batch_files:
+                                    fail(*key)
+                            batch_data = []
+                            batch_files = []
+                            batch_size = 0
+                        return True
+
+                    async def process(data_type: str, files: list) -> bool:
+                        """过滤新文件并获取子包信息加入批次, 返回是否继续扫描"""
+                        nonlocal batch_size, completed, new_count
+                        new_files = await server.ndsfile_filter_files(nds_id, data_type, files)
+                        # 已入库或不在任务窗口内的文件无需重试
+                        for path in set(files).difference(new_files or []):
+                            failed_files.pop((data_type, path), None)
+                        if not new_files:
+                            return True
+                        # 根据文件名中的时间从远到近（从旧到新）排序
+                        new_files.sort(key=lambda x: self._extract_time(x) or '0001-01-01 00:00:00')
+                        new_count += len(new_files)
+                        log.info(f"NDS[{nds_id}] 扫描新{data_type}文件数量: {len(new_files)}")
+
+                        # 批量获取子包信息, Gateway在连接池上并发解析并逐个返回
+                        pending = set(new_files)
+                        try:
+                            async for data in gateway.zip_info_batch(nds_id, new_files):
+                                path = (data.data or {}).get('path')
+                                pending.discard(path)
+                                log.info(f"扫描NDS[{nds_id}]子包文件: {path}")
+                                if data.code != 200:
+                                    fail(data_type, path)
+                                    continue
+                                failed_files.pop((data_type, path), None)
+                                # 批量添加ndsId和data_type
+                                current_data = [{**item, 'ndsId': nds_id, 'data_type': data_type} for item in data.data['entries']]
+                                current_size = len(json.dumps(current_data).encode('utf-8'))
+
+                                # 如果当前批次加上新数据超过10MB，先处理当前批次
+                                if batch_size + current_size > MAX_BATCH_SIZE and batch_data:
+                                    if not await flush():
+                                        return False
+
+                                # 添加新数据到批次
+                                batch_data.extend(current_data)
+                                batch_files.append((data_type, path))
+                                batch_size += current_size
+                                if self.stopping or not self.running:
+                                    completed = False
+                                    return False
+                        except Exception as e:
+                            log.warning(f"Scanner thread[{nds_id}] zip_info_batch error: {str(e)}")
+                        # 批量请求中断时未返回结果的文件同样下一轮重试
+                        for path in pending:
+                            fail(data_type, path)
+                        return True
+
+                    # 流式增量扫描: 每收到一段新文件即过滤并获取子包信息, 与Gateway的目录遍历并行
+                    try:
+                        for data_type in ("MRO", "MDT"):
+                            try:
+                                # 先重试上一轮失败的文件
+                                if retry := [path for (kind, path) in failed_files if kind == data_type]:
+                                    log.info(f"NDS[{nds_id}] 重试{data_type}失败文件数量: {len(retry)}")
+                                    if not await process(data_type, retry):
+                                        stopped = True
+                                        break
+                                async for chunk in gateway.scan_delta_stream(nds_id, nds_config.get(f"{data_type}_Path"), nds_config.get(f"{data_type}_Filter"), self.scan_days, watermarks.get(data_type)):
+                                    if chunk.type != "stream":
+                                        next_watermarks[data_type] = chunk.data.get("watermark")
+                                        continue
+                                    if not (files := chunk.data.get("files")):
+                                        continue
+                                    if not await process(data_type, files):
+                                        stopped = True
+                                        break
+                            except Exception as e:
+                                # 单个数据类型失败不影响其他类型, 该类型水位不推进, 下一轮重新获取
+                                next_watermarks.pop(data_type, None)
+                                log.error(f"NDS[{nds_id}] 扫描{data_type}失败: {str(e)}")
+                            if stopped:
+                                break
+                    finally:
+                        log.info(f"NDS[{nds_id}] 扫描新文件数量: {new_count}")
+                        # 处理最后一批数据（如果有）
+                        if batch_data:
+                            await flush()
+
+                    if completed and not stopped:
+                        watermarks.update(next_watermarks)
+                    self._status["tasks"][str(nds_id)]["failed_files"] = len(failed_files)
                             
                 except Exception as e:
                     log.error(f"扫描失败:{str(e)}")
@@ -228,11 +290,11 @@ class Scanner:
             self._tasks = {}  # 清空之前的任务
             self._status["tasks"] = {}  # 清空任务状态
             
-            for config in ndsList:
-                if not config.get("id", None):
+            for nds_link in ndsList:
+                if not nds_link.get("id", None):
                     continue
-                nds_id = str(config.get("id"))
-                self._tasks[nds_id] = asyncio.create_task(self.scan_loop(config.get("nds")))
+                nds_id = str(nds_link.get("id"))
+                self._tasks[nds_id] = asyncio.create_task(self.scan_loop(nds_link.get("nds")))
                 
             if self._tasks == {}:
                 self.running = False
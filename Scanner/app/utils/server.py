@@ -93,21 +93,69 @@ class Gateway:
     async def is_connected(self):
         return await self.ws_client.is_connected()
     
-    async def scan_nds(self, nds: str, path: str, filter: str):
-
+    async def scan_nds(self, nds: str, path: str, filter: str, days: int | None = None):
+        """扫描NDS目录, days 指定时Gateway跳过目录名/文件名时间早于最近N天的子目录和文件"""
+        params = {
+            "nds_id": nds, 
+            "path": path,
+            "filter": filter
+        }
+        if days:
+            params["days"] = days
         try:
             response = await self.ws_client.send_request(
                 api="scan", 
-                params={
-                    "nds_id": nds, 
-                    "path": path,
-                    "filter": filter
-                }
+                params=params
+            )
+            return response
+        except Exception as e:
+            return e
+
+    async def scan_delta(self, nds: str, path: str, filter: str, days: int | None = None, watermark: str | None = None):
+        """增量扫描NDS目录, 返回 data: files(水位之后新增的文件)/watermark(新水位)/full(是否为全量结果)"""
+        params = {
+            "nds_id": nds,
+            "path": path,
+            "filter": filter
+        }
+        if days:
+            params["days"] = days
+        if watermark:
+            params["watermark"] = watermark
+        try:
+            response = await self.ws_client.send_request(
+                api="scan_delta",
+                params=params
             )
             return response
         except Exception as e:
             return e
 
+    async def scan_nds_stream(self, nds: str, path: str, filter: str, days: int | None = None, chunk_size: int | None = None):
+        """流式扫描NDS目录, 边遍历边返回, 每次返回一段文件路径列表"""
+        params = {"nds_id": nds, "path": path, "filter": filter, "stream": True}
+        if days:
+            params["days"] = days
+        if chunk_size:
+            params["chunk_size"] = chunk_size
+        async for response in self.ws_client.stream_request(api="scan", params=params):
+            yield response.data.get("files", [])
+
+    async def scan_delta_stream(self, nds: str, path: str, filter: str, days: int | None = None, watermark: str | None = None, chunk_size: int | None = None):
+        """流式增量扫描NDS目录
+
+        逐段返回 stream 消息(data.files 为新增文件), 最后返回最终响应(data 为 total/watermark/full)
+        """
+        params = {"nds_id": nds, "path": path, "filter": filter, "stream": True}
+        if days:
+            params["days"] = days
+        if watermark:
+            params["watermark"] = watermark
+        if chunk_size:
+            params["chunk_size"] = chunk_size
+        async for response in self.ws_client.stream_request(api="scan_delta", params=params, include_final=True):
+            yield response
+
     async def zip_info(self, nds: str, path: str):
         try:
             response = await self.ws_client.send_request(
@@ -121,6 +169,16 @@ class Gateway:
         except Exception as e:
             return e
 
+    async def zip_info_batch(self, nds: str, paths: list, concurrency: int | None = None):
+        """批量获取ZIP信息, 逐个返回已解析完成的文件(stream消息, data为 path/entries)"""
+        if not paths:
+            return
+        params = {"nds_id": nds, "paths": paths}
+        if concurrency:
+            params["concurrency"] = concurrency
+        async for response in self.ws_client.stream_request(api="zip_info_batch", params=params):
+            yield response
+
     async def read(self, nds: str, path: str, header_offset: int, size: int):
         try:
             response = await self.ws_client.send_request(